@@ -19,6 +19,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'tests_app.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,8 +72,46 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
+# Сюда collectstatic собирает статику для боевого сервера
+STATIC_ROOT = BASE_DIR / 'staticfiles'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'tests_app.CustomUser'
 
+# Пользователь загружается из сессии сразу с компанией (tests_app/backends.py).
+# ModelBackend оставлен для сессий, открытых до его подключения.
+AUTHENTICATION_BACKENDS = [
+    'tests_app.backends.CompanyModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# Бюджеты запросов к БД на view (см. tests_app/middleware.py).
+# В тестах включается строгий режим: превышение бюджета - ошибка.
+QUERY_BUDGET_STRICT = False
+
+# Фоновые задачи (tests_app/jobs.py) выполняет воркер: python manage.py run_jobs.
+# True - выполнять задачу сразу после коммита в том же процессе, без воркера.
+JOBS_EAGER = False
+
+# Не больше стольких писем в секунду при рассылке приглашений (0 - без ограничения)
+EMAIL_RATE_LIMIT = 5
+
+# Доставка уведомлений в открытые вкладки (server-sent events, только под ASGI).
+# LocalBroker работает в пределах процесса; если уведомления создаются в других
+# процессах (воркер run_jobs, WSGI), укажите 'tests_app.push.RedisBroker' и
+# NOTIFICATION_BROKER_URL = 'redis://localhost:6379/0'.
+NOTIFICATION_BROKER = 'tests_app.push.LocalBroker'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'tests_app.queries': {'handlers': ['console'], 'level': 'WARNING'},
+        'tests_app.jobs': {'handlers': ['console'], 'level': 'WARNING'},
+    },
+}
+
 
@@ -0,0 +1,133 @@
+"""Профиль для боевого сервера.
+
+Подключается через DJANGO_SETTINGS_MODULE=TestOnline.settings_production
+(или --settings TestOnline.settings_production у manage.py). Отличия от
+settings.py:
+- секретный ключ, доступ к базе и ALLOWED_HOSTS берутся только из
+  окружения: DJANGO_SECRET_KEY, DB_NAME, DB_USER, DB_PASSWORD,
+  ALLOWED_HOSTS (через запятую), необязательные DB_HOST и DB_PORT. Без
+  обязательных переменных профиль не загрузится;
+- соединения с PostgreSQL берутся из пула psycopg и проверяются при
+  выдаче; без пакета psycopg_pool соединение живёт CONN_MAX_AGE секунд и
+  проверяется перед повторным использованием;
+- кэш в Redis, общий для всех процессов (содержимое тестов, фрагменты
+  шаблонов, сессии);
+- сессии cached_db: читаются из кэша, база только для записи и промахов;
+- шаблоны компилируются один раз на процесс (cached loader), изменения
+  шаблонов применяются только после перезапуска;
+- статика с хэшем в именах и сжатыми копиями .gz/.br (tests_app/storage.py),
+  собирается командой collectstatic.
+
+Статику отдаёт WhiteNoise (пакет whitenoise из requirements.txt): сжатые
+копии по Accept-Encoding и Cache-Control на год для файлов с хэшем. Если
+статику отдаёт веб-сервер из STATIC_ROOT, заголовки задаются в нём,
+например в nginx:
+    location /static/ {
+        alias /srv/testonline/staticfiles/;
+        gzip_static on;
+        brotli_static on;  # модуль ngx_brotli
+        expires max;
+        add_header Cache-Control immutable;
+    }
+
+Сравнить задержки с профилем по умолчанию (переменные окружения выше
+должны быть заданы):
+    python manage.py benchmark --save-baseline
+    python manage.py benchmark --settings TestOnline.settings_production
+"""
+import copy
+import os
+from django.core.exceptions import ImproperlyConfigured
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, MIDDLEWARE, TEMPLATES
+
+
+def env(name):
+    """Обязательная переменная окружения: значения из settings.py в бою не используются."""
+    value = os.environ.get(name)
+    if not value:
+        raise ImproperlyConfigured(f'Не задана переменная окружения {name}')
+    return value
+
+
+DEBUG = False
+SECRET_KEY = env('DJANGO_SECRET_KEY')
+ALLOWED_HOSTS = [host.strip() for host in env('ALLOWED_HOSTS').split(',') if host.strip()]
+
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379')
+
+# ---------- база данных ----------
+
+DATABASES = copy.deepcopy(DATABASES)
+DATABASES['default'].update({
+    'NAME': env('DB_NAME'),
+    'USER': env('DB_USER'),
+    'PASSWORD': env('DB_PASSWORD'),
+    'HOST': os.environ.get('DB_HOST', 'localhost'),
+    'PORT': os.environ.get('DB_PORT', '5432'),
+})
+
+try:
+    from psycopg_pool import ConnectionPool
+except ImportError:
+    ConnectionPool = None
+
+if ConnectionPool is not None:
+    # Пул на процесс. Под ASGI каждый запрос работает в своём потоке, и
+    # постоянные соединения (CONN_MAX_AGE) почти не переиспользуются, а
+    # пул отдаёт соединение следующему запросу сразу после ответа.
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': 2,
+        'max_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'timeout': 10,
+        # Соединение, оборванное перезапуском PostgreSQL, не попадёт в запрос
+        'check': ConnectionPool.check_connection,
+    }
+    # Django не сочетает пул с постоянными соединениями
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+else:
+    # Под ASGI без пула оставьте 0: соединения потоков запросов не переиспользуются
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# ---------- кэш и сессии ----------
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': f'{REDIS_URL}/1',
+        'KEY_PREFIX': 'testonline',
+    },
+}
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Уведомления создают и воркер, и другие процессы сервера
+NOTIFICATION_BROKER = 'tests_app.push.RedisBroker'
+NOTIFICATION_BROKER_URL = f'{REDIS_URL}/0'
+
+# ---------- шаблоны ----------
+
+# Django и так включает cached loader без DEBUG, но только пока loaders не
+# заданы; задаём явно, чтобы профиль не зависел от DEBUG и умолчаний Django
+TEMPLATES = copy.deepcopy(TEMPLATES)
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+# ---------- статика ----------
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'tests_app.storage.PrecompressedManifestStaticFilesStorage'},
+}
+
+# Сразу после SecurityMiddleware: статика отдаётся без сессий и авторизации.
+# Без пакета whitenoise профиль не запустится (ImportError при загрузке middleware)
+MIDDLEWARE = list(MIDDLEWARE)
+MIDDLEWARE.insert(MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+                  'whitenoise.middleware.WhiteNoiseMiddleware')
@@ -0,0 +1,112 @@
+// Кабинет соискателя: уведомления (поток, подгрузка) и диаграмма результатов.
+// Адреса и счётчик непрочитанных берутся из data-атрибутов #notification-list.
+document.addEventListener('DOMContentLoaded', function() {
+    const toggleButton = document.querySelector('.notification-toggle');
+    const loadMoreButton = document.querySelector('.load-more');
+    const notificationList = document.getElementById('notification-list');
+    let expanded = false;
+    let unreadCount = Number(notificationList.dataset.unread);
+    function updateToggle() {
+        toggleButton.textContent = expanded ? 'Скрыть уведомления' : 'Показать уведомления' + (unreadCount > 0 ? ' (' + unreadCount + ' новых)' : '');
+    }
+    toggleButton.addEventListener('click', function() {
+        expanded = !expanded;
+        document.querySelectorAll('.notification').forEach(notif => {
+            notif.style.display = expanded ? 'block' : 'none';
+        });
+        if (loadMoreButton) loadMoreButton.style.display = expanded ? 'block' : 'none';
+        updateToggle();
+    });
+
+    // Новые уведомления приходят с сервера без перезагрузки страницы
+    if (window.EventSource) {
+        const stream = new EventSource(`${notificationList.dataset.streamUrl}?after=${notificationList.dataset.latest}`);
+        stream.addEventListener('notification', function(event) {
+            const item = JSON.parse(event.data);
+            if (notificationList.querySelector('[data-id="' + item.id + '"]')) return;
+            const div = renderNotification(item);
+            div.style.display = expanded ? 'block' : 'none';
+            notificationList.prepend(div);
+            const empty = document.getElementById('no-notifications');
+            if (empty) empty.remove();
+        });
+        stream.addEventListener('unread', function(event) {
+            unreadCount = JSON.parse(event.data).count;
+            updateToggle();
+        });
+    }
+
+    // Подгрузка следующей страницы уведомлений
+    if (loadMoreButton) {
+        loadMoreButton.addEventListener('click', function() {
+            fetch(`${notificationList.dataset.feedUrl}?before=${loadMoreButton.dataset.cursor}`)
+                .then(response => response.json())
+                .then(data => {
+                    data.notifications.forEach(item => notificationList.appendChild(renderNotification(item)));
+                    if (data.next_cursor) {
+                        loadMoreButton.dataset.cursor = data.next_cursor;
+                    } else {
+                        loadMoreButton.remove();
+                    }
+                });
+        });
+    }
+
+    function renderNotification(item) {
+        const div = document.createElement('div');
+        div.className = 'notification' + (item.is_read ? '' : ' unread');
+        div.dataset.id = item.id;
+        div.style.display = 'block';
+        const p = document.createElement('p');
+        p.textContent = item.message + ' ';
+        const date = document.createElement('em');
+        date.textContent = '(' + item.created_at + ')';
+        p.appendChild(date);
+        div.appendChild(p);
+        if (!item.is_read) {
+            const form = document.createElement('form');
+            form.method = 'post';
+            form.innerHTML = '<input type="hidden" name="csrfmiddlewaretoken" value="' + notificationList.dataset.csrfToken + '">' +
+                '<input type="hidden" name="notification_id" value="' + item.id + '">' +
+                '<button type="submit" name="mark_read" class="button">Отметить</button>';
+            div.appendChild(form);
+        }
+        return div;
+    }
+
+    // Отрисовка круговой диаграммы
+    const stats = JSON.parse(document.getElementById('stats-data').textContent);
+    const ctx = document.getElementById('statsChart').getContext('2d');
+    const statsChart = new Chart(ctx, {
+        type: 'pie',
+        data: {
+            labels: stats.labels,
+            datasets: [{
+                data: stats.data,
+                backgroundColor: stats.backgroundColor,
+                borderWidth: 2,
+                borderColor: '#fff'
+            }]
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            plugins: {
+                legend: {
+                    position: 'bottom',
+                    labels: {
+                        color: '#333'
+                    }
+                },
+                title: {
+                    display: true,
+                    text: 'Статистика результатов',
+                    color: '#222',
+                    font: {
+                        size: 16
+                    }
+                }
+            }
+        }
+    });
+});
@@ -0,0 +1,89 @@
+// Форма вопроса create_question.html: варианты ответа и отправка JSON.
+
+// Показывать/скрывать варианты в зависимости от типа вопроса
+function toggleOptions() {
+    const qType = document.getElementById('question_type').value;
+    document.getElementById('options_block').style.display = (qType === 'open') ? 'none' : 'block';
+}
+toggleOptions();
+
+let optionCount = 0;
+function addOption(text='', checked=false) {
+    const qType = document.getElementById('question_type').value;
+    const optionsList = document.getElementById('options_list');
+    const row = document.createElement('div');
+    row.className = 'option-row';
+    let input = document.createElement('input');
+    input.type = 'text';
+    input.name = 'options[]';
+    input.placeholder = 'Вариант ответа';
+    input.required = true;
+    input.value = text;
+    row.appendChild(input);
+
+    let check = document.createElement('input');
+    check.type = (qType === 'multiple') ? 'checkbox' : 'radio';
+    check.name = (qType === 'multiple') ? 'is_correct[]' : 'is_correct';
+    check.value = optionCount;
+    if (checked) check.checked = true;
+    row.appendChild(check);
+
+    let remove = document.createElement('button');
+    remove.type = 'button';
+    remove.className = 'remove-btn';
+    remove.innerText = '✖';
+    remove.onclick = function() { row.remove(); };
+    row.appendChild(remove);
+
+    optionsList.appendChild(row);
+    optionCount++;
+}
+
+document.getElementById('question_type').addEventListener('change', function() {
+    document.getElementById('options_list').innerHTML = '';
+    if (this.value !== 'open') {
+        addOption();
+        addOption();
+    }
+});
+
+// По умолчанию два варианта для выбора
+if (document.getElementById('question_type').value !== 'open') {
+    addOption();
+    addOption();
+}
+
+const form = document.getElementById('questionForm');
+form.onsubmit = function(e) {
+    e.preventDefault();
+    const qType = document.getElementById('question_type').value;
+    let data = {
+        text: this.text.value,
+        time_per_question: this.time_per_question.value,
+        category: this.category.value,
+        question_type: qType,
+        points: this.points.value,
+        options: []
+    };
+    if (qType !== 'open') {
+        const options = this.querySelectorAll('input[name="options[]"]');
+        let is_correct;
+        if (qType === 'multiple') {
+            is_correct = this.querySelectorAll('input[type="checkbox"][name="is_correct[]"]');
+        } else {
+            is_correct = this.querySelectorAll('input[type="radio"][name="is_correct"]');
+        }
+        for (let i = 0; i < options.length; i++) {
+            let correct = (qType === 'multiple') ? is_correct[i].checked : is_correct[i].checked;
+            data.options.push([options[i].value, correct]);
+        }
+    }
+    fetch(this.dataset.url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'X-CSRFToken': this.elements.csrfmiddlewaretoken.value },
+        body: JSON.stringify(data)
+    }).then(response => response.json()).then(data => {
+        alert(data.status === 'success' ? 'Вопрос сохранён!' : 'Ошибка!');
+        if (data.status === 'success') location.href = form.dataset.successUrl;
+    });
+};
@@ -0,0 +1,46 @@
+// Панель работодателя: поле своей должности и график по тестам.
+document.addEventListener('DOMContentLoaded', function() {
+    const positionSelect = document.querySelector('select[name="position"]');
+    const customPositionInput = document.querySelector('.custom-position input');
+    positionSelect.addEventListener('change', function() {
+        if (this.value === 'other') {
+            customPositionInput.style.display = 'block';
+            customPositionInput.required = true;
+        } else {
+            customPositionInput.style.display = 'none';
+            customPositionInput.required = false;
+            customPositionInput.value = '';
+        }
+    });
+
+    // Отрисовка бар-чарта (можно закомментировать, если не нужно)
+    const stats = JSON.parse(document.getElementById('stats-data').textContent);
+    const ctx = document.getElementById('statsChart').getContext('2d');
+    const statsChart = new Chart(ctx, {
+        type: 'bar',
+        data: {
+            labels: stats.labels,
+            datasets: [{
+                label: 'Количество/Средний балл',
+                data: stats.data,
+                backgroundColor: stats.backgroundColor,
+                borderColor: '#fff',
+                borderWidth: 1
+            }]
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            scales: {
+                y: {
+                    beginAtZero: true,
+                    title: { display: true, text: 'Значение' }
+                }
+            },
+            plugins: {
+                legend: { position: 'top' },
+                title: { display: true, text: 'Статистика тестов' }
+            }
+        }
+    });
+});
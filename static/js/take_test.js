@@ -0,0 +1,43 @@
+// Таймер и отправка ответа на странице take_test.html.
+// Вопрос, адрес и тип ответа берутся из data-атрибутов формы #answerForm.
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.getElementById('answerForm');
+    if (!form) return;
+    const timePerQuestion = Number(form.dataset.timePerQuestion);
+    let time = timePerQuestion;
+    let timer = setInterval(() => {
+        time--;
+        document.getElementById('time').textContent = time;
+        if (time <= 0) {
+            clearInterval(timer);
+            submitAnswer();
+        }
+    }, 1000);
+
+    function submitAnswer() {
+        let data = { question_id: Number(form.dataset.questionId), time_taken: timePerQuestion - time };
+        let options = form.querySelectorAll('input[name="option"]');
+        if (form.dataset.multiple === 'true') {
+            data.selected_option_ids = Array.from(options).filter(cb => cb.checked).map(cb => cb.value);
+        } else {
+            let selected = form.querySelector('input[name="option"]:checked');
+            data.selected_option_id = selected ? selected.value : null;
+        }
+        if (options.length === 0) {
+            data.answer_text = document.getElementById('answer_text').value;
+        }
+        fetch(form.dataset.url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'X-CSRFToken': form.elements.csrfmiddlewaretoken.value },
+            body: JSON.stringify(data)
+        }).then(response => response.json()).then(data => {
+            if (data.status === 'timeout') alert('Время вышло!');
+            location.reload();
+        });
+    }
+
+    form.onsubmit = function(e) {
+        e.preventDefault();
+        submitAnswer();
+    };
+});
@@ -0,0 +1,123 @@
+// Прохождение теста на одной странице (take_test_single.html).
+// Вопросы пришли одним ответом; ответы копятся в буфере и отправляются
+// пачкой в submit_answers каждые SYNC_EVERY вопросов и в конце теста
+const SYNC_EVERY = 10;
+const payload = JSON.parse(document.getElementById('test-payload').textContent);
+const form = document.getElementById('answerForm');
+const submitUrl = form.dataset.submitUrl;
+const resultUrl = form.dataset.resultUrl;
+const questions = payload.questions;
+let index = 0, buffer = [], sending = false, timer = null, time = 0, shownAt = 0;
+const testDeadline = payload.time_left === null ? null : Date.now() + payload.time_left * 1000;
+
+function renderQuestion() {
+    const question = questions[index];
+    document.getElementById('number').textContent = index + 1;
+    document.getElementById('total').textContent = questions.length;
+    document.getElementById('question-text').textContent = question.text;
+    const container = document.getElementById('options');
+    container.innerHTML = '';
+    if (question.options.length === 0) {
+        const textarea = document.createElement('textarea');
+        textarea.id = 'answer_text';
+        textarea.rows = 4;
+        textarea.placeholder = 'Введите ваш ответ';
+        container.appendChild(textarea);
+    }
+    question.options.forEach(option => {
+        const row = document.createElement('div');
+        row.className = 'option-row';
+        const input = document.createElement('input');
+        input.type = question.question_type === 'multiple' ? 'checkbox' : 'radio';
+        input.name = 'option';
+        input.value = option.id;
+        input.id = 'opt' + option.id;
+        const label = document.createElement('label');
+        label.htmlFor = input.id;
+        label.textContent = option.text;
+        row.appendChild(input);
+        row.appendChild(label);
+        container.appendChild(row);
+    });
+    time = question.time_per_question;
+    if (testDeadline !== null) {
+        time = Math.min(time, Math.max(0, Math.floor((testDeadline - Date.now()) / 1000)));
+    }
+    shownAt = Date.now();
+    document.getElementById('time').textContent = time;
+    clearInterval(timer);
+    timer = setInterval(() => {
+        time--;
+        document.getElementById('time').textContent = time;
+        if (time <= 0) nextQuestion();
+    }, 1000);
+}
+
+function collectAnswer(question) {
+    // Целые секунды с округлением вниз: сервер сверяет сумму со своим временем
+    const seconds = Math.floor((Date.now() - shownAt) / 1000);
+    const data = { question_id: question.id, time_taken: Math.min(question.time_per_question, Math.max(1, seconds)) };
+    const inputs = Array.from(document.querySelectorAll('input[name="option"]'));
+    if (inputs.length === 0) {
+        data.answer_text = document.getElementById('answer_text').value;
+    } else if (question.question_type === 'multiple') {
+        data.selected_option_ids = inputs.filter(input => input.checked).map(input => input.value);
+    } else {
+        const selected = inputs.find(input => input.checked);
+        data.selected_option_id = selected ? selected.value : null;
+    }
+    return data;
+}
+
+function nextQuestion() {
+    clearInterval(timer);
+    buffer.push(collectAnswer(questions[index]));
+    index++;
+    const expired = testDeadline !== null && Date.now() >= testDeadline;
+    if (index >= questions.length || expired) {
+        form.style.display = 'none';
+        document.getElementById('status').textContent = 'Сохраняем ответы...';
+        sync(true);
+        return;
+    }
+    if (buffer.length >= SYNC_EVERY) sync(false);
+    renderQuestion();
+}
+
+function sync(finish) {
+    if (sending) {
+        if (finish) setTimeout(() => sync(true), 500);
+        return;
+    }
+    sending = true;
+    const batch = buffer.slice();
+    fetch(submitUrl, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'X-CSRFToken': form.elements.csrfmiddlewaretoken.value },
+        body: JSON.stringify({ answers: batch, finish: finish })
+    }).then(response => {
+        if (response.status === 409) return { finished: true, result_url: resultUrl };
+        if (!response.ok) throw new Error(response.status);
+        return response.json();
+    }).then(data => {
+        buffer = buffer.slice(batch.length);
+        sending = false;
+        if (data.finished) location.href = data.result_url || resultUrl;
+    }).catch(() => {
+        // Сеть недоступна: ответы остаются в буфере, пробуем ещё раз
+        sending = false;
+        document.getElementById('status').textContent = 'Нет связи с сервером, повторяем отправку...';
+        setTimeout(() => sync(finish), 2000);
+    });
+}
+
+form.onsubmit = function(e) {
+    e.preventDefault();
+    nextQuestion();
+};
+
+if (questions.length === 0) {
+    sync(true);
+} else {
+    renderQuestion();
+}
@@ -0,0 +1,69 @@
+"""Проверка доступа к view по роли и состоянию пользователя.
+
+Решение принимает одна функция access_denied по полям пользователя,
+уже загруженного из сессии вместе с компанией (CompanyModelBackend), так
+что отказ возвращается до первого запроса самой view.
+"""
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import redirect, render
+
+DENIAL_MESSAGES = {
+    'blocked': 'Ваш аккаунт заблокирован.',
+    'forbidden': 'Доступ запрещён.',
+    'no_company': 'Ваш аккаунт не привязан к компании.',
+    'not_approved': 'Ваша заявка на роль работодателя еще не одобрена. Функции работодателя недоступны.',
+}
+
+
+def access_denied(user, roles=(), approved=False, company=False):
+    """Причина отказа (ключ DENIAL_MESSAGES) или None, если доступ разрешён."""
+    if not user.is_active:
+        return 'blocked'
+    if roles and user.role not in roles:
+        return 'forbidden'
+    if company and user.company_id is None:
+        return 'no_company'
+    if approved and not user.is_approved:
+        return 'not_approved'
+    return None
+
+
+def deny(request, reason, api=False):
+    message = DENIAL_MESSAGES[reason]
+    if api:
+        return JsonResponse({'status': 'error', 'message': message}, status=403)
+    if reason == 'not_approved':
+        messages.warning(request, message)
+        return render(request, 'pending_approval.html')
+    messages.error(request, message)
+    return redirect('login')
+
+
+def role_required(*roles, approved=False, company=False, api=False):
+    """Пускает во view только вошедшего активного пользователя с одной из ролей.
+
+    Без ролей проверяется только, что аккаунт не заблокирован. approved -
+    заявка одобрена, company - пользователь привязан к компании, api -
+    отказ ответом JSON 403 вместо сообщения и перехода на вход.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def wrapper(request, *args, **kwargs):
+                reason = access_denied(await request.auser(), roles, approved, company)
+                if reason:
+                    return deny(request, reason, api)
+                return await view_func(request, *args, **kwargs)
+        else:
+            @wraps(view_func)
+            def wrapper(request, *args, **kwargs):
+                reason = access_denied(request.user, roles, approved, company)
+                if reason:
+                    return deny(request, reason, api)
+                return view_func(request, *args, **kwargs)
+        return login_required(wrapper)
+    return decorator
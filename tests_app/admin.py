@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Company, CustomUser, Category, Test, Question, Option, TestAssignment, Answer, Notification, CompanyInvitation
+from django.utils import timezone
+from .models import Company, CustomUser, Category, Test, Question, Option, TestAssignment, Answer, Notification, CompanyInvitation, TestStats, Job
 
 @admin.register(Company)
 class CompanyAdmin(admin.ModelAdmin):
@@ -58,6 +59,22 @@ class TestAssignmentAdmin(admin.ModelAdmin):
     list_display = ('test', 'applicant', 'is_active', 'is_accepted')
     list_filter = ('is_active', 'is_accepted')
 
+@admin.register(TestStats)
+class TestStatsAdmin(admin.ModelAdmin):
+    list_display = ('test', 'assigned_count', 'completed_count', 'score_sum')
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'status', 'attempts', 'run_after', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('idempotency_key',)
+    actions = ['retry_jobs']
+
+    def retry_jobs(self, request, queryset):
+        count = queryset.filter(status='failed').update(status='pending', attempts=0, run_after=timezone.now())
+        self.message_user(request, f"Повторно поставлено задач: {count}.")
+    retry_jobs.short_description = "Повторить выбранные задачи с ошибкой"
+
 @admin.register(Answer)
 class AnswerAdmin(admin.ModelAdmin):
     list_display = ('question', 'assignment', 'answer_text', 'is_submitted')
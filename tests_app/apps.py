@@ -2,4 +2,11 @@ from django.apps import AppConfig
 
 class TestsAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'tests_app'
\ No newline at end of file
+    name = 'tests_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # Регистрирует обработчик send_invitations в очереди задач
+        from . import outbox  # noqa: F401
+        # Регистрирует проверку static/vendor/ для manage.py check
+        from . import assets  # noqa: F401
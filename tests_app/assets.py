@@ -0,0 +1,55 @@
+"""Сторонние библиотеки фронтенда.
+
+Файлы в репозиторий не входят: python manage.py vendor_assets скачивает их
+в static/vendor/ и сверяет с закреплёнными суммами sha384, запускать его
+нужно до collectstatic. Дальше они раздаются вместе со статикой проекта
+(с хэшем в имени и сжатыми копиями, см. storage.py). CDN в шаблонах не
+используется; если файла нет, об этом предупреждает manage.py check.
+"""
+import base64
+import hashlib
+import os
+from django.conf import settings
+from django.core import checks
+from django.templatetags.static import static
+
+# имя -> (путь в static/, адрес закреплённой версии, сумма sha384 в формате SRI)
+VENDOR_ASSETS = {
+    'bootstrap.css': ('vendor/bootstrap/bootstrap.min.css',
+                      'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+                      'sha384-9ndCyUaIbzAi2FUVXJi0CjmCapSmO7SnpJef0486qhLnuZ2cdeRhO02iuK6FUUVM'),
+    'bootstrap.js': ('vendor/bootstrap/bootstrap.bundle.min.js',
+                     'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+                     'sha384-geWF76RCwLtnZ8qwWowPQNguL3RmwHVBC9FhGdlKrxdiJJigb/j/68SIy3Te4Bkz'),
+    # Chart.js не публикует суммы; None - ещё не закреплена, vendor_assets
+    # откажется сохранять файл и покажет сумму скачанного для проверки
+    'chart.js': ('vendor/chart.js/chart.umd.js',
+                 'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.js',
+                 None),
+}
+
+
+def integrity(content):
+    """Сумма содержимого в формате Subresource Integrity: sha384-<base64>."""
+    return 'sha384-' + base64.b64encode(hashlib.sha384(content).digest()).decode()
+
+
+def vendor_path(path):
+    return os.path.join(settings.STATICFILES_DIRS[0], path)
+
+
+def vendor_url(name):
+    path, _, _ = VENDOR_ASSETS[name]
+    return static(path)
+
+
+@checks.register(checks.Tags.staticfiles)
+def check_vendor_assets(app_configs, **kwargs):
+    missing = [path for path, _, _ in VENDOR_ASSETS.values() if not os.path.exists(vendor_path(path))]
+    if not missing:
+        return []
+    return [checks.Warning(
+        f'Нет файлов сторонних библиотек: {", ".join(missing)}.',
+        hint='Запустите python manage.py vendor_assets до collectstatic.',
+        id='tests_app.W001',
+    )]
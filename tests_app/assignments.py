@@ -0,0 +1,32 @@
+from django.db import transaction
+from .jobs import enqueue
+from .models import TestAssignment
+from . import stats
+
+ASSIGN_BATCH_SIZE = 500
+
+
+def assign_test_bulk(test, applicants, notify=True):
+    """Назначает тест набору соискателей пачкой.
+
+    Соискатели, которым тест уже назначен, пропускаются. Назначения
+    создаются через bulk_create, уведомления ставятся в очередь задач.
+    Возвращает (создано, пропущено).
+    """
+    applicant_ids = set(applicants.values_list('id', flat=True))
+    existing = set(TestAssignment.objects.filter(test=test, applicant_id__in=applicant_ids).values_list(
+        'applicant_id', flat=True))
+    new_ids = sorted(applicant_ids - existing)
+    if not new_ids:
+        return 0, len(existing)
+    with transaction.atomic():
+        TestAssignment.objects.bulk_create(
+            [TestAssignment(test=test, applicant_id=applicant_id) for applicant_id in new_ids],
+            batch_size=ASSIGN_BATCH_SIZE)
+        # bulk_create не отправляет сигналы, счётчики обновляем явно
+        stats.record_assigned(test, len(new_ids))
+        if notify:
+            # Рассылку уведомлений выполняет воркер, запрос не ждёт вставки. Без test_id:
+            # привязанное к тесту уведомление одно на пару, это уведомление о решении
+            enqueue('notify', {'user_ids': new_ids, 'message': f"Вам назначен тест '{test.title}'."})
+    return len(new_ids), len(existing)
@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import ObjectDoesNotExist
+
+
+class CompanyModelBackend(ModelBackend):
+    """ModelBackend, загружающий пользователя из сессии вместе с компанией.
+
+    Почти каждая view обращается к request.user.company; без select_related
+    это отдельный запрос на каждый запрос пользователя.
+    """
+
+    def user_queryset(self):
+        return get_user_model()._default_manager.select_related('company')
+
+    def get_user(self, user_id):
+        try:
+            user = self.user_queryset().get(pk=user_id)
+        except ObjectDoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        try:
+            user = await self.user_queryset().aget(pk=user_id)
+        except ObjectDoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
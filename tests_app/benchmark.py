@@ -0,0 +1,313 @@
+"""Нагрузочный прогон сценария соискателя и страниц работодателя.
+
+Используется командой manage.py benchmark: заполняет отдельную тестовую
+базу синтетическими данными, параллельно гоняет запросы через тестовый
+клиент Django и сравнивает задержки и число запросов с сохранённым
+базовым результатом.
+
+Сценарии гоняются как под WSGI (concurrency потоков, каждый держит
+одного соискателя от начала до конца), так и под ASGI (все соискатели
+одновременно в одном цикле событий). Пауза think между ответами
+моделирует время на размышление, когда соединение простаивает.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.contrib.auth.hashers import make_password
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from .assignments import assign_test_bulk
+from .models import Category, Company, CustomUser, Test, Question, Option, TestAssignment
+
+BENCH_PREFIX = 'bench'
+
+# response.context тестового клиента собирается глобальным сигналом и в
+# нескольких потоках перемешивается, поэтому вопрос читаем из HTML страницы
+QUESTION_ID = re.compile(r'data-question-id="(\d+)"')
+OPTION_INPUT = re.compile(r'<input type="(checkbox|radio)" name="option" value="(\d+)"')
+
+
+def percentile(values, pct):
+    """Перцентиль по методу ближайшего ранга."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = max(1, round(pct / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+# ---------- данные ----------
+
+def seed(companies=1, questions=20, applicants=50, seed_value=0, prefix=BENCH_PREFIX):
+    """Создаёт компании с работодателем, тестом из N вопросов и M соискателями."""
+    rnd = random.Random(seed_value)
+    password = make_password('benchmark')
+    category = Category.objects.create(name=f'{prefix} category')
+    employers, assignments = [], []
+    for c in range(companies):
+        company = Company.objects.create(name=f'{prefix} company {c}', contact_email=f'{prefix}{c}@gmail.com',
+                                         is_approved=True)
+        employer = CustomUser.objects.create(username=f'{prefix}_employer_{c}', password=password,
+                                             role='employer', company=company, is_approved=True)
+        test = Test.objects.create(title=f'{prefix} test {c}', category=category, created_by=employer,
+                                   position='Программист')
+        created = Question.objects.bulk_create([
+            Question(test=test, text=f'Вопрос {n}', category=category, points=rnd.randint(1, 3),
+                     question_type=rnd.choice(['single', 'single', 'multiple', 'open']))
+            for n in range(questions)
+        ])
+        options = []
+        for question in created:
+            if question.question_type == 'open':
+                continue
+            correct = {0, 1} if question.question_type == 'multiple' else {0}
+            options += [Option(question=question, text=f'Вариант {k}', is_correct=k in correct) for k in range(4)]
+        Option.objects.bulk_create(options)
+        CustomUser.objects.bulk_create([
+            CustomUser(username=f'{prefix}_applicant_{c}_{n}', password=password, role='applicant',
+                       company=company, position='Программист')
+            for n in range(applicants)
+        ])
+        assign_test_bulk(test, CustomUser.objects.filter(company=company, role='applicant'), notify=True)
+        employers.append(employer)
+        assignments += list(TestAssignment.objects.filter(test=test).select_related('applicant'))
+    return employers, assignments
+
+
+# ---------- сценарии ----------
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def request(self, label, call):
+        start = time.perf_counter()
+        # Как WSGI-сервер: соединение с базой закрывается или остаётся по
+        # CONN_MAX_AGE (тестовый клиент сам этого не делает)
+        close_old_connections()
+        try:
+            response = call()
+        finally:
+            close_old_connections()
+        return self.record(label, start, response)
+
+    async def arequest(self, label, call):
+        start = time.perf_counter()
+        return self.record(label, start, await asgi_call(call))
+
+    def record(self, label, start, response):
+        self.latencies[label].append((time.perf_counter() - start) * 1000)
+        if 'X-DB-Query-Count' in response:
+            self.queries[label].append(int(response['X-DB-Query-Count']))
+        if response.status_code >= 400:
+            self.errors[label] += 1
+        return response
+
+    def merge(self, other):
+        for label, values in other.latencies.items():
+            self.latencies[label] += values
+        for label, values in other.queries.items():
+            self.queries[label] += values
+        for label, count in other.errors.items():
+            self.errors[label] += count
+
+
+async def asgi_call(call):
+    """Как ASGIHandler: синхронные части запроса выполняются в своём потоке,
+    соединения этого потока закрываются по CONN_MAX_AGE до и после запроса."""
+    async with ThreadSensitiveContext():
+        await sync_to_async(close_old_connections)()
+        try:
+            return await call()
+        finally:
+            await sync_to_async(close_old_connections)()
+
+
+def answer_payload(html):
+    """Ответ на вопрос со страницы take_test: первые варианты или текст."""
+    payload = {'question_id': int(QUESTION_ID.search(html).group(1)), 'time_taken': 1}
+    options = OPTION_INPUT.findall(html)
+    if not options:
+        payload['answer_text'] = 'Развёрнутый ответ'
+    elif options[0][0] == 'checkbox':
+        payload['selected_option_ids'] = [int(option_id) for _, option_id in options[:2]]
+    else:
+        payload['selected_option_id'] = int(options[0][1])
+    return payload
+
+
+def applicant_flow(assignment, think=0):
+    """Полное прохождение: вопрос за вопросом, затем страница результата."""
+    recorder = Recorder()
+    client = Client()
+    try:
+        client.force_login(assignment.applicant)
+        url = reverse('take_test', args=[assignment.id])
+        while True:
+            response = recorder.request('take_test GET', lambda: client.get(url))
+            if response.status_code != 200:
+                break
+            payload = json.dumps(answer_payload(response.content.decode()))
+            time.sleep(think)
+            recorder.request('take_test POST', lambda: client.post(url, payload, content_type='application/json'))
+        result_url = reverse('test_result', args=[assignment.id])
+        recorder.request('test_result', lambda: client.get(result_url))
+    finally:
+        connections.close_all()
+    return recorder
+
+
+def employer_flow(employer, requests):
+    recorder = Recorder()
+    client = Client()
+    try:
+        client.force_login(employer)
+        for n in range(requests):
+            name = 'employer_reports' if n % 2 else 'employer_dashboard'
+            recorder.request(name, lambda: client.get(reverse(name)))
+    finally:
+        connections.close_all()
+    return recorder
+
+
+async def applicant_flow_async(assignment, think=0):
+    recorder = Recorder()
+    client = AsyncClient()
+    await asgi_call(lambda: client.aforce_login(assignment.applicant))
+    url = reverse('take_test', args=[assignment.id])
+    while True:
+        response = await recorder.arequest('take_test GET', lambda: client.get(url))
+        if response.status_code != 200:
+            break
+        payload = json.dumps(answer_payload(response.content.decode()))
+        await asyncio.sleep(think)
+        await recorder.arequest('take_test POST', lambda: client.post(url, payload, content_type='application/json'))
+    result_url = reverse('test_result', args=[assignment.id])
+    await recorder.arequest('test_result', lambda: client.get(result_url))
+    return recorder
+
+
+async def employer_flow_async(employer, requests):
+    recorder = Recorder()
+    client = AsyncClient()
+    await asgi_call(lambda: client.aforce_login(employer))
+    for n in range(requests):
+        name = 'employer_reports' if n % 2 else 'employer_dashboard'
+        await recorder.arequest(name, lambda: client.get(reverse(name)))
+    return recorder
+
+
+def build_jobs(employers, assignments, employer_requests):
+    """Список сценариев: ('applicant', назначение) и ('employer', работодатель)."""
+    jobs = [('applicant', a) for a in assignments]
+    per_employer = max(1, employer_requests // max(1, len(employers)))
+    # Страницы работодателя открываются, пока соискатели проходят тест
+    for employer in employers:
+        for _ in range(max(1, per_employer // 10)):
+            jobs.insert(len(jobs) // 2, ('employer', employer))
+    return jobs
+
+
+def run(employers, assignments, concurrency=8, employer_requests=20, think=0):
+    """Гоняет сценарии в concurrency потоках (WSGI) и возвращает сводку по эндпоинтам."""
+    total = Recorder()
+    flows = {'applicant': lambda a: applicant_flow(a, think), 'employer': lambda e: employer_flow(e, 10)}
+    jobs = build_jobs(employers, assignments, employer_requests)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for recorder in pool.map(lambda job: flows[job[0]](job[1]), jobs):
+            total.merge(recorder)
+    elapsed = time.perf_counter() - started
+    return summarize(total, elapsed, server='wsgi', concurrency=concurrency)
+
+
+def run_asgi(employers, assignments, connections_limit=None, employer_requests=20, think=0):
+    """То же под ASGI: до connections_limit сценариев одновременно (по умолчанию все) в одном цикле событий."""
+    jobs = build_jobs(employers, assignments, employer_requests)
+    limit = connections_limit or len(jobs)
+
+    async def main():
+        semaphore = asyncio.Semaphore(limit)
+
+        async def flow(kind, obj):
+            async with semaphore:
+                if kind == 'applicant':
+                    return await applicant_flow_async(obj, think)
+                return await employer_flow_async(obj, 10)
+
+        return await asyncio.gather(*(flow(kind, obj) for kind, obj in jobs))
+
+    total = Recorder()
+    started = time.perf_counter()
+    for recorder in asyncio.run(main()):
+        total.merge(recorder)
+    elapsed = time.perf_counter() - started
+    return summarize(total, elapsed, server='asgi', concurrency=limit)
+
+
+def settings_profile():
+    """Настройки, от которых зависит стоимость каждого запроса."""
+    database = settings.DATABASES['default']
+    return {
+        'settings': settings.SETTINGS_MODULE,
+        'conn_max_age': database.get('CONN_MAX_AGE', 0),
+        'pool': bool(database.get('OPTIONS', {}).get('pool')),
+        'cache': settings.CACHES['default']['BACKEND'].rsplit('.', 1)[-1],
+        'sessions': settings.SESSION_ENGINE.rsplit('.', 1)[-1],
+    }
+
+
+def summarize(recorder, elapsed, server='wsgi', concurrency=None):
+    endpoints = {}
+    for label, values in sorted(recorder.latencies.items()):
+        queries = recorder.queries.get(label) or [0]
+        endpoints[label] = {
+            'requests': len(values),
+            'errors': recorder.errors.get(label, 0),
+            'p50_ms': round(percentile(values, 50), 2),
+            'p95_ms': round(percentile(values, 95), 2),
+            'p99_ms': round(percentile(values, 99), 2),
+            'queries_avg': round(sum(queries) / len(queries), 2),
+            'queries_max': max(queries),
+        }
+    requests = sum(e['requests'] for e in endpoints.values())
+    return {
+        'server': server,
+        'concurrency': concurrency,
+        'profile': settings_profile(),
+        'elapsed_s': round(elapsed, 2),
+        'requests': requests,
+        'throughput_rps': round(requests / elapsed, 1) if elapsed else 0,
+        'endpoints': endpoints,
+    }
+
+
+# ---------- сравнение с базовым прогоном ----------
+
+COMPARED_METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'queries_max')
+
+
+def compare(result, baseline, threshold=0.2):
+    """Строки сравнения и список регрессий (рост метрики больше threshold)."""
+    rows, regressions = [], []
+    for label, current in result['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(label)
+        if not previous:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = previous.get(metric, 0), current[metric]
+            change = (new - old) / old if old else 0.0
+            rows.append((label, metric, old, new, change))
+            # Число запросов должно совпадать точно, задержки - в пределах порога
+            if (metric == 'queries_max' and new > old) or (metric != 'queries_max' and change > threshold):
+                regressions.append((label, metric, old, new, change))
+    return rows, regressions
@@ -0,0 +1,100 @@
+import time
+from django.core.cache import cache
+from django.db import transaction
+from .models import Test, Question, Option
+
+# ---------- содержимое тестов ----------
+
+TEST_CONTENT_TIMEOUT = 24 * 60 * 60
+
+
+def content_version_key(test_id):
+    return f'test_content_version:{test_id}'
+
+
+def content_key(test_id, version):
+    return f'test_content:{test_id}:{version}'
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Начинаем со времени, а не с 1: если ключ версии вытеснен из кэша,
+        # старое содержимое под прежней версией не должно вернуться
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def content_version(test_id):
+    return get_version(content_version_key(test_id))
+
+
+def bump_content_version(test_id):
+    """Сбрасывает кэш содержимого теста после изменения вопросов или вариантов."""
+    try:
+        cache.incr(content_version_key(test_id))
+    except ValueError:
+        cache.set(content_version_key(test_id), time.time_ns(), None)
+
+
+def test_content(test_id):
+    """Название, вопросы и варианты теста без признака правильности.
+
+    Одно и то же содержимое читают все соискатели, проходящие тест, поэтому
+    оно кэшируется под ключом с версией; bump_content_version делает его
+    устаревшим.
+    """
+    key = content_key(test_id, content_version(test_id))
+    content = cache.get(key)
+    if content is None:
+        questions = list(Question.objects.filter(test_id=test_id).order_by('id').values(
+            'id', 'text', 'time_per_question', 'question_type'))
+        options = {}
+        for option_id, question_id, text in Option.objects.filter(
+                question__test_id=test_id).order_by('id').values_list('id', 'question_id', 'text'):
+            options.setdefault(question_id, []).append({'id': option_id, 'text': text})
+        for question in questions:
+            question['options'] = options.get(question['id'], [])
+        content = {
+            'title': Test.objects.filter(id=test_id).values_list('title', flat=True).first(),
+            'questions': questions,
+        }
+        cache.set(key, content, TEST_CONTENT_TIMEOUT)
+    return content
+
+
+# ---------- фрагменты шаблонов ----------
+
+# Фрагменты устаревают по версии, время жизни только ограничивает память
+FRAGMENT_TIMEOUT = 60 * 60
+
+# Идентификатор общих фрагментов: все категории, все соискатели (работодатель без компании)
+SHARED = 0
+
+
+def fragment_version_key(scope, obj_id):
+    return f'fragment_version:{scope}:{obj_id}'
+
+
+def fragment_versions(**scopes):
+    """Версии для ключей {% cache %} одним чтением из кэша.
+
+    fragment_versions(user=1, company=2) -> {'user': ..., 'company': ..., 'timeout': FRAGMENT_TIMEOUT}
+    """
+    keys = {scope: fragment_version_key(scope, obj_id) for scope, obj_id in scopes.items()}
+    found = cache.get_many(keys.values())
+    versions = {scope: found.get(key) or get_version(key) for scope, key in keys.items()}
+    versions['timeout'] = FRAGMENT_TIMEOUT
+    return versions
+
+
+def reset_fragments(scope, obj_ids):
+    """Делает устаревшими фрагменты пользователей или компаний после коммита.
+
+    Ключ версии удаляется, и следующее чтение начинает новую версию, поэтому
+    сброс для многих объектов - один delete_many.
+    """
+    keys = [fragment_version_key(scope, obj_id) for obj_id in set(obj_ids) if obj_id is not None]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
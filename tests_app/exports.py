@@ -0,0 +1,192 @@
+import csv
+import re
+import zipfile
+from xml.sax.saxutils import escape
+from asgiref.sync import sync_to_async
+from .grading import AnswerKey
+from .models import Question
+
+EXPORT_CHUNK_SIZE = 2000
+# Сколько данных асинхронный поток забирает из генератора за один переход в поток, байт (примерно)
+ASYNC_BUFFER_SIZE = 64 * 1024
+
+EXPORT_HEADER = [
+    'ID назначения', 'Тест', 'Соискатель', 'Email', 'Статус', 'Дата завершения',
+    'Итоговый балл', 'Максимальный балл', 'Вопрос', 'Тип вопроса', 'Ответ', 'Баллы за вопрос', 'Время ответа (сек)',
+]
+
+# Символы, которые запрещены в XML 1.0
+ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def status_label(is_accepted, is_rejected):
+    if is_accepted:
+        return 'Принят'
+    if is_rejected:
+        return 'Отклонён'
+    return 'Ожидает'
+
+
+def export_rows(assignments):
+    """Строки выгрузки: по одной на ответ, назначения без ответов - одной строкой.
+
+    Читает базу через iterator(), поэтому память не растёт с размером выгрузки.
+    """
+    type_labels = dict(Question._meta.get_field('question_type').choices)
+    keys = AnswerKey.for_tests(assignments.order_by().values_list('test_id', flat=True).distinct())
+    assignments = assignments.order_by('id', 'answer__question_id')
+    rows = assignments.values_list(
+        'id', 'test_id', 'test__title', 'applicant__username', 'applicant__email',
+        'is_accepted', 'is_rejected', 'finished_at', 'graded_at', 'auto_score', 'manual_score', 'max_score',
+        'answer__question_id', 'answer__question__text', 'answer__question__question_type',
+        'answer__selected_option_id', 'answer__answer_text', 'answer__manual_points', 'answer__time_taken',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for (assignment_id, test_id, title, username, email, is_accepted, is_rejected, finished_at, graded_at,
+         auto_score, manual_score, max_score, question_id, question_text, question_type,
+         selected_option_id, answer_text, manual_points, time_taken) in rows:
+        row = [
+            assignment_id, title, username, email, status_label(is_accepted, is_rejected),
+            finished_at.strftime('%Y-%m-%d %H:%M') if finished_at else '',
+            auto_score + manual_score if graded_at else '', max_score if graded_at else '',
+        ]
+        if question_id is None:
+            yield row + ['', '', '', '', '']
+            continue
+        key = keys[test_id]
+        score = key.score_answer(question_id, selected_option_id, answer_text, manual_points)
+        answer = '; '.join(key.selected_texts(question_id, selected_option_id, answer_text))
+        yield row + [question_text, type_labels.get(question_type, question_type), answer, score, time_taken]
+
+
+class Echo:
+    """Псевдо-файл для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows, header=EXPORT_HEADER):
+    writer = csv.writer(Echo())
+    # BOM, чтобы Excel правильно открыл UTF-8
+    yield '\ufeff' + writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+class ChunkBuffer:
+    """Буфер без seek, в который zipfile пишет архив по частям."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+XLSX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def xlsx_cell(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    text = escape(ILLEGAL_XML_CHARS.sub('', '' if value is None else str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def xlsx_rows(rows):
+    return ''.join('<row>' + ''.join(map(xlsx_cell, row)) + '</row>' for row in rows).encode('utf-8')
+
+
+def stream_xlsx(rows, header=EXPORT_HEADER, sheet_name='Результаты', rows_per_chunk=500):
+    """Пишет XLSX потоком: строки листа сжимаются и отдаются по мере чтения."""
+    buffer = ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', XLSX_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', XLSX_RELS)
+        archive.writestr('xl/workbook.xml', XLSX_WORKBOOK.format(name=escape(sheet_name)))
+        archive.writestr('xl/_rels/workbook.xml.rels', XLSX_WORKBOOK_RELS)
+        yield buffer.pop()
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            pending = [header]
+            for row in rows:
+                pending.append(row)
+                if len(pending) >= rows_per_chunk:
+                    sheet.write(xlsx_rows(pending))
+                    pending = []
+                    yield buffer.pop()
+            sheet.write(xlsx_rows(pending))
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.pop()
+
+
+def take(iterator, limit=ASYNC_BUFFER_SIZE):
+    """Следующие части генератора общим размером около limit; пустой список - конец."""
+    parts, size = [], 0
+    for part in iterator:
+        parts.append(part)
+        size += len(part)
+        if size >= limit:
+            break
+    return parts
+
+
+async def aiterate(parts):
+    """Асинхронная обёртка над stream_csv / stream_xlsx для ASGI.
+
+    Синхронный итератор StreamingHttpResponse под ASGI Django читает
+    целиком (sync_to_async(list)), и выгрузка оказалась бы в памяти.
+    Здесь генератор продвигается небольшими порциями, каждая - в потоке
+    запроса (thread_sensitive), где живёт курсор iterator() к базе.
+    """
+    iterator = iter(parts)
+    while True:
+        chunk = await sync_to_async(take)(iterator)
+        if not chunk:
+            return
+        for part in chunk:
+            yield part
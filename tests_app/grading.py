@@ -0,0 +1,237 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Test, Question, Option, Answer, TestAssignment
+from . import stats
+
+# Поля Answer, которых достаточно для подсчёта баллов
+ANSWER_FIELDS = ('assignment_id', 'question_id', 'selected_option_id', 'answer_text', 'manual_points')
+# Поля TestAssignment, в которых хранится результат проверки
+SCORE_FIELDS = ('auto_score', 'manual_score', 'max_score', 'graded_at')
+
+
+class QuestionKey:
+    """Ключ одного вопроса: тип, баллы и правильные варианты."""
+
+    def __init__(self, question_type, points, correct_ids, option_ids):
+        self.points = points
+        self.correct_ids = frozenset(correct_ids)
+        self.option_ids = frozenset(option_ids)
+        # Вопрос без вариантов ответа проверяется вручную, как открытый
+        if not self.option_ids:
+            self.kind = 'open'
+        elif question_type == 'multiple':
+            self.kind = 'multiple'
+        else:
+            self.kind = 'single'
+
+    @property
+    def is_manual(self):
+        return self.kind == 'open'
+
+
+class Score:
+    def __init__(self, auto=0, manual=0, max_auto=0, max_manual=0):
+        self.auto = auto
+        self.manual = manual
+        self.max_auto = max_auto
+        self.max_manual = max_manual
+
+    @property
+    def total(self):
+        return self.auto + self.manual
+
+    @property
+    def max_total(self):
+        return self.max_auto + self.max_manual
+
+
+def parse_option_ids(answer_text):
+    ids = set()
+    for part in (answer_text or '').split(','):
+        part = part.strip()
+        if part.isdigit():
+            ids.add(int(part))
+    return frozenset(ids)
+
+
+class AnswerKey:
+    """Ключ ответов теста, собирается один раз и проверяет ответы в памяти."""
+
+    def __init__(self, questions, option_texts):
+        self.questions = questions
+        self.option_texts = option_texts
+
+    @classmethod
+    def for_tests(cls, test_ids):
+        """Ключи для нескольких тестов за два запроса: {test_id: AnswerKey}."""
+        test_ids = set(test_ids)
+        correct = defaultdict(set)
+        options = defaultdict(set)
+        option_texts = defaultdict(dict)
+        rows = Option.objects.filter(question__test_id__in=test_ids).values_list(
+            'id', 'question_id', 'question__test_id', 'text', 'is_correct')
+        for option_id, question_id, test_id, text, is_correct in rows:
+            options[question_id].add(option_id)
+            option_texts[test_id][option_id] = text
+            if is_correct:
+                correct[question_id].add(option_id)
+        questions = defaultdict(dict)
+        rows = Question.objects.filter(test_id__in=test_ids).values_list('id', 'test_id', 'question_type', 'points')
+        for question_id, test_id, question_type, points in rows:
+            questions[test_id][question_id] = QuestionKey(
+                question_type, points, correct[question_id], options[question_id])
+        return {test_id: cls(questions[test_id], option_texts[test_id]) for test_id in test_ids}
+
+    @classmethod
+    def for_test(cls, test):
+        test_id = getattr(test, 'pk', test)
+        return cls.for_tests([test_id])[test_id]
+
+    def selected_ids(self, question_id, selected_option_id, answer_text):
+        key = self.questions.get(question_id)
+        if key is None or key.is_manual:
+            return frozenset()
+        if key.kind == 'multiple':
+            return parse_option_ids(answer_text)
+        return frozenset([selected_option_id]) if selected_option_id else frozenset()
+
+    def score_answer(self, question_id, selected_option_id=None, answer_text='', manual_points=0):
+        key = self.questions.get(question_id)
+        if key is None:
+            return 0
+        if key.is_manual:
+            return manual_points or 0
+        selected = self.selected_ids(question_id, selected_option_id, answer_text)
+        if key.kind == 'multiple':
+            return key.points if key.correct_ids and selected == key.correct_ids else 0
+        return key.points if selected and selected <= key.correct_ids else 0
+
+    def selected_texts(self, question_id, selected_option_id=None, answer_text=''):
+        key = self.questions.get(question_id)
+        if key is None or key.is_manual:
+            return [answer_text] if answer_text else []
+        selected = self.selected_ids(question_id, selected_option_id, answer_text)
+        return [self.option_texts[i] for i in sorted(selected) if i in self.option_texts]
+
+    def empty_score(self):
+        score = Score()
+        for key in self.questions.values():
+            if key.is_manual:
+                score.max_manual += key.points
+            else:
+                score.max_auto += key.points
+        return score
+
+    def score(self, answers):
+        """Баллы по строкам ответов (словари с полями ANSWER_FIELDS)."""
+        score = self.empty_score()
+        for row in answers:
+            key = self.questions.get(row['question_id'])
+            if key is None:
+                continue
+            points = self.score_answer(row['question_id'], row['selected_option_id'],
+                                       row['answer_text'], row['manual_points'])
+            if key.is_manual:
+                score.manual += points
+            else:
+                score.auto += points
+        return score
+
+
+def answer_rows(assignment_ids):
+    """Все ответы назначений одним запросом: {assignment_id: [row, ...]}."""
+    grouped = defaultdict(list)
+    for row in Answer.objects.filter(assignment_id__in=assignment_ids).values(*ANSWER_FIELDS):
+        grouped[row['assignment_id']].append(row)
+    return grouped
+
+
+def score_assignments(assignments, keys=None):
+    """Баллы для пачки назначений: {assignment_id: Score}."""
+    assignments = list(assignments)
+    if keys is None:
+        keys = AnswerKey.for_tests(a.test_id for a in assignments)
+    rows = answer_rows([a.id for a in assignments])
+    return {a.id: keys[a.test_id].score(rows.get(a.id, [])) for a in assignments}
+
+
+def score_assignment(assignment, key=None):
+    key = key or AnswerKey.for_test(assignment.test_id)
+    return key.score(answer_rows([assignment.id]).get(assignment.id, []))
+
+
+def apply_score(assignment, score, graded_at=None):
+    assignment.auto_score = score.auto
+    assignment.manual_score = score.manual
+    assignment.max_score = score.max_total
+    assignment.graded_at = graded_at or timezone.now()
+
+
+def grade_assignment(assignment, key=None):
+    """Считает баллы и сохраняет их в назначении.
+
+    Воркер и test_result могут проверять одно назначение одновременно, а
+    экземпляр в памяти бывает устаревшим. Поэтому первую проверку
+    забирает условный UPDATE (graded_at ещё пуст), и только он
+    засчитывает завершение в TestStats; остальные - перепроверка, для
+    которой прежние баллы перечитываются под блокировкой строки.
+    """
+    score = score_assignment(assignment, key)
+    graded_at = timezone.now()
+    values = {'auto_score': score.auto, 'manual_score': score.manual, 'max_score': score.max_total,
+              'graded_at': graded_at}
+    if TestAssignment.objects.filter(id=assignment.id, graded_at__isnull=True).update(**values):
+        apply_score(assignment, score, graded_at)
+        stats.record_graded(assignment, False, 0)
+        return
+    with transaction.atomic():
+        old = TestAssignment.objects.select_for_update().filter(id=assignment.id).values_list(
+            'auto_score', 'manual_score').first()
+        if old is None:
+            # Назначение удалили
+            return
+        TestAssignment.objects.filter(id=assignment.id).update(**values)
+        apply_score(assignment, score, graded_at)
+        stats.record_graded(assignment, True, sum(old))
+
+
+def grade_assignments(assignments, keys=None):
+    """То же для пачки назначений: один запрос на ответы и один bulk_update.
+
+    Прежние баллы перечитываются под блокировкой строк, как в grade_assignment.
+    """
+    assignments = list(assignments)
+    now = timezone.now()
+    scores = score_assignments(assignments, keys)
+    completed = defaultdict(int)
+    score_delta = defaultdict(int)
+    with transaction.atomic():
+        current = {row[0]: row[1:] for row in TestAssignment.objects.select_for_update().filter(
+            id__in=[a.id for a in assignments]).values_list('id', 'graded_at', 'auto_score', 'manual_score')}
+        assignments = [a for a in assignments if a.id in current]
+        for a in assignments:
+            graded_at, auto_score, manual_score = current[a.id]
+            if graded_at is None:
+                completed[a.test_id] += 1
+            else:
+                score_delta[a.test_id] -= auto_score + manual_score
+            apply_score(a, scores[a.id], now)
+            score_delta[a.test_id] += a.total_score
+        TestAssignment.objects.bulk_update(assignments, SCORE_FIELDS)
+        owners = dict(Test.objects.filter(id__in=score_delta).values_list('id', 'created_by_id'))
+        for test_id, delta in score_delta.items():
+            stats.bump(test_id, owners[test_id], completed=completed[test_id], score=delta)
+    return len(assignments)
+
+
+def update_manual_score(answer, old_points, owner_id):
+    """Переносит изменение ручных баллов ответа в уже проверенное назначение.
+
+    owner_id - автор теста, баллы меняет он сам.
+    """
+    delta = answer.manual_points - (old_points or 0)
+    if delta and TestAssignment.objects.filter(id=answer.assignment_id, graded_at__isnull=False).update(
+            manual_score=F('manual_score') + delta):
+        stats.bump(answer.assignment.test_id, owner_id, score=delta)
@@ -0,0 +1,149 @@
+"""Очередь фоновых задач в базе данных.
+
+View только ставят задачу (enqueue) и сразу отвечают; проверку
+результатов, рассылку уведомлений и писем выполняет воркер
+manage.py run_jobs. Задача пишется в той же транзакции, что и данные,
+поэтому не теряется и не выполняется по откатившимся изменениям.
+
+Упавшая задача повторяется с растущей задержкой до max_attempts раз.
+Обработчик выполняется в транзакции, поэтому повтор после ошибки не
+оставляет частично записанных данных. Обработчики с внешними эффектами
+(отправка писем) объявляются с atomic=False и сами фиксируют сделанное
+короткими записями: откат не должен терять отметку об уже ушедшем письме,
+а долгая работа не должна держать транзакцию. Ключ идемпотентности не
+даёт поставить одну и ту же работу дважды.
+"""
+import logging
+from contextlib import nullcontext
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from .grading import grade_assignment
+from .models import Job, TestAssignment, Notification
+from . import push
+
+logger = logging.getLogger('tests_app.jobs')
+
+# Задержка перед повтором: RETRY_DELAY * 2 ** (попытка - 1) секунд
+RETRY_DELAY = 10
+# Задача в статусе running дольше этого считается брошенной упавшим воркером
+STALE_TIMEOUT = timedelta(minutes=10)
+
+HANDLERS = {}
+
+
+def handler(kind, atomic=True):
+    def decorator(func):
+        func.atomic = atomic
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, payload, key=None, delay=0):
+    """Ставит задачу. Если задача с таким ключом уже есть, возвращает её."""
+    if kind not in HANDLERS:
+        raise ValueError(f'Неизвестный тип задачи: {kind}')
+    job = Job(kind=kind, payload=payload, idempotency_key=key,
+              run_after=timezone.now() + timedelta(seconds=delay))
+    if key is None:
+        job.save()
+    else:
+        try:
+            with transaction.atomic():
+                job.save()
+        except IntegrityError:
+            return Job.objects.get(idempotency_key=key)
+    if getattr(settings, 'JOBS_EAGER', False):
+        transaction.on_commit(lambda: run_job(job.id))
+    return job
+
+
+def claim(batch_size=10):
+    """Забирает пачку готовых задач и помечает их running.
+
+    На PostgreSQL несколько воркеров не получат одну задачу благодаря
+    SKIP LOCKED, без него каждая задача забирается отдельным условным
+    UPDATE.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = Job.objects.filter(status='pending', run_after__lte=now).order_by('run_after')
+        if connection.features.has_select_for_update_skip_locked:
+            ids = list(jobs.select_for_update(skip_locked=True).values_list('id', flat=True)[:batch_size])
+            Job.objects.filter(id__in=ids).update(status='running', locked_at=now)
+            return ids
+        return [job_id for job_id in jobs.values_list('id', flat=True)[:batch_size]
+                if Job.objects.filter(id=job_id, status='pending').update(status='running', locked_at=now)]
+
+
+def run_job(job_id):
+    """Выполняет одну задачу; ошибка планирует повтор или помечает задачу failed."""
+    job = Job.objects.get(id=job_id)
+    func = HANDLERS[job.kind]
+    try:
+        with transaction.atomic() if func.atomic else nullcontext():
+            func(**job.payload)
+    except Exception as e:
+        job.attempts += 1
+        job.last_error = f'{type(e).__name__}: {e}'
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+            logger.error('Задача %s #%s не выполнена: %s', job.kind, job.id, job.last_error)
+        else:
+            job.status = 'pending'
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_DELAY * 2 ** (job.attempts - 1))
+            logger.warning('Задача %s #%s упала, повтор %s: %s', job.kind, job.id, job.attempts, job.last_error)
+        job.locked_at = None
+        job.save(update_fields=['attempts', 'last_error', 'status', 'finished_at', 'run_after', 'locked_at'])
+        return False
+    job.attempts += 1
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.locked_at = None
+    job.save(update_fields=['attempts', 'status', 'finished_at', 'locked_at'])
+    return True
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи воркера, который упал посреди выполнения."""
+    return Job.objects.filter(status='running', locked_at__lt=timezone.now() - STALE_TIMEOUT).update(
+        status='pending', locked_at=None)
+
+
+def run_pending(batch_size=10):
+    """Выполняет все готовые задачи; возвращает число выполненных."""
+    total = 0
+    while True:
+        ids = claim(batch_size)
+        if not ids:
+            return total
+        for job_id in ids:
+            total += run_job(job_id)
+
+
+# ---------- обработчики ----------
+
+@handler('grade_assignment')
+def grade_assignment_job(assignment_id):
+    assignment = TestAssignment.objects.select_related('test').filter(id=assignment_id).first()
+    # Назначение могли удалить или уже проверить при открытии результата
+    if assignment is not None and assignment.graded_at is None:
+        grade_assignment(assignment)
+
+
+@handler('notify')
+def notify_job(user_ids, message, test_id=None, replace=False):
+    """Уведомления пользователям; replace - одно уведомление на пару (пользователь, тест)."""
+    if replace:
+        for user_id in user_ids:
+            Notification.objects.update_or_create(
+                user_id=user_id, test_id=test_id, defaults={'message': message, 'is_read': False})
+        return
+    Notification.objects.bulk_create(
+        [Notification(user_id=user_id, test_id=test_id, message=message) for user_id in user_ids],
+        batch_size=500)
+    # bulk_create не отправляет сигналы, открытые потоки будим сами
+    push.publish(user_ids)
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from tests_app.grading import AnswerKey, grade_assignments
+from tests_app.models import TestAssignment
+
+
+class Command(BaseCommand):
+    help = 'Заполняет сохранённые баллы у завершённых назначений пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--all', action='store_true', help='Пересчитать и уже проверенные назначения')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = TestAssignment.objects.filter(is_active=False).only('id', 'test_id', 'auto_score', 'manual_score', 'graded_at').order_by('id')
+        if not options['all']:
+            queryset = queryset.filter(graded_at__isnull=True)
+
+        keys = {}
+        total = 0
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            missing = {a.test_id for a in batch} - keys.keys()
+            if missing:
+                keys.update(AnswerKey.for_tests(missing))
+            total += grade_assignments(batch, keys)
+            last_id = batch[-1].id
+            self.stdout.write(f'Обработано назначений: {total}')
+        self.stdout.write(self.style.SUCCESS(f'Готово, пересчитано {total} назначений.'))
@@ -0,0 +1,150 @@
+import json
+import os
+import tempfile
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from tests_app import benchmark
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, 'benchmark_baseline.json')
+
+
+def baseline_path(path, server):
+    """Прогоны WSGI и ASGI сравниваются каждый со своим базовым: benchmark_baseline_asgi.json."""
+    if server == 'wsgi':
+        return path
+    root, ext = os.path.splitext(path)
+    return f'{root}_{server}{ext}'
+
+
+def format_profile(profile):
+    connections = 'пул' if profile['pool'] else f'CONN_MAX_AGE={profile["conn_max_age"]}'
+    return f'{profile["settings"]}, соединения: {connections}, кэш: {profile["cache"]}, сессии: {profile["sessions"]}'
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон прохождения теста, результата, отчётов и дашборда работодателя '
+            'на отдельной тестовой базе с синтетическими данными')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--companies', type=int, default=1)
+        parser.add_argument('--questions', type=int, default=20, help='Вопросов в тесте')
+        parser.add_argument('--applicants', type=int, default=50, help='Соискателей на компанию')
+        parser.add_argument('--concurrency', type=int, default=8, help='Параллельных потоков (WSGI)')
+        parser.add_argument('--server', choices=['wsgi', 'asgi', 'both'], default='wsgi',
+                            help='Через какой обработчик гонять запросы; both - оба по очереди на одинаковых данных')
+        parser.add_argument('--connections', type=int, default=None,
+                            help='Одновременных соискателей под ASGI (по умолчанию все)')
+        parser.add_argument('--think', type=float, default=0,
+                            help='Пауза соискателя перед ответом на вопрос, мс')
+        parser.add_argument('--employer-requests', type=int, default=40,
+                            help='Сколько раз открыть отчёты и дашборд работодателя')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                            help='Файл с базовым прогоном (для ASGI к имени добавляется _asgi)')
+        parser.add_argument('--save-baseline', action='store_true', help='Сохранить результат как базовый')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Допустимый рост задержки (0.2 = 20%%)')
+        parser.add_argument('--fail-on-regression', action='store_true', help='Код выхода 1 при регрессии')
+        parser.add_argument('--json', dest='json_output', help='Записать результат в файл')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        sqlite_file = None
+        if connection.vendor == 'sqlite':
+            # In-memory база SQLite не подходит для нескольких потоков
+            sqlite_file = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False).name
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = sqlite_file
+            connection.settings_dict.setdefault('OPTIONS', {}).setdefault('timeout', 30)
+        old_name = connection.settings_dict['NAME']
+        servers = ['wsgi', 'asgi'] if options['server'] == 'both' else [options['server']]
+        think = options['think'] / 1000
+        results = []
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            for server in servers:
+                # Каждый прогон - на свежих данных: тесты первого прогона уже пройдены
+                employers, assignments = benchmark.seed(
+                    companies=options['companies'], questions=options['questions'], applicants=options['applicants'],
+                    prefix=f'{benchmark.BENCH_PREFIX}_{server}')
+                self.stdout.write(f'База: {connection.vendor}, сервер: {server}, назначений: {len(assignments)}')
+                if server == 'wsgi':
+                    result = benchmark.run(employers, assignments, concurrency=options['concurrency'],
+                                           employer_requests=options['employer_requests'], think=think)
+                else:
+                    result = benchmark.run_asgi(employers, assignments, connections_limit=options['connections'],
+                                                employer_requests=options['employer_requests'], think=think)
+                result['database'] = connection.vendor
+                result['think_ms'] = options['think']
+                results.append(result)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            if sqlite_file and os.path.exists(sqlite_file):
+                os.remove(sqlite_file)
+
+        regressions = []
+        for result in results:
+            self.report(result)
+            baseline = baseline_path(options['baseline'], result['server'])
+            if options['json_output']:
+                self.write_json(baseline_path(options['json_output'], result['server']), result)
+            regressions += self.compare(result, baseline, options['threshold'])
+            if options['save_baseline']:
+                self.write_json(baseline, result)
+                self.stdout.write(self.style.SUCCESS(f'Базовый прогон сохранён в {baseline}'))
+        if len(results) == 2:
+            self.report_servers(*results)
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'Регрессий: {len(regressions)}')
+
+    def report(self, result):
+        self.stdout.write(f'\n{result["server"].upper()}, одновременно {result["concurrency"]}: '
+                          f'запросов {result["requests"]} за {result["elapsed_s"]} с, '
+                          f'{result["throughput_rps"]} запр/с')
+        self.stdout.write(f'Профиль: {format_profile(result["profile"])}')
+        self.stdout.write(f'{"Эндпоинт":<20}{"кол-во":>8}{"ошибки":>8}{"p50 мс":>10}{"p95 мс":>10}'
+                          f'{"p99 мс":>10}{"SQL ср":>8}{"SQL max":>8}')
+        for label, e in result['endpoints'].items():
+            self.stdout.write(f'{label:<20}{e["requests"]:>8}{e["errors"]:>8}{e["p50_ms"]:>10}{e["p95_ms"]:>10}'
+                              f'{e["p99_ms"]:>10}{e["queries_avg"]:>8}{e["queries_max"]:>8}')
+
+    def report_servers(self, wsgi, asgi):
+        self.stdout.write(f'\nWSGI / ASGI (пауза {wsgi["think_ms"]} мс):')
+        self.stdout.write(f'{"":<28}{"WSGI":>12}{"ASGI":>12}')
+        self.stdout.write(f'{"одновременно":<28}{wsgi["concurrency"]:>12}{asgi["concurrency"]:>12}')
+        self.stdout.write(f'{"запр/с":<28}{wsgi["throughput_rps"]:>12}{asgi["throughput_rps"]:>12}')
+        self.stdout.write(f'{"время, с":<28}{wsgi["elapsed_s"]:>12}{asgi["elapsed_s"]:>12}')
+        for label, e in wsgi['endpoints'].items():
+            other = asgi['endpoints'].get(label)
+            if other:
+                self.stdout.write(f'{label + " p95 мс":<28}{e["p95_ms"]:>12}{other["p95_ms"]:>12}')
+
+    def compare(self, result, path, threshold):
+        if not os.path.exists(path):
+            self.stdout.write(f'\nБазовый прогон {path} не найден, сравнение пропущено.')
+            return []
+        with open(path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('database') != result['database']:
+            self.stdout.write(self.style.WARNING(
+                f'\nБазовый прогон снят на {baseline.get("database")}, сравнение может быть некорректным.'))
+        if baseline.get('think_ms', 0) != result['think_ms']:
+            self.stdout.write(self.style.WARNING(
+                f'\nБазовый прогон снят с паузой {baseline.get("think_ms", 0)} мс, сравнение может быть некорректным.'))
+        if baseline.get('profile') and baseline['profile'] != result['profile']:
+            self.stdout.write(f'\nБазовый прогон снят с профилем: {format_profile(baseline["profile"])}')
+        rows, regressions = benchmark.compare(result, baseline, threshold)
+        self.stdout.write('\nСравнение с базовым прогоном:')
+        for label, metric, old, new, change in rows:
+            line = f'{label:<20}{metric:<12}{old:>10} -> {new:<10}{change:+.0%}'
+            is_regression = (label, metric, old, new, change) in regressions
+            self.stdout.write(self.style.ERROR(line) if is_regression else line)
+        if regressions:
+            self.stdout.write(self.style.ERROR(f'Регрессий: {len(regressions)}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
+        return regressions
+
+    def write_json(self, path, result):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
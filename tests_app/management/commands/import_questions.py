@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from tests_app.models import Test
+from tests_app.question_import import IMPORT_FORMATS, QuestionImportError, detect_format, import_questions
+
+
+class Command(BaseCommand):
+    help = 'Импортирует банк вопросов в тест из файла JSON, CSV или GIFT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_id', type=int)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='По умолчанию определяется по расширению')
+
+    def handle(self, *args, **options):
+        try:
+            test = Test.objects.get(id=options['test_id'])
+        except Test.DoesNotExist:
+            raise CommandError(f"Тест {options['test_id']} не найден.")
+        fmt = options['format'] or detect_format(options['path'])
+        if not fmt:
+            raise CommandError('Не удалось определить формат, укажите --format.')
+        with open(options['path'], encoding='utf-8-sig') as f:
+            content = f.read()
+        try:
+            created = import_questions(test, content, fmt)
+        except QuestionImportError as e:
+            for error in e.errors:
+                self.stderr.write(f"Строка {error['row']}: {' '.join(error['errors'])}")
+            raise CommandError('Импорт отменён, ничего не сохранено.')
+        self.stdout.write(self.style.SUCCESS(f'Импортировано вопросов: {created}.'))
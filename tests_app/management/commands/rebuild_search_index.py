@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from tests_app.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковый индекс тестов и вопросов'
+
+    def handle(self, *args, **options):
+        count = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Готово, проиндексировано тестов и вопросов: {count}.'))
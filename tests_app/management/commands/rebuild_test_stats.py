@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from tests_app.stats import rebuild_test_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики TestStats по данным назначений'
+
+    def handle(self, *args, **options):
+        count = rebuild_test_stats()
+        self.stdout.write(self.style.SUCCESS(f'Готово, пересчитано тестов: {count}.'))
@@ -0,0 +1,30 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from tests_app import jobs
+
+
+class Command(BaseCommand):
+    help = 'Воркер фоновых задач: проверка результатов, уведомления, письма'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--sleep', type=float, default=1.0, help='Пауза, когда очередь пуста, секунд')
+        parser.add_argument('--once', action='store_true', help='Выполнить готовые задачи и выйти')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Воркер запущен.')
+        try:
+            while True:
+                close_old_connections()
+                jobs.requeue_stale()
+                done = jobs.run_pending(options['batch_size'])
+                if done:
+                    self.stdout.write(f'Выполнено задач: {done}')
+                if options['once']:
+                    break
+                if not done:
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS('Воркер остановлен.'))
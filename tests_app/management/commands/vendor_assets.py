@@ -0,0 +1,43 @@
+import os
+from urllib.error import URLError
+from urllib.request import urlopen
+from django.core.management.base import BaseCommand, CommandError
+from tests_app.assets import VENDOR_ASSETS, integrity, vendor_path
+
+
+class Command(BaseCommand):
+    help = ('Скачивает закреплённые версии сторонних библиотек в static/vendor/ и сверяет их суммы sha384 '
+            '(запускать до collectstatic)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Скачать заново уже существующие файлы')
+
+    def handle(self, *args, **options):
+        for name, (path, url, expected) in VENDOR_ASSETS.items():
+            target = vendor_path(path)
+            exists = os.path.exists(target) and not options['force']
+            if exists:
+                # Уже скачанный файл тоже сверяется: его могли подменить или оборвать
+                with open(target, 'rb') as f:
+                    content = f.read()
+            else:
+                try:
+                    with urlopen(url, timeout=30) as response:
+                        content = response.read()
+                except URLError as e:
+                    raise CommandError(f'{name}: не удалось скачать {url}: {e}')
+            actual = integrity(content)
+            if expected is None:
+                raise CommandError(f'{name}: сумма не закреплена. Проверьте {url} и добавьте '
+                                   f'в VENDOR_ASSETS (tests_app/assets.py): {actual!r}')
+            if actual != expected:
+                source = path if exists else url
+                raise CommandError(f'{name}: сумма {source} не совпадает: ожидалась {expected}, получена {actual}')
+            if exists:
+                self.stdout.write(f'{name}: уже есть, пропущен')
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(content)
+            self.stdout.write(f'{name}: {path}, {len(content) // 1024} КБ')
+        self.stdout.write(self.style.SUCCESS('Готово. Теперь запустите collectstatic.'))
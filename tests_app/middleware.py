@@ -0,0 +1,126 @@
+import json
+import logging
+import re
+import time
+from collections import Counter
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('tests_app.queries')
+
+# Списки параметров IN (%s, %s, ...) разной длины считаем одним запросом
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(limit):
+    """Объявляет бюджет запросов к базе для view."""
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+    return decorator
+
+
+class QueryRecorder:
+    """Считает запросы через connection.execute_wrapper (работает и без DEBUG)."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.signatures = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.signatures[IN_LIST.sub('IN (...)', sql)] += 1
+
+    @property
+    def duplicates(self):
+        return {sql: n for sql, n in self.signatures.items() if n > 1}
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._wrapper.__exit__(*exc_info)
+
+
+class QueryBudgetMiddleware:
+    """Пишет число запросов, время в БД и повторяющиеся запросы каждого запроса.
+
+    Результат отдаётся в заголовках X-DB-* и строкой JSON в лог
+    tests_app.queries. Если у view объявлен бюджет (@query_budget) и он
+    превышен, пишется предупреждение, а при QUERY_BUDGET_STRICT = True
+    (режим тестов) выбрасывается QueryBudgetExceeded.
+
+    Работает и под ASGI без перехода в поток на каждый запрос: запросы
+    асинхронных view идут через sync_to_async в одном потоке на запрос,
+    и счётчик подключается к соединению этого потока.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.query_budget = None
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        return self.report(request, response, recorder)
+
+    async def __acall__(self, request):
+        request.query_budget = None
+        recorder = QueryRecorder()
+        await sync_to_async(recorder.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recorder.__exit__)(None, None, None)
+        return self.report(request, response, recorder)
+
+    def report(self, request, response, recorder):
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else None
+        duplicates = recorder.duplicates
+        response['X-DB-Query-Count'] = str(recorder.count)
+        response['X-DB-Time-Ms'] = f'{recorder.duration * 1000:.1f}'
+        response['X-DB-Duplicate-Queries'] = str(sum(duplicates.values()) - len(duplicates))
+
+        over_budget = request.query_budget is not None and recorder.count > request.query_budget
+        record = {
+            'view': view_name,
+            'path': request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 1),
+            'budget': request.query_budget,
+            'duplicates': [{'sql': sql[:200], 'count': n} for sql, n in duplicates.items()],
+        }
+        if over_budget:
+            logger.warning(json.dumps(record, ensure_ascii=False))
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(
+                    f'{view_name}: {recorder.count} запросов при бюджете {request.query_budget}; '
+                    f'повторы: {record["duplicates"]}')
+        else:
+            logger.info(json.dumps(record, ensure_ascii=False))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, 'query_budget', None)
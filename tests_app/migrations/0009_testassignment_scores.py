@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests_app', '0008_customuser_position'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testassignment',
+            name='auto_score',
+            field=models.PositiveIntegerField(default=0, help_text='Баллы за вопросы с вариантами ответа'),
+        ),
+        migrations.AddField(
+            model_name='testassignment',
+            name='graded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='testassignment',
+            name='manual_score',
+            field=models.PositiveIntegerField(default=0, help_text='Ручные баллы за открытые вопросы'),
+        ),
+        migrations.AddField(
+            model_name='testassignment',
+            name='max_score',
+            field=models.PositiveIntegerField(default=0, help_text='Максимально возможный балл'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:27
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def remove_duplicate_answers(apps, schema_editor):
+    # Оставляем по одному ответу на вопрос: отправленный и самый поздний
+    Answer = apps.get_model('tests_app', 'Answer')
+    duplicates = (Answer.objects.values('assignment_id', 'question_id')
+                  .annotate(n=Count('id')).filter(n__gt=1))
+    for row in duplicates:
+        answers = Answer.objects.filter(
+            assignment_id=row['assignment_id'], question_id=row['question_id']
+        ).order_by('-is_submitted', '-id')
+        keep = answers.first()
+        answers.exclude(id=keep.id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests_app', '0009_testassignment_scores'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_answers, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='answer',
+            unique_together={('assignment', 'question')},
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+
+
+def fill_test_stats(apps, schema_editor):
+    Test = apps.get_model('tests_app', 'Test')
+    TestStats = apps.get_model('tests_app', 'TestStats')
+    tests = Test.objects.annotate(
+        assigned=Count('testassignment'),
+        completed=Count('testassignment', filter=Q(testassignment__graded_at__isnull=False)),
+        score=Sum(F('testassignment__auto_score') + F('testassignment__manual_score'),
+                  filter=Q(testassignment__graded_at__isnull=False)),
+    )
+    TestStats.objects.bulk_create([
+        TestStats(test_id=t.id, assigned_count=t.assigned, completed_count=t.completed, score_sum=t.score or 0)
+        for t in tests
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests_app', '0010_answer_unique_per_question'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('assigned_count', models.IntegerField(default=0)),
+                ('completed_count', models.IntegerField(default=0)),
+                ('score_sum', models.IntegerField(default=0, help_text='Сумма итоговых баллов завершённых назначений')),
+                ('test', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='tests_app.test')),
+            ],
+        ),
+        migrations.RunPython(fill_test_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# icontains в PostgreSQL строится как UPPER("title"::text) LIKE UPPER(...),
+# поэтому триграммный индекс строится по тому же выражению.
+TRIGRAM_INDEX_SQL = (
+    'CREATE INDEX IF NOT EXISTS test_title_trgm_idx '
+    'ON tests_app_test USING gin ((UPPER("title"::text)) gin_trgm_ops)'
+)
+
+
+def create_title_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(TRIGRAM_INDEX_SQL)
+
+
+def drop_title_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS test_title_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('tests_app', '0011_teststats'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='answer',
+            name='assignment',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='tests_app.testassignment'),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='company',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='users', to='tests_app.company'),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='test',
+            name='created_by',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='testassignment',
+            name='applicant',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='assigned_tests', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['assignment', 'is_submitted'], name='answer_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['company', 'role', 'is_approved', 'is_active'], name='user_company_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', 'created_at'], name='notification_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['user'], name='notification_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='test',
+            index=models.Index(fields=['created_by', 'position', 'category'], name='test_owner_position_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testassignment',
+            index=models.Index(fields=['applicant', 'is_active'], name='assignment_applicant_idx'),
+        ),
+        migrations.RunPython(create_title_trigram_index, drop_title_trigram_index),
+    ]
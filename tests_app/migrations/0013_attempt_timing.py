@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests_app', '0012_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testassignment',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='testassignment',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='answer',
+            name='question',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='tests_app.question'),
+        ),
+        migrations.AlterField(
+            model_name='answer',
+            name='time_taken',
+            field=models.IntegerField(default=0, help_text='Секунды от показа вопроса до ответа по часам сервера'),
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['question', 'is_submitted', 'time_taken'], name='answer_question_time_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:46
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_sent(apps, schema_editor):
+    # Раньше приглашение сохранялось только после успешной отправки письма
+    Invitation = apps.get_model('tests_app', 'Invitation')
+    Invitation.objects.update(sent_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests_app', '0014_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invitation',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='invitation',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='invitation',
+            name='sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_sent, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Вектор считается самой базой при каждой записи строки: название теста или
+# текст вопроса весомее вариантов ответа. Конфигурация должна совпадать с
+# SEARCH_CONFIG в search.py.
+SEARCH_VECTOR_SQL = (
+    "ALTER TABLE tests_app_searchdocument ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('russian', title), 'A') || setweight(to_tsvector('russian', body), 'B')"
+    ") STORED"
+)
+SEARCH_INDEX_SQL = (
+    'CREATE INDEX IF NOT EXISTS search_document_vector_idx '
+    'ON tests_app_searchdocument USING gin (search_vector)'
+)
+
+
+def create_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(SEARCH_VECTOR_SQL)
+    schema_editor.execute(SEARCH_INDEX_SQL)
+
+
+def index_existing(apps, schema_editor):
+    Test = apps.get_model('tests_app', 'Test')
+    Question = apps.get_model('tests_app', 'Question')
+    SearchDocument = apps.get_model('tests_app', 'SearchDocument')
+    SearchDocument.objects.bulk_create([
+        SearchDocument(key=f'test:{test.id}', test_id=test.id, title=test.title, body=test.position or '')
+        for test in Test.objects.only('id', 'title', 'position').iterator()
+    ], batch_size=500)
+    SearchDocument.objects.bulk_create([
+        SearchDocument(key=f'question:{question.id}', test_id=question.test_id, question_id=question.id,
+                       title=question.text, body='\n'.join(option.text for option in question.option_set.all()))
+        for question in Question.objects.prefetch_related('option_set').iterator(chunk_size=500)
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests_app', '0015_invitation_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=40, unique=True)),
+                ('title', models.TextField(help_text='Название теста или текст вопроса')),
+                ('body', models.TextField(blank=True, help_text='Должность теста или варианты ответа')),
+                ('question', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='tests_app.question')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_documents', to='tests_app.test')),
+            ],
+        ),
+        # Откат удаляет таблицу вместе со столбцом и индексом
+        migrations.RunPython(create_search_vector, migrations.RunPython.noop),
+        migrations.RunPython(index_existing, migrations.RunPython.noop),
+    ]
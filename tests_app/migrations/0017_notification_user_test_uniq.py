@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:22
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def detach_duplicates(apps, schema_editor):
+    # Уведомления о назначении ставились с test_id, и после повторного
+    # назначения пара (пользователь, тест) повторялась. К тесту остаётся
+    # привязано последнее уведомление пары, остальные становятся общими.
+    Notification = apps.get_model('tests_app', 'Notification')
+    duplicates = (Notification.objects.filter(test__isnull=False).values('user_id', 'test_id')
+                  .annotate(count=Count('id'), last_id=Max('id')).filter(count__gt=1))
+    for row in duplicates:
+        Notification.objects.filter(user_id=row['user_id'], test_id=row['test_id'], id__lt=row['last_id']).update(
+            test=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests_app', '0016_search_documents'),
+    ]
+
+    operations = [
+        migrations.RunPython(detach_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('test__isnull', False)), fields=('user', 'test'), name='notification_user_test_uniq'),
+        ),
+    ]
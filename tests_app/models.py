@@ -3,6 +3,7 @@ from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 import re
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
@@ -12,8 +13,14 @@ class Category(models.Model):
 class Test(models.Model):
     title = models.CharField(max_length=200)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
-    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)  # покрыт test_owner_position_idx
     position = models.CharField(max_length=100, blank=True, null=True, help_text="Должность для теста (можно выбрать или ввести вручную)")  # Новое поле для должности
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_by', 'position', 'category'], name='test_owner_position_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -36,30 +43,90 @@ class Option(models.Model):
 
 class TestAssignment(models.Model):
     test = models.ForeignKey(Test, on_delete=models.CASCADE)
-    applicant = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='assigned_tests')
+    applicant = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='assigned_tests', db_index=False)  # покрыт assignment_applicant_idx
     is_active = models.BooleanField(default=True)
     is_accepted = models.BooleanField(default=False)
     is_rejected = models.BooleanField(default=False)
+    # Сохранённые баллы, заполняются при завершении теста (см. grading.py)
+    auto_score = models.PositiveIntegerField(default=0, help_text="Баллы за вопросы с вариантами ответа")
+    manual_score = models.PositiveIntegerField(default=0, help_text="Ручные баллы за открытые вопросы")
+    max_score = models.PositiveIntegerField(default=0, help_text="Максимально возможный балл")
+    graded_at = models.DateTimeField(null=True, blank=True)
+    # Время по часам сервера: первый показ теста и завершение (см. test_run.py)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['applicant', 'is_active'], name='assignment_applicant_idx'),
+        ]
+
+    @property
+    def total_score(self):
+        return self.auto_score + self.manual_score
+
+    @property
+    def duration(self):
+        if self.started_at and self.finished_at:
+            return self.finished_at - self.started_at
+        return None
+
     def __str__(self):
         return f"{self.applicant.username} - {self.test.title}"
 
+class TestStats(models.Model):
+    # Счётчики для панели работодателя, обновляются в stats.py
+    test = models.OneToOneField(Test, on_delete=models.CASCADE, related_name='stats')
+    assigned_count = models.IntegerField(default=0)
+    completed_count = models.IntegerField(default=0)
+    score_sum = models.IntegerField(default=0, help_text="Сумма итоговых баллов завершённых назначений")
+
+    @property
+    def avg_score(self):
+        return self.score_sum / self.completed_count if self.completed_count else 0
+
+    def __str__(self):
+        return f"Статистика: {self.test.title}"
+
 class Answer(models.Model):
-    assignment = models.ForeignKey(TestAssignment, on_delete=models.CASCADE)
-    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    assignment = models.ForeignKey(TestAssignment, on_delete=models.CASCADE, db_index=False)  # покрыт уникальным (assignment, question)
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, db_index=False)  # покрыт answer_question_time_idx
     answer_text = models.TextField(blank=True, null=True)
     selected_option = models.ForeignKey(Option, on_delete=models.CASCADE, null=True, blank=True)
-    time_taken = models.IntegerField(default=0)
+    time_taken = models.IntegerField(default=0, help_text="Секунды от показа вопроса до ответа по часам сервера")
     is_submitted = models.BooleanField(default=False)
     manual_points = models.PositiveIntegerField(default=0, help_text="Ручные баллы для открытых вопросов")
+
+    class Meta:
+        unique_together = ('assignment', 'question')
+        indexes = [
+            models.Index(fields=['assignment', 'is_submitted'], name='answer_submitted_idx'),
+            # Статистика времени по вопросам читается только из индекса
+            models.Index(fields=['question', 'is_submitted', 'time_taken'], name='answer_question_time_idx'),
+        ]
+
     def __str__(self):
         return f"{self.question.text[:20]} - {self.answer_text[:20]}"
 
 class Notification(models.Model):
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications', db_index=False)  # покрыт notification_user_idx
     message = models.TextField()
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     test = models.ForeignKey(Test, on_delete=models.CASCADE, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'is_read', 'created_at'], name='notification_user_idx'),
+            # Счётчик непрочитанных читает только эту часть таблицы
+            models.Index(fields=['user'], condition=models.Q(is_read=False), name='notification_unread_idx'),
+        ]
+        constraints = [
+            # Уведомление о решении по тесту одно на пару, его перезаписывает notify_job(replace=True)
+            models.UniqueConstraint(fields=['user', 'test'], condition=models.Q(test__isnull=False),
+                                    name='notification_user_test_uniq'),
+        ]
+
     def __str__(self):
         return f"Уведомление для {self.user.username} - {'прочитано' if self.is_read else 'непрочитано'}"
 
@@ -90,10 +157,15 @@ class CustomUser(AbstractUser):
         ('admin', 'Администратор компании'),
     )
     role = models.CharField(max_length=20, choices=ROLE_CHOICES)
-    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='users', null=True, blank=True)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='users', null=True, blank=True, db_index=False)  # покрыт user_company_role_idx
     is_approved = models.BooleanField(default=False)
     position = models.CharField(max_length=100, blank=True, null=True, default=None, help_text="Должность соискателя")
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['company', 'role', 'is_approved', 'is_active'], name='user_company_role_idx'),
+        ]
+
     def __str__(self):
         return f"{self.username} ({self.get_role_display()})"
 
@@ -109,6 +181,53 @@ class CompanyInvitation(models.Model):
 class Invitation(models.Model):
     email = models.EmailField(unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Письмо отправляется из очереди (см. outbox.py)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return self.email
+
+class Job(models.Model):
+    # Фоновая задача: выполняется воркером manage.py run_jobs (см. jobs.py)
+    STATUS_CHOICES = (
+        ('pending', 'Ожидает'),
+        ('running', 'Выполняется'),
+        ('done', 'Выполнена'),
+        ('failed', 'Ошибка'),
+    )
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    # Повторная постановка с тем же ключом не создаёт новую задачу
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Воркер выбирает только ожидающие задачи
+            models.Index(fields=['run_after'], condition=models.Q(status='pending'), name='job_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.get_status_display()})"
+
+class SearchDocument(models.Model):
+    # Строка полнотекстового поиска: тест или вопрос вместе с вариантами ответа.
+    # Поддерживается сигналами (см. search.py); в PostgreSQL у таблицы есть
+    # вычисляемый столбец search_vector с GIN-индексом (миграция 0016)
+    key = models.CharField(max_length=40, unique=True)  # test:<id> или question:<id>
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='search_documents')
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, null=True, blank=True)
+    title = models.TextField(help_text="Название теста или текст вопроса")
+    body = models.TextField(blank=True, help_text="Должность теста или варианты ответа")
 
     def __str__(self):
-        return self.email
\ No newline at end of file
+        return self.key
@@ -0,0 +1,135 @@
+"""Приглашения соискателей по email через очередь задач.
+
+Приглашение (Invitation) само служит строкой исходящей почты: пока
+sent_at пуст, письмо не доставлено. Задача send_invitations открывает
+одно SMTP-соединение на пачку, соблюдает EMAIL_RATE_LIMIT и ставит
+не ушедшие письма на повтор отдельной задачей, не отправляя повторно
+уже доставленные. Задача работает вне транзакции: каждое приглашение
+отмечается отдельной записью сразу после отправки, поэтому ни отправка,
+ни паузы лимита не держат транзакцию открытой, а сбой посреди пачки не
+откатывает отметки о доставленных письмах.
+"""
+import csv
+import hashlib
+import io
+import logging
+import re
+import time
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.mail import EmailMessage, get_connection
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+from .jobs import enqueue, handler
+from .models import Invitation
+
+logger = logging.getLogger('tests_app.jobs')
+
+# Писем в одной задаче (на одно SMTP-соединение)
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 5
+# Задержка перед повтором: OUTBOX_RETRY_DELAY * 2 ** (попытка - 1) секунд
+OUTBOX_RETRY_DELAY = 60
+
+INVITE_SUBJECT = 'Приглашение на регистрацию соискателя'
+INVITE_MESSAGE = 'Здравствуйте! Вы приглашены зарегистрироваться как соискатель. Перейдите по ссылке: {url}'
+
+EMAIL_SEPARATORS = re.compile(r'[\s,;]+')
+
+
+def parse_emails(text='', csv_file=None):
+    """Адреса из текста (через пробел, запятую, ;) и CSV-файла (любая колонка).
+
+    Возвращает (корректные адреса без повторов в нижнем регистре, некорректные).
+    """
+    candidates = [value for value in EMAIL_SEPARATORS.split(text or '') if value]
+    if csv_file is not None:
+        content = csv_file.read()
+        if isinstance(content, bytes):
+            content = content.decode('utf-8-sig', errors='replace')
+        for row in csv.reader(io.StringIO(content)):
+            candidates += [cell.strip() for cell in row if '@' in cell]
+    valid, invalid = [], []
+    for value in candidates:
+        email = value.strip().lower()
+        try:
+            validate_email(email)
+        except ValidationError:
+            invalid.append(value)
+            continue
+        if email not in valid:
+            valid.append(email)
+    return valid, invalid
+
+
+def batch_key(invitation_ids, attempt):
+    digest = hashlib.sha1(','.join(map(str, invitation_ids)).encode()).hexdigest()
+    return f'invite:{attempt}:{digest}'
+
+
+def invite_applicants(emails, register_url):
+    """Создаёт приглашения для новых адресов и ставит письма в очередь.
+
+    Адреса, которым приглашение уже создано, пропускаются. Возвращает
+    (поставлено в очередь, пропущено).
+    """
+    existing = set(Invitation.objects.filter(email__in=emails).values_list('email', flat=True))
+    new = [email for email in emails if email not in existing]
+    with transaction.atomic():
+        Invitation.objects.bulk_create([Invitation(email=email) for email in new], ignore_conflicts=True)
+        ids = list(Invitation.objects.filter(email__in=new, sent_at__isnull=True).order_by('id').values_list(
+            'id', flat=True))
+        for start in range(0, len(ids), OUTBOX_BATCH_SIZE):
+            batch = ids[start:start + OUTBOX_BATCH_SIZE]
+            enqueue('send_invitations', {'invitation_ids': batch, 'register_url': register_url},
+                    key=batch_key(batch, 1))
+    return len(ids), len(emails) - len(new)
+
+
+class RateLimiter:
+    """Не чаще rate писем в секунду."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_at = time.monotonic()
+
+    def wait(self):
+        now = time.monotonic()
+        if self.next_at > now:
+            time.sleep(self.next_at - now)
+        self.next_at = max(now, self.next_at) + self.interval
+
+
+@handler('send_invitations', atomic=False)
+def send_invitations(invitation_ids, register_url, attempt=1):
+    invitations = list(Invitation.objects.filter(id__in=invitation_ids, sent_at__isnull=True).order_by('id'))
+    if not invitations:
+        return
+    limiter = RateLimiter(getattr(settings, 'EMAIL_RATE_LIMIT', 0))
+    failed = {}
+    # Ошибка открытия соединения уходит в повтор задачи целиком: ничего не отправлено
+    connection = get_connection(fail_silently=False)
+    connection.open()
+    try:
+        for invitation in invitations:
+            limiter.wait()
+            message = EmailMessage(INVITE_SUBJECT, INVITE_MESSAGE.format(url=register_url),
+                                   settings.EMAIL_HOST_USER or None, [invitation.email], connection=connection)
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                failed[invitation.id] = f'{type(e).__name__}: {e}'
+                Invitation.objects.filter(id=invitation.id).update(attempts=attempt, last_error=failed[invitation.id])
+                continue
+            Invitation.objects.filter(id=invitation.id).update(sent_at=timezone.now(), attempts=attempt, last_error='')
+    finally:
+        connection.close()
+
+    if failed and attempt < OUTBOX_MAX_ATTEMPTS:
+        retry = sorted(failed)
+        enqueue('send_invitations', {'invitation_ids': retry, 'register_url': register_url, 'attempt': attempt + 1},
+                key=batch_key(retry, attempt + 1),
+                delay=OUTBOX_RETRY_DELAY * 2 ** (attempt - 1))
+    elif failed:
+        logger.error('Не доставлены приглашения %s: %s', sorted(failed), failed)
@@ -0,0 +1,220 @@
+"""Доставка уведомлений в браузер через server-sent events.
+
+Соединение держит асинхронная view notification_stream (только под
+ASGI). Когда у пользователя появляется или меняется уведомление,
+publish() будит его открытые потоки, и они сами дочитывают из базы новые
+уведомления и счётчик непрочитанных. Поэтому брокеру достаточно передать
+id пользователей, а пропущенное (переподключение, другой процесс без
+брокера) подхватывается по Last-Event-ID и раз в HEARTBEAT секунд.
+
+Поток живёт минутами, поэтому соединение с базой возвращается (в пул)
+сразу после каждой проверки, а не при завершении запроса. С общим для
+всех процессов брокером (Redis) поток ходит в базу только когда его
+разбудили.
+
+Брокер выбирается настройкой NOTIFICATION_BROKER:
+- LocalBroker - в пределах процесса (по умолчанию, он же заглушка в тестах);
+- RedisBroker - через Redis pub/sub, когда уведомления создаются в других
+  процессах (воркер run_jobs, WSGI); нужен пакет redis.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Notification
+
+# Пауза между пингами (и проверками базы, если брокер не общий), когда никто не разбудил поток, секунд
+HEARTBEAT = 25
+# После этого соединение закрывается, браузер переподключится с Last-Event-ID
+STREAM_LIFETIME = 300
+STREAM_BATCH_SIZE = 20
+
+
+class Subscription:
+    """Открытый поток одного пользователя; несколько пробуждений сливаются в одно."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def wake(self):
+        # publish вызывается из других потоков (sync view, воркер)
+        self.loop.call_soon_threadsafe(self.event.set)
+
+    async def wait(self, timeout):
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.event.clear()
+        return True
+
+
+class LocalBroker:
+    """Раздаёт события подпискам текущего процесса."""
+
+    # События из других процессов (воркер, WSGI) сюда не доходят, их находит проверка базы по таймеру
+    shared = False
+
+    def __init__(self):
+        self.subscriptions = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id)
+        with self.lock:
+            self.subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscriptions[subscription.user_id]
+
+    def deliver(self, user_ids):
+        with self.lock:
+            subscriptions = [s for user_id in user_ids for s in self.subscriptions.get(user_id, ())]
+        for subscription in subscriptions:
+            subscription.wake()
+
+    def publish(self, user_ids):
+        self.deliver(user_ids)
+
+
+class RedisBroker(LocalBroker):
+    """Публикует id пользователей в канал Redis; слушатель в каждом процессе раздаёт их локально."""
+
+    channel = 'tests_app:notifications'
+    shared = True
+
+    def __init__(self):
+        super().__init__()
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured('Для RedisBroker нужен пакет redis.')
+        self.redis = redis
+        self.url = getattr(settings, 'NOTIFICATION_BROKER_URL', 'redis://localhost:6379/0')
+        self.client = redis.Redis.from_url(self.url)
+        self.listener = None
+
+    def subscribe(self, user_id):
+        subscription = super().subscribe(user_id)
+        if self.listener is None or self.listener.done():
+            self.listener = subscription.loop.create_task(self.listen())
+        return subscription
+
+    async def listen(self):
+        client = self.redis.asyncio.Redis.from_url(self.url)
+        async with client.pubsub() as pubsub:
+            await pubsub.subscribe(self.channel)
+            async for message in pubsub.listen():
+                if message['type'] == 'message':
+                    self.deliver(json.loads(message['data']))
+
+    def publish(self, user_ids):
+        self.client.publish(self.channel, json.dumps(list(user_ids)))
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(getattr(settings, 'NOTIFICATION_BROKER', 'tests_app.push.LocalBroker'))()
+        return _broker
+
+
+def publish(user_ids):
+    """Будит потоки пользователей после коммита текущей транзакции."""
+    user_ids = sorted(set(user_ids))
+    if user_ids:
+        transaction.on_commit(lambda: get_broker().publish(user_ids))
+
+
+# ---------- поток событий ----------
+
+def sse_event(event, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {event}', f'data: {json.dumps(data, ensure_ascii=False)}']
+    return '\n'.join(lines) + '\n\n'
+
+
+async def new_notifications(user_id, last_id):
+    notifications = Notification.objects.filter(user_id=user_id, id__gt=last_id).order_by('id').values(
+        'id', 'message', 'is_read', 'created_at')[:STREAM_BATCH_SIZE]
+    items = [item async for item in notifications]
+    for item in items:
+        item['created_at'] = timezone.localtime(item['created_at']).strftime('%d.%m.%Y %H:%M')
+    return items
+
+
+def close_connection():
+    # Внутри транзакции (в тестах) соединение закрывать нельзя
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+async def release_connection():
+    """Возвращает соединение потока, в котором работает async ORM."""
+    await sync_to_async(close_connection)()
+
+
+async def poll_events(user_id, last_id, unread):
+    """События с прошлой проверки: (список событий, последний id, число непрочитанных)."""
+    events = []
+    try:
+        while True:
+            items = await new_notifications(user_id, last_id)
+            for item in items:
+                last_id = item['id']
+                events.append(sse_event('notification', item, event_id=item['id']))
+            if len(items) < STREAM_BATCH_SIZE:
+                break
+        count = await Notification.objects.filter(user_id=user_id, is_read=False).acount()
+    finally:
+        # Иначе каждый открытый поток держал бы соединение из пула до конца STREAM_LIFETIME
+        await release_connection()
+    if count != unread:
+        events.append(sse_event('unread', {'count': count}))
+    return events, last_id, count
+
+
+async def stream_notifications(user_id, last_id, lifetime=STREAM_LIFETIME, heartbeat=HEARTBEAT):
+    """Новые уведомления (event: notification) и число непрочитанных (event: unread)."""
+    broker = get_broker()
+    subscription = broker.subscribe(user_id)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + lifetime
+    unread = None
+    poll = True
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            if poll:
+                events, last_id, unread = await poll_events(user_id, last_id, unread)
+                for event in events:
+                    yield event
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                return
+            poll = await subscription.wait(min(heartbeat, timeout))
+            if not poll:
+                # Комментарий SSE: не даёт прокси закрыть простаивающее соединение
+                yield ': ping\n\n'
+                poll = not broker.shared
+    finally:
+        broker.unsubscribe(subscription)
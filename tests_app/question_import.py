@@ -0,0 +1,248 @@
+import csv
+import io
+import json
+import re
+from django.db import transaction
+from .caching import bump_content_version
+from .models import Category, Question, Option
+from .search import schedule_index
+
+IMPORT_FORMATS = ('json', 'csv', 'gift')
+QUESTION_TYPES = dict(Question._meta.get_field('question_type').choices)
+OPTION_MAX_LENGTH = Option._meta.get_field('text').max_length
+
+
+class QuestionImportError(Exception):
+    """Ошибки разбора или проверки; errors - список {'row': N, 'errors': [...]}."""
+
+    def __init__(self, errors):
+        super().__init__(f'Ошибок в файле: {len(errors)}')
+        self.errors = errors
+
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return {'json': 'json', 'csv': 'csv', 'gift': 'gift', 'txt': 'gift'}.get(extension)
+
+
+# ---------- JSON ----------
+
+def parse_json(text):
+    """Список вопросов в формате create_question: text, question_type, points, options [[текст, верно], ...]."""
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise QuestionImportError([{'row': 0, 'errors': [f'Некорректный JSON: {e}']}])
+    if isinstance(data, dict):
+        data = data.get('questions', [])
+    if not isinstance(data, list):
+        raise QuestionImportError([{'row': 0, 'errors': ['Ожидается список вопросов.']}])
+    rows = []
+    for number, item in enumerate(data, start=1):
+        if not isinstance(item, dict):
+            item = {}
+        options = []
+        raw_options = item.get('options')
+        for option in raw_options if isinstance(raw_options, list) else []:
+            if isinstance(option, dict):
+                options.append((option.get('text'), bool(option.get('is_correct'))))
+            elif isinstance(option, (list, tuple)) and len(option) == 2:
+                options.append((option[0], bool(option[1])))
+            else:
+                options.append((None, False))
+        rows.append({
+            'row': number,
+            'text': item.get('text'),
+            'question_type': item.get('question_type', 'single'),
+            'points': item.get('points', 1),
+            'time_per_question': item.get('time_per_question', 60),
+            'category': item.get('category'),
+            'options': options,
+        })
+    return rows
+
+
+# ---------- CSV ----------
+
+def parse_csv(text):
+    """Колонки: text, question_type, points, time_per_question, options.
+
+    Варианты в колонке options разделяются '|', правильные помечаются '*':
+    *Python|Java|*Go
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    rows = []
+    try:
+        items = list(reader)
+    except csv.Error as e:
+        raise QuestionImportError([{'row': reader.line_num, 'errors': [f'Некорректный CSV: {e}']}])
+    for number, item in enumerate(items, start=2):
+        options = []
+        for option in (item.get('options') or '').split('|'):
+            option = option.strip()
+            if option:
+                is_correct = option.startswith('*')
+                options.append((option[1:].strip() if is_correct else option, is_correct))
+        rows.append({
+            'row': number,
+            'text': (item.get('text') or '').strip(),
+            'question_type': (item.get('question_type') or 'single').strip(),
+            'points': (item.get('points') or '1').strip(),
+            'time_per_question': (item.get('time_per_question') or '60').strip(),
+            'category': (item.get('category') or '').strip() or None,
+            'options': options,
+        })
+    return rows
+
+
+# ---------- GIFT (Moodle) ----------
+
+GIFT_ESCAPES = {'\\=': '\x01', '\\~': '\x02', '\\{': '\x03', '\\}': '\x04', '\\#': '\x05', '\\:': '\x06'}
+GIFT_UNESCAPE = {'\x01': '=', '\x02': '~', '\x03': '{', '\x04': '}', '\x05': '#', '\x06': ':'}
+GIFT_ANSWER = re.compile(r'([=~])(%-?\d+(?:\.\d+)?%)?([^=~]*)')
+
+
+def gift_unescape(value):
+    for marker, char in GIFT_UNESCAPE.items():
+        value = value.replace(marker, char)
+    return value.strip()
+
+
+def parse_gift(text):
+    """Подмножество GIFT: выбор одного (=/~), нескольких (~%50%), верно/неверно ({T}/{F}) и эссе ({})."""
+    for escaped, marker in GIFT_ESCAPES.items():
+        text = text.replace(escaped, marker)
+    rows = []
+    block, start = [], 1
+    lines = text.splitlines() + ['']
+    for number, line in enumerate(lines, start=1):
+        if line.strip().startswith('//') or line.strip().startswith('$CATEGORY'):
+            continue
+        if line.strip():
+            if not block:
+                start = number
+            block.append(line)
+            continue
+        if block:
+            rows.append(parse_gift_question(' '.join(block), start))
+            block = []
+    return rows
+
+
+def parse_gift_question(source, row):
+    source = re.sub(r'^\s*::.*?::', '', source).strip()
+    match = re.match(r'^(.*?)\{(.*)\}(.*)$', source, re.S)
+    if not match:
+        return {'row': row, 'text': gift_unescape(source), 'question_type': None, 'options': [],
+                'points': 1, 'time_per_question': 60, 'category': None}
+    text = gift_unescape(match.group(1) + ' ' + match.group(3))
+    body = match.group(2).strip()
+    options = []
+    if not body:
+        question_type = 'open'
+    elif body.upper() in ('T', 'TRUE', 'F', 'FALSE'):
+        question_type = 'single'
+        is_true = body.upper() in ('T', 'TRUE')
+        options = [('Верно', is_true), ('Неверно', not is_true)]
+    else:
+        weighted = False
+        for sign, weight, answer in GIFT_ANSWER.findall(body):
+            answer = gift_unescape(answer.split('#')[0])
+            if weight:
+                weighted = True
+                is_correct = float(weight.strip('%')) > 0
+            else:
+                is_correct = sign == '='
+            options.append((answer, is_correct))
+        question_type = 'multiple' if weighted else 'single'
+    return {'row': row, 'text': text, 'question_type': question_type, 'options': options,
+            'points': 1, 'time_per_question': 60, 'category': None}
+
+
+PARSERS = {'json': parse_json, 'csv': parse_csv, 'gift': parse_gift}
+
+
+# ---------- проверка и запись ----------
+
+def positive_int(value):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def validate_rows(rows, test, category_ids):
+    """Возвращает (вопросы, ошибки). Вопрос - (Question без id, [(текст, верно), ...])."""
+    questions, errors = [], []
+    for row in rows:
+        row_errors = []
+        text = row['text'].strip() if isinstance(row['text'], str) else ''
+        if not text:
+            row_errors.append('Пустой текст вопроса.')
+        question_type = row['question_type']
+        if not isinstance(question_type, str) or question_type not in QUESTION_TYPES:
+            row_errors.append(f'Неизвестный тип вопроса: {question_type!r}.')
+        points = positive_int(row['points'])
+        if points is None:
+            row_errors.append('Баллы должны быть целым положительным числом.')
+        time_per_question = positive_int(row['time_per_question'])
+        if time_per_question is None:
+            row_errors.append('Время на вопрос должно быть целым положительным числом.')
+        category_id = positive_int(row['category']) if row['category'] is not None else test.category_id
+        if category_id not in category_ids:
+            row_errors.append(f'Категория {row["category"]!r} не найдена.')
+        options = []
+        if question_type in ('single', 'multiple'):
+            for option_text, is_correct in row['options']:
+                option_text = option_text.strip() if isinstance(option_text, str) else ''
+                if not option_text:
+                    row_errors.append('Пустой вариант ответа.')
+                elif len(option_text) > OPTION_MAX_LENGTH:
+                    row_errors.append(f'Вариант длиннее {OPTION_MAX_LENGTH} символов.')
+                options.append((option_text, is_correct))
+            correct = sum(1 for _, is_correct in options if is_correct)
+            if len(options) < 2:
+                row_errors.append('Нужно минимум два варианта ответа.')
+            if question_type == 'single' and correct != 1:
+                row_errors.append('У вопроса с одним вариантом должен быть ровно один правильный ответ.')
+            if question_type == 'multiple' and correct < 1:
+                row_errors.append('Нужен хотя бы один правильный ответ.')
+        if row_errors:
+            errors.append({'row': row['row'], 'errors': row_errors})
+            continue
+        questions.append((Question(
+            test=test, text=text, time_per_question=time_per_question, category_id=category_id,
+            question_type=question_type, points=points), options))
+    return questions, errors
+
+
+def import_questions(test, text, fmt):
+    """Загружает банк вопросов в тест одной транзакцией.
+
+    Если хотя бы одна строка не прошла проверку, ничего не сохраняется
+    и выбрасывается QuestionImportError со списком ошибок по строкам.
+    """
+    if not isinstance(fmt, str) or fmt not in PARSERS:
+        raise QuestionImportError([{'row': 0, 'errors': [f'Неподдерживаемый формат: {fmt!r}.']}])
+    if not isinstance(text, str):
+        raise QuestionImportError([{'row': 0, 'errors': ['Содержимое файла должно быть строкой.']}])
+    rows = PARSERS[fmt](text)
+    if not rows:
+        raise QuestionImportError([{'row': 0, 'errors': ['В файле нет вопросов.']}])
+    wanted = {positive_int(row['category']) for row in rows if row['category'] is not None} | {test.category_id}
+    category_ids = set(Category.objects.filter(id__in=wanted - {None}).values_list('id', flat=True))
+    questions, errors = validate_rows(rows, test, category_ids)
+    if errors:
+        raise QuestionImportError(errors)
+    with transaction.atomic():
+        created = Question.objects.bulk_create([question for question, _ in questions])
+        Option.objects.bulk_create([
+            Option(question=question, text=option_text, is_correct=is_correct)
+            for question, (_, options) in zip(created, questions)
+            for option_text, is_correct in options
+        ])
+        # bulk_create не отправляет сигналы, кэш содержимого и поиск обновляем явно
+        transaction.on_commit(lambda: bump_content_version(test.id))
+        schedule_index(question_ids=[question.id for question in created])
+    return len(created)
@@ -0,0 +1,107 @@
+"""Полнотекстовый поиск по тестам, вопросам и вариантам ответа.
+
+Каждому тесту и вопросу соответствует строка SearchDocument; сигналы
+(signals.py) обновляют её после коммита. В PostgreSQL поиск идёт по
+вычисляемому столбцу search_vector через GIN-индекс и ранжируется
+ts_rank. В остальных базах (SQLite при разработке) - поиск подстрок по
+каждому слову запроса без ранжирования; регистр там не учитывается
+только для латиницы.
+
+Выдача постраничная по курсору "ранг:id": следующая страница начинается
+после последнего показанного документа, без OFFSET.
+"""
+from django.db import connection, transaction
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from .models import Question, SearchDocument, Test
+
+SEARCH_CONFIG = 'russian'  # как в миграции 0016
+SEARCH_PAGE_SIZE = 20
+SEARCH_BATCH_SIZE = 500
+
+TSQUERY = 'websearch_to_tsquery(%s::regconfig, %s)'
+
+
+# ---------- индекс ----------
+
+def index_tests(test_ids):
+    tests = Test.objects.filter(id__in=test_ids).only('id', 'title', 'position')
+    SearchDocument.objects.bulk_create([
+        SearchDocument(key=f'test:{test.id}', test_id=test.id, title=test.title, body=test.position or '')
+        for test in tests
+    ], batch_size=SEARCH_BATCH_SIZE, update_conflicts=True, unique_fields=['key'], update_fields=['title', 'body'])
+
+
+def index_questions(question_ids):
+    questions = Question.objects.filter(id__in=question_ids).only('id', 'test_id', 'text').prefetch_related('option_set')
+    SearchDocument.objects.bulk_create([
+        SearchDocument(key=f'question:{question.id}', test_id=question.test_id, question_id=question.id,
+                       title=question.text, body='\n'.join(option.text for option in question.option_set.all()))
+        for question in questions
+    ], batch_size=SEARCH_BATCH_SIZE, update_conflicts=True, unique_fields=['key'], update_fields=['title', 'body'])
+
+
+def schedule_index(test_ids=(), question_ids=()):
+    """Обновляет документы после коммита: удалённые к тому времени объекты пропускаются."""
+    test_ids, question_ids = list(test_ids), list(question_ids)
+
+    def index():
+        index_tests(test_ids)
+        index_questions(question_ids)
+    transaction.on_commit(index)
+
+
+def rebuild_search_index():
+    """Переиндексирует все тесты и вопросы (например, после массовой правки в обход ORM)."""
+    test_ids = list(Test.objects.values_list('id', flat=True))
+    question_ids = list(Question.objects.values_list('id', flat=True))
+    for start in range(0, len(test_ids), SEARCH_BATCH_SIZE):
+        index_tests(test_ids[start:start + SEARCH_BATCH_SIZE])
+    for start in range(0, len(question_ids), SEARCH_BATCH_SIZE):
+        index_questions(question_ids[start:start + SEARCH_BATCH_SIZE])
+    return len(test_ids) + len(question_ids)
+
+
+# ---------- поиск ----------
+
+def search_documents(user, query):
+    """Документы тестов компании работодателя (или его собственных, если компании нет) с полем rank."""
+    if user.company_id:
+        documents = SearchDocument.objects.filter(test__created_by__company_id=user.company_id)
+    else:
+        documents = SearchDocument.objects.filter(test__created_by=user)
+    if connection.vendor == 'postgresql':
+        # ::float8 - чтобы ранг из курсора сравнивался с тем же значением, что отдала база
+        documents = documents.annotate(
+            rank=RawSQL(f'ts_rank(search_vector, {TSQUERY})::float8', [SEARCH_CONFIG, query],
+                        output_field=FloatField()),
+        ).filter(RawSQL(f'search_vector @@ {TSQUERY}', [SEARCH_CONFIG, query], output_field=BooleanField()))
+    else:
+        for word in query.split():
+            documents = documents.filter(Q(title__icontains=word) | Q(body__icontains=word))
+        documents = documents.annotate(rank=Value(0.0, output_field=FloatField()))
+    return documents.order_by('-rank', '-id')
+
+
+def parse_cursor(cursor):
+    """(ранг, id) из курсора "ранг:id" или None, если курсор пустой или испорчен."""
+    rank, _, doc_id = (cursor or '').rpartition(':')
+    try:
+        return float(rank), int(doc_id)
+    except ValueError:
+        return None
+
+
+def search_page(user, query, cursor=None, size=SEARCH_PAGE_SIZE):
+    """Страница выдачи и курсор следующей страницы (None на последней)."""
+    documents = search_documents(user, query).select_related('test')
+    position = parse_cursor(cursor)
+    if position:
+        rank, doc_id = position
+        documents = documents.filter(Q(rank__lt=rank) | Q(rank=rank, id__lt=doc_id))
+    page = list(documents[:size + 1])
+    next_cursor = None
+    if len(page) > size:
+        page = page[:size]
+        next_cursor = f'{page[-1].rank!r}:{page[-1].id}'
+    return page, next_cursor
@@ -0,0 +1,116 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.db.models import QuerySet
+from django.dispatch import receiver
+from .models import (Test, Question, Option, TestAssignment, TestStats, CustomUser, Notification,
+                     Category, CompanyInvitation)
+from .caching import SHARED, bump_content_version, reset_fragments
+from . import push, search, stats
+
+
+@receiver(post_save, sender=Test)
+def create_test_stats(sender, instance, created, **kwargs):
+    if created:
+        TestStats.objects.get_or_create(test=instance)
+
+
+def deleted_model(origin):
+    """Модель, с которой началось удаление (origin - объект или QuerySet)."""
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
+def reset_test_content(test_id):
+    # После коммита, чтобы параллельный запрос не закэшировал старые данные под новой версией
+    if test_id:
+        transaction.on_commit(lambda: bump_content_version(test_id))
+
+
+@receiver(post_save, sender=Test)
+def reset_test_title(sender, instance, created, **kwargs):
+    if not created:
+        reset_test_content(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def reset_question(sender, instance, **kwargs):
+    reset_test_content(instance.test_id)
+
+
+@receiver([post_save, post_delete], sender=Option)
+def reset_option(sender, instance, origin=None, **kwargs):
+    if origin is not None and deleted_model(origin) in (Test, Question):
+        # Варианты удаляются каскадом, тест уже сброшен в reset_question
+        return
+    if 'question' in instance._state.fields_cache:
+        test_id = instance.question.test_id
+    else:
+        test_id = Question.objects.filter(id=instance.question_id).values_list('test_id', flat=True).first()
+    reset_test_content(test_id)
+
+
+# ---------- поисковый индекс (см. search.py) ----------
+
+@receiver(post_save, sender=Test)
+def index_test(sender, instance, **kwargs):
+    search.schedule_index(test_ids=[instance.id])
+
+
+@receiver(post_save, sender=Question)
+def index_question(sender, instance, **kwargs):
+    search.schedule_index(question_ids=[instance.id])
+
+
+@receiver([post_save, post_delete], sender=Option)
+def index_option(sender, instance, origin=None, **kwargs):
+    # Документ удалённого вопроса удаляется каскадом вместе с ним
+    if origin is None or deleted_model(origin) not in (Test, Question):
+        search.schedule_index(question_ids=[instance.question_id])
+
+
+@receiver(post_save, sender=TestAssignment)
+def count_assignment(sender, instance, created, **kwargs):
+    if created:
+        stats.record_assigned(instance.test)
+
+
+@receiver(pre_delete, sender=TestAssignment)
+def collect_deleted_assignment(sender, instance, origin, **kwargs):
+    # Вместе с тестом каскадом удаляется и его TestStats
+    if deleted_model(origin) is not Test:
+        stats.collect_deleted(instance, origin)
+
+
+@receiver(post_delete, sender=TestAssignment)
+def uncount_assignments(sender, instance, origin, **kwargs):
+    stats.flush_deleted(origin)
+
+
+# ---------- фрагменты шаблонов (см. caching.fragment_versions) ----------
+
+@receiver([post_save, post_delete], sender=Test)
+def reset_owner_fragments(sender, instance, **kwargs):
+    reset_fragments('user', [instance.created_by_id])
+
+
+@receiver([post_save, post_delete], sender=Category)
+def reset_category_fragments(sender, instance, **kwargs):
+    reset_fragments('categories', [SHARED])
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def reset_company_users(sender, instance, update_fields=None, **kwargs):
+    if update_fields == {'last_login'}:
+        # Вход пользователя не меняет списков
+        return
+    # Работодатель без компании видит всех соискателей: их список тоже устарел
+    reset_fragments('company', [instance.company_id or SHARED, SHARED])
+
+
+@receiver([post_save, post_delete], sender=CompanyInvitation)
+def reset_company_invitations(sender, instance, **kwargs):
+    reset_fragments('company', [instance.company_id])
+
+
+@receiver([post_save, post_delete], sender=Notification)
+def push_notification(sender, instance, **kwargs):
+    push.publish([instance.user_id])
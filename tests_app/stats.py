@@ -0,0 +1,108 @@
+from collections import defaultdict
+from threading import local
+from django.db.models import Avg, Count, F, Max, Q, Sum
+from .caching import reset_fragments
+from .models import Test, TestStats
+
+# Назначение считается завершённым, когда у него сохранены баллы (graded_at)
+
+
+def bump(test_id, owner_id, assigned=0, completed=0, score=0):
+    """Сдвигает счётчики теста одним UPDATE.
+
+    owner_id - автор теста: графики на его страницах закэшированы по его
+    версии фрагментов. Вызывающий код обычно знает его сам, отдельный
+    запрос за ним не нужен.
+    """
+    if assigned or completed or score:
+        TestStats.objects.filter(test_id=test_id).update(
+            assigned_count=F('assigned_count') + assigned,
+            completed_count=F('completed_count') + completed,
+            score_sum=F('score_sum') + score,
+        )
+        reset_fragments('user', [owner_id])
+
+
+def record_assigned(test, count=1):
+    bump(test.id, test.created_by_id, assigned=count)
+
+
+def record_graded(assignment, was_graded, old_total):
+    """Вызывается после сохранения баллов назначения."""
+    owner_id = assignment.test.created_by_id
+    if was_graded:
+        bump(assignment.test_id, owner_id, score=assignment.total_score - old_total)
+    else:
+        bump(assignment.test_id, owner_id, completed=1, score=assignment.total_score)
+
+
+# Удаление назначений. Сигналы приходят на каждую строку, поэтому pre_delete
+# только копит сдвиги по тестам, а первый post_delete того же удаления
+# (origin) применяет их: по UPDATE на тест и один запрос за авторами. Все
+# pre_delete удаления Django отправляет до первого DELETE.
+_deleted = local()
+
+
+def collect_deleted(assignment, origin):
+    pending = getattr(_deleted, 'pending', None)
+    if pending is None or pending[0] is not origin:
+        # Новое удаление; остатки прерванного прежнего отбрасываются
+        pending = _deleted.pending = (origin, defaultdict(lambda: [0, 0, 0]))
+    delta = pending[1][assignment.test_id]
+    delta[0] -= 1
+    if assignment.graded_at:
+        delta[1] -= 1
+        delta[2] -= assignment.total_score
+
+
+def flush_deleted(origin):
+    pending = getattr(_deleted, 'pending', None)
+    if pending is None or pending[0] is not origin:
+        return
+    _deleted.pending = None
+    deltas = pending[1]
+    owners = dict(Test.objects.filter(id__in=deltas).values_list('id', 'created_by_id'))
+    for test_id, (assigned, completed, score) in deltas.items():
+        bump(test_id, owners.get(test_id), assigned=assigned, completed=completed, score=score)
+
+
+def rebuild_test_stats(tests=None):
+    """Пересчитывает счётчики с нуля, если они разошлись с данными."""
+    tests = (tests if tests is not None else Test.objects.all()).annotate(
+        assigned=Count('testassignment'),
+        completed=Count('testassignment', filter=Q(testassignment__graded_at__isnull=False)),
+        score=Sum(F('testassignment__auto_score') + F('testassignment__manual_score'),
+                  filter=Q(testassignment__graded_at__isnull=False)),
+    )
+    stats = [
+        TestStats(test_id=t.id, assigned_count=t.assigned, completed_count=t.completed, score_sum=t.score or 0)
+        for t in tests
+    ]
+    TestStats.objects.bulk_create(
+        stats, batch_size=500, update_conflicts=True, unique_fields=['test'],
+        update_fields=['assigned_count', 'completed_count', 'score_sum'])
+    reset_fragments('user', {t.created_by_id for t in tests})
+    return len(stats)
+
+
+def dashboard_stats(tests):
+    """Итоги по набору тестов одним запросом к TestStats."""
+    totals = TestStats.objects.filter(test__in=tests).aggregate(
+        assigned=Sum('assigned_count'), completed=Sum('completed_count'), score=Sum('score_sum'))
+    assigned = totals['assigned'] or 0
+    completed = totals['completed'] or 0
+    avg_score = (totals['score'] or 0) / completed if completed else 0
+    return assigned, completed, avg_score
+
+
+def question_timings(questions):
+    """Число ответов, среднее и максимальное время ответа по вопросам одним запросом.
+
+    Агрегат читается из индекса answer_question_time_idx.
+    """
+    submitted = Q(answer__is_submitted=True)
+    return questions.annotate(
+        answers_count=Count('answer', filter=submitted),
+        avg_time=Avg('answer__time_taken', filter=submitted),
+        max_time=Max('answer__time_taken', filter=submitted),
+    )
@@ -0,0 +1,48 @@
+"""Хранилище статики для боевого профиля.
+
+ManifestStaticFilesStorage даёт файлам имена с хэшем содержимого
+(bundle.3f2a9c.js), поэтому их можно кэшировать в браузере навсегда:
+новая версия получит новое имя. Дополнительно при collectstatic рядом с
+текстовыми файлами кладутся сжатые копии .gz и .br (brotli - если
+установлен пакет brotli), и сервер отдаёт их без сжатия на лету.
+"""
+import gzip
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSED_EXTENSIONS = ('.css', '.js', '.svg', '.map', '.json', '.txt')
+
+# Сжатую копию не храним, если она почти не меньше исходника
+MIN_SAVING = 0.05
+
+
+def compress(content):
+    """Сжатые варианты содержимого: {'.gz': bytes, '.br': bytes}."""
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content)
+    return {suffix: data for suffix, data in variants.items() if len(data) < len(content) * (1 - MIN_SAVING)}
+
+
+class PrecompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # Шаблоны ссылаются только на имена с хэшем, их и сжимаем
+        for name in sorted(set(self.hashed_files.values())):
+            if name.endswith(COMPRESSED_EXTENSIONS) and self.exists(name):
+                self.save_compressed(name)
+
+    def save_compressed(self, name):
+        with self.open(name) as f:
+            content = f.read()
+        for suffix, data in compress(content).items():
+            path = self.path(name + suffix)
+            with open(path, 'wb') as f:
+                f.write(data)
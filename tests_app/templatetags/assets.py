@@ -0,0 +1,10 @@
+from django import template
+from tests_app.assets import vendor_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def vendor(name):
+    """Адрес сторонней библиотеки в static/vendor/ (см. tests_app/assets.py)."""
+    return vendor_url(name)
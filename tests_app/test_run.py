@@ -0,0 +1,376 @@
+import time
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.utils import timezone
+from .caching import test_content
+from .models import Answer, TestAssignment
+
+# Ключ сессии, в котором лежат начатые прохождения: {assignment_id: данные}
+SESSION_KEY = 'test_runs'
+
+# Запас на сетевые задержки при проверке времени, секунд
+TIME_GRACE = 5
+
+
+class TestRun:
+    """Прохождение теста, сохранённое в сессии.
+
+    Вопросы и варианты ответа загружаются один раз при старте, дальше
+    соискатель двигается по списку курсором без чтения из базы.
+
+    Время считается по часам сервера: started_at - начало попытки (как в
+    TestAssignment.started_at), served - когда вопрос показан, в виде
+    {id вопроса: секунд от started_at}.
+
+    Методы с префиксом a - то же для асинхронных view: сессия и ответы
+    читаются и пишутся через async API, остальное считается в памяти.
+
+    Прохождение в сессии может пережить саму попытку (вторая сессия,
+    удалённое назначение), поэтому ответы записываются только в активное
+    назначение. Если оно уже завершено, closed становится True и
+    прохождение нужно выбросить из сессии.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.data.setdefault('answered', [])
+        self.closed = False
+
+    @classmethod
+    def load(cls, session, assignment_id):
+        data = session.get(SESSION_KEY, {}).get(str(assignment_id))
+        return cls(data) if data else None
+
+    @classmethod
+    async def aload(cls, session, assignment_id):
+        data = (await session.aget(SESSION_KEY, {})).get(str(assignment_id))
+        return cls(data) if data else None
+
+    @classmethod
+    def start(cls, session, assignment):
+        content = test_content(assignment.test_id)
+        submitted = set(Answer.objects.filter(assignment=assignment, is_submitted=True).values_list(
+            'question_id', flat=True))
+        if assignment.started_at is None:
+            # При повторном старте (новая сессия) время попытки не сбрасывается
+            assignment.started_at = timezone.now()
+            TestAssignment.objects.filter(id=assignment.id, started_at__isnull=True).update(
+                started_at=assignment.started_at)
+        run = cls.create(assignment, content, submitted)
+        run.save(session)
+        return run
+
+    @classmethod
+    async def astart(cls, session, assignment):
+        # Кэш содержимого синхронный; старт бывает один раз за попытку
+        content = await sync_to_async(test_content)(assignment.test_id)
+        submitted = {question_id async for question_id in Answer.objects.filter(
+            assignment=assignment, is_submitted=True).values_list('question_id', flat=True)}
+        if assignment.started_at is None:
+            assignment.started_at = timezone.now()
+            await TestAssignment.objects.filter(id=assignment.id, started_at__isnull=True).aupdate(
+                started_at=assignment.started_at)
+        run = cls.create(assignment, content, submitted)
+        await run.asave(session)
+        return run
+
+    @classmethod
+    def create(cls, assignment, content, submitted):
+        return cls({
+            'assignment_id': assignment.id,
+            'test_id': assignment.test_id,
+            'title': content['title'],
+            'questions': [q for q in content['questions'] if q['id'] not in submitted],
+            # Вопросы, принятые вне очереди пакетной отправкой
+            'answered': [],
+            'cursor': 0,
+            'started_at': assignment.started_at.timestamp(),
+            'time_limit': sum(q['time_per_question'] for q in content['questions']),
+            'served': {},
+            # Все вопросы показаны сразу (одна страница): время ответа заявляет клиент
+            'single_page': False,
+            # Сумма time_taken принятых ответов
+            'spent': 0,
+        })
+
+    def save(self, session):
+        runs = session.get(SESSION_KEY, {})
+        runs[str(self.data['assignment_id'])] = self.data
+        session[SESSION_KEY] = runs
+
+    async def asave(self, session):
+        runs = await session.aget(SESSION_KEY, {})
+        runs[str(self.data['assignment_id'])] = self.data
+        await session.aset(SESSION_KEY, runs)
+
+    def discard(self, session):
+        runs = session.get(SESSION_KEY, {})
+        runs.pop(str(self.data['assignment_id']), None)
+        session[SESSION_KEY] = runs
+
+    async def adiscard(self, session):
+        runs = await session.aget(SESSION_KEY, {})
+        runs.pop(str(self.data['assignment_id']), None)
+        await session.aset(SESSION_KEY, runs)
+
+    @property
+    def assignment_id(self):
+        return self.data['assignment_id']
+
+    @property
+    def test_id(self):
+        return self.data['test_id']
+
+    @property
+    def title(self):
+        return self.data['title']
+
+    @property
+    def is_finished(self):
+        return self.data['cursor'] >= len(self.data['questions'])
+
+    @property
+    def current_question(self):
+        if self.is_finished:
+            return None
+        return self.data['questions'][self.data['cursor']]
+
+    @property
+    def time_limit(self):
+        return self.data.get('time_limit') or sum(q['time_per_question'] for q in self.data['questions'])
+
+    def time_left(self, now=None):
+        started_at = self.data.get('started_at')
+        if started_at is None:
+            return None
+        return self.time_limit - ((now or time.time()) - started_at)
+
+    def is_expired(self, now=None):
+        time_left = self.time_left(now)
+        return time_left is not None and time_left < -TIME_GRACE
+
+    def serve(self, questions, now=None):
+        """Запоминает время показа вопросов; повторный показ (перезагрузка) его не сдвигает.
+
+        Возвращает True, если что-то изменилось и прохождение нужно сохранить.
+        """
+        now = now or time.time()
+        served = self.data.setdefault('served', {})
+        # Прохождения, начатые до учёта времени, отсчитываются с первого показа
+        started_at = self.data.setdefault('started_at', now)
+        changed = False
+        for question in questions:
+            if str(question['id']) not in served:
+                served[str(question['id'])] = int(now - started_at)
+                changed = True
+        return changed
+
+    def elapsed(self, question, now=None):
+        """Секунд с показа вопроса по часам сервера; None, если вопрос не показывали."""
+        offset = self.data.get('served', {}).get(str(question['id']))
+        if offset is None:
+            return None
+        return (now or time.time()) - self.data['started_at'] - offset
+
+    def skip_expired(self, now=None):
+        """Засчитывает пустой ответ на текущий вопрос, если его время вышло без ответа."""
+        question = self._expired_question(now)
+        if question is None:
+            return False
+        if not save_answers(self.assignment_id, [self._empty_answer(question)]):
+            self.closed = True
+            return False
+        self._skip(question)
+        return True
+
+    async def askip_expired(self, now=None):
+        question = self._expired_question(now)
+        if question is None:
+            return False
+        if not await asave_answers(self.assignment_id, [self._empty_answer(question)]):
+            self.closed = True
+            return False
+        self._skip(question)
+        return True
+
+    def _expired_question(self, now):
+        question = self.current_question
+        elapsed = self.elapsed(question, now) if question and not self.data.get('single_page') else None
+        if elapsed is None or elapsed <= question['time_per_question'] + TIME_GRACE:
+            return None
+        return question
+
+    def _skip(self, question):
+        self.data['answered'].append(question['id'])
+        self.data['spent'] = self.data.get('spent', 0) + question['time_per_question']
+        self._advance()
+
+    def payload(self):
+        """Все оставшиеся вопросы одним ответом для режима одной страницы."""
+        self.data['single_page'] = True
+        self.serve(self._open_questions().values())
+        time_left = self.time_left()
+        return {
+            'assignment_id': self.assignment_id,
+            'title': self.title,
+            'questions': list(self._open_questions().values()),
+            'time_left': None if time_left is None else max(0, round(time_left)),
+        }
+
+    def _advance(self):
+        answered = set(self.data['answered'])
+        questions = self.data['questions']
+        while self.data['cursor'] < len(questions) and questions[self.data['cursor']]['id'] in answered:
+            self.data['cursor'] += 1
+
+    def _open_questions(self):
+        answered = set(self.data['answered'])
+        return {q['id']: q for q in self.data['questions'][self.data['cursor']:] if q['id'] not in answered}
+
+    def _empty_answer(self, question):
+        return Answer(assignment_id=self.assignment_id, question_id=question['id'], answer_text='',
+                      time_taken=question['time_per_question'], is_submitted=True)
+
+    def _build_answer(self, question, data, now):
+        """Ответ с временем по часам сервера.
+
+        Если вопрос показывали отдельно, time_taken - время с показа, а
+        опоздавший ответ засчитывается пустым. На одной странице все
+        вопросы показаны сразу, поэтому берётся время клиента, но не больше
+        лимита вопроса и времени с показа.
+        """
+        limit = question['time_per_question']
+        elapsed = self.elapsed(question, now)
+        if elapsed is None:
+            return None
+        if not self.data.get('single_page'):
+            if elapsed > limit + TIME_GRACE:
+                return self._empty_answer(question)
+            time_taken = min(limit, max(1, round(elapsed)))
+        else:
+            time_taken = data.get('time_taken', 0)
+            if not isinstance(time_taken, int) or time_taken <= 0 or time_taken > min(limit, elapsed) + TIME_GRACE:
+                return None
+        option_ids = {option['id'] for option in question['options']}
+        selected_option_ids = [i for i in map(to_int, data.get('selected_option_ids') or []) if i in option_ids]
+        selected_option_id = to_int(data.get('selected_option_id'))
+        if selected_option_id not in option_ids:
+            selected_option_id = None
+        return Answer(
+            assignment_id=self.assignment_id,
+            question_id=question['id'],
+            answer_text=','.join(map(str, selected_option_ids)) if selected_option_ids else data.get('answer_text', ''),
+            selected_option_id=selected_option_id,
+            time_taken=min(time_taken, limit),
+            is_submitted=True,
+        )
+
+    def submit(self, data):
+        """Сохраняет ответ на текущий вопрос и двигает курсор.
+
+        Ответы на другие вопросы (повторная отправка, устаревшая вкладка)
+        игнорируются. Возвращает True, если ответ принят.
+        """
+        if not self._is_current(data):
+            return False
+        return bool(self.submit_many([data]))
+
+    async def asubmit(self, data):
+        if not self._is_current(data):
+            return False
+        return bool(await self.asubmit_many([data]))
+
+    def _is_current(self, data):
+        question = self.current_question
+        return question is not None and to_int(data.get('question_id')) == question['id']
+
+    def submit_many(self, items):
+        """Сохраняет пачку ответов одним запросом.
+
+        Принимаются только ответы на показанные вопросы этого теста, на
+        которые ещё не отвечали, пока не вышло общее время теста. Сумма
+        time_taken не может быть больше времени, прошедшего с начала
+        прохождения. Возвращает список id принятых вопросов (пустой, если
+        попытка уже завершена - тогда closed).
+        """
+        answers, spent = self._accept(items)
+        if not answers:
+            return []
+        if not save_answers(self.assignment_id, answers.values()):
+            self.closed = True
+            return []
+        self._record(answers, spent)
+        return list(answers)
+
+    async def asubmit_many(self, items):
+        answers, spent = self._accept(items)
+        if not answers:
+            return []
+        if not await asave_answers(self.assignment_id, answers.values()):
+            self.closed = True
+            return []
+        self._record(answers, spent)
+        return list(answers)
+
+    def _accept(self, items):
+        """Проверяет ответы без записи в базу: ({id вопроса: Answer}, новая сумма time_taken)."""
+        now = time.time()
+        if self.is_expired(now):
+            return {}, 0
+        started_at = self.data.get('started_at')
+        spent = self.data.get('spent', 0)
+        open_questions = self._open_questions()
+        answers = {}
+        for data in items:
+            question = open_questions.get(to_int(data.get('question_id')))
+            answer = self._build_answer(question, data, now) if question else None
+            if answer is None or question['id'] in answers:
+                continue
+            # Клиент округляет время до целых секунд: по секунде запаса на каждый ответ
+            allowed = now - started_at + TIME_GRACE + len(self.data['answered']) + len(answers) + 1 if started_at else None
+            if allowed is not None and spent + answer.time_taken > allowed:
+                continue
+            spent += answer.time_taken
+            answers[question['id']] = answer
+        return answers, spent
+
+    def _record(self, answers, spent):
+        self.data['answered'].extend(answers)
+        self.data['spent'] = spent
+        self._advance()
+
+
+def to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+SAVE_ANSWERS_OPTIONS = {
+    'update_conflicts': True,
+    'unique_fields': ['assignment', 'question'],
+    'update_fields': ['answer_text', 'selected_option', 'time_taken', 'is_submitted'],
+}
+
+
+def save_answers(assignment_id, answers):
+    """Вставляет ответы или перезаписывает существующие строки (assignment, question).
+
+    Пишет, только пока назначение активно. Проверка - условный UPDATE
+    строки назначения без изменений: он сразу берёт блокировку записи
+    (SELECT FOR UPDATE в SQLite ничего не блокирует, а повышение чтения до
+    записи там падает с "database is locked"), поэтому завершение попытки
+    (finish_run) не проскочит между проверкой и записью. Возвращает False,
+    если попытка уже завершена или назначение удалено.
+    """
+    with transaction.atomic():
+        if not TestAssignment.objects.filter(id=assignment_id, is_active=True).update(is_active=True):
+            return False
+        Answer.objects.bulk_create(answers, **SAVE_ANSWERS_OPTIONS)
+    return True
+
+
+async def asave_answers(assignment_id, answers):
+    # Транзакции в Django только синхронные
+    return await sync_to_async(save_answers)(assignment_id, list(answers))
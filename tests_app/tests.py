@@ -1 +1,1392 @@
-from django.test import TestCase
\ No newline at end of file
+import csv
+from datetime import timedelta
+import gzip
+import importlib
+from io import BytesIO, StringIO
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import skipUnless
+from unittest.mock import patch
+from django.contrib.messages import get_messages
+from django.core import mail
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Avg, F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .assets import VENDOR_ASSETS, check_vendor_assets, integrity, vendor_path, vendor_url
+from .assignments import assign_test_bulk
+from .backends import CompanyModelBackend
+from .benchmark import compare, percentile
+from .caching import test_content
+from .exports import EXPORT_HEADER
+from .grading import AnswerKey, grade_assignment, score_assignments
+from .jobs import enqueue, handler, notify_job, run_pending
+from .middleware import QueryBudgetExceeded
+from . import outbox, push
+from .models import Category, Company, CustomUser, Test, Question, Option, TestAssignment, Answer, Notification, Job, Invitation, TestStats
+from .push import get_broker, stream_notifications
+from .question_import import QuestionImportError, import_questions as import_question_bank
+from .search import rebuild_search_index, search_page
+from .stats import rebuild_test_stats
+from .views import DASHBOARD_ASSIGNMENTS, REPORTS_PAGE_SIZE, employer_reports
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+
+class AppTestCase(TestCase):
+    """Общие данные тестов: компания, одобренный работодатель, соискатель, категория и тест."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Acme', contact_email='acme@gmail.com')
+        cls.employer = cls.create_user('employer', 'employer', is_approved=True)
+        cls.applicant = cls.create_user('applicant', 'applicant')
+        cls.category = Category.objects.create(name='Python')
+        cls.test = Test.objects.create(title='Python backend', category=cls.category, created_by=cls.employer,
+                                       position='Программист')
+
+    @classmethod
+    def create_user(cls, username, role, **fields):
+        fields.setdefault('company', cls.company)
+        return CustomUser.objects.create_user(username=username, password='password123', role=role, **fields)
+
+
+class IndexUsageTests(AppTestCase):
+    """EXPLAIN горячих запросов из views.py должен показывать наши индексы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        question = Question.objects.create(test=cls.test, text='2 + 2?', category=cls.category)
+        cls.assignment = TestAssignment.objects.create(test=cls.test, applicant=cls.applicant)
+        Answer.objects.create(assignment=cls.assignment, question=question, is_submitted=True)
+        Notification.objects.create(user=cls.applicant, message='Новый тест')
+
+    def assertUsesIndex(self, queryset, *index_names):
+        if connection.vendor == 'postgresql':
+            # На маленькой таблице планировщик и так выберет seq scan
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+        plan = queryset.explain()
+        self.assertTrue(any(name in plan for name in index_names), f'{index_names} не найдены в плане:\n{plan}')
+
+    def test_applicant_assignments(self):
+        self.assertUsesIndex(
+            TestAssignment.objects.filter(applicant=self.applicant, is_active=True), 'assignment_applicant_idx')
+
+    def test_submitted_answers(self):
+        self.assertUsesIndex(
+            Answer.objects.filter(assignment=self.assignment, is_submitted=True),
+            'answer_submitted_idx', 'assignment_id_question_id')
+
+    def test_question_timings(self):
+        self.assertUsesIndex(
+            Answer.objects.filter(question__test=self.test, is_submitted=True).values('question_id').annotate(
+                avg=Avg('time_taken')),
+            'answer_question_time_idx')
+
+    def test_unread_notifications(self):
+        self.assertUsesIndex(
+            Notification.objects.filter(user=self.applicant, is_read=False),
+            'notification_unread_idx', 'notification_user_idx')
+
+    def test_company_employers(self):
+        self.assertUsesIndex(
+            CustomUser.objects.filter(company=self.company, role='employer', is_approved=True, is_active=True),
+            'user_company_role_idx')
+
+    def test_employer_tests(self):
+        self.assertUsesIndex(
+            Test.objects.filter(created_by=self.employer, position='Программист', category=self.category),
+            'test_owner_position_idx')
+
+    def test_backfill_batch(self):
+        # Та же выборка, что в backfill_scores: пачка идёт по первичному ключу, без сортировки таблицы
+        self.assertUsesIndex(
+            TestAssignment.objects.filter(is_active=False, graded_at__isnull=True, id__gt=0).order_by('id')[:500],
+            'PRIMARY KEY', 'testassignment_pkey')
+
+    def test_dashboard_stats(self):
+        self.assertUsesIndex(
+            TestStats.objects.filter(test__in=Test.objects.filter(created_by=self.employer)),
+            'sqlite_autoindex_tests_app_teststats', 'teststats_test_id_key')
+
+    @skipUnless(connection.vendor == 'postgresql', 'Триграммный индекс есть только в PostgreSQL')
+    def test_title_search(self):
+        self.assertUsesIndex(Test.objects.filter(title__icontains='backend'), 'test_title_trgm_idx')
+
+
+class QueryBudgetTestMixin:
+    """Включает строгий режим бюджетов и проверяет, что число запросов не растёт с данными."""
+
+    def assertQueryBudget(self, client, url, **kwargs):
+        with override_settings(QUERY_BUDGET_STRICT=True):
+            response = client.get(url, **kwargs)
+        self.assertLess(response.status_code, 400)
+        return int(response['X-DB-Query-Count'])
+
+    def assertConstantQueries(self, client, url, grow):
+        """Число запросов одинаково до и после grow() - нет N+1.
+
+        Кэш очищается перед каждым запросом: считаются запросы полной отрисовки.
+        """
+        cache.clear()
+        before = self.assertQueryBudget(client, url)
+        grow()
+        cache.clear()
+        after = self.assertQueryBudget(client, url)
+        self.assertEqual(before, after, f'{url}: {before} запросов превратились в {after} после роста данных')
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, AppTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.questions = []
+        for n, question_type in enumerate(['single', 'multiple', 'open']):
+            question = Question.objects.create(test=cls.test, text=f'Вопрос {n}', category=cls.category,
+                                               question_type=question_type, points=2)
+            if question_type != 'open':
+                Option.objects.create(question=question, text='Да', is_correct=True)
+                Option.objects.create(question=question, text='Нет')
+            cls.questions.append(question)
+        cls.assignment = cls.make_assignment(cls.applicant)
+
+    @classmethod
+    def make_assignment(cls, applicant):
+        assignment = TestAssignment.objects.create(test=cls.test, applicant=applicant, is_active=False)
+        for question in cls.questions:
+            option = question.option_set.first()
+            Answer.objects.create(assignment=assignment, question=question, is_submitted=True,
+                                  selected_option=option, answer_text=str(option.id) if option else 'Ответ')
+        return assignment
+
+    def add_applicants(self, count=5):
+        for n in range(count):
+            applicant = self.create_user(f'applicant{n}', 'applicant')
+            self.make_assignment(applicant)
+            Notification.objects.create(user=applicant, message='Новый тест')
+
+    def test_employer_reports(self):
+        self.client.force_login(self.employer)
+        self.assertConstantQueries(self.client, reverse('employer_reports'), self.add_applicants)
+
+    def test_employer_dashboard(self):
+        self.client.force_login(self.employer)
+        self.assertConstantQueries(self.client, reverse('employer_dashboard'), self.add_applicants)
+
+    def test_applicant_dashboard(self):
+        self.client.force_login(self.applicant)
+
+        def grow():
+            for n in range(3):
+                TestAssignment.objects.create(test=self.test, applicant=self.applicant, is_active=False,
+                                              is_accepted=True)
+                TestAssignment.objects.create(test=self.test, applicant=self.applicant)
+                Notification.objects.create(user=self.applicant, message=f'Уведомление {n}')
+
+        self.assertConstantQueries(self.client, reverse('applicant_dashboard'), grow)
+        TestAssignment.objects.filter(id=self.assignment.id).update(is_accepted=True)
+        TestAssignment.objects.create(test=self.test, applicant=self.applicant, is_active=False, is_rejected=True)
+        response = self.client.get(reverse('applicant_dashboard'))
+        # Принят - завершённые назначения с is_accepted, в ожидании - активные
+        self.assertEqual(response.context['stats']['data'], [4, 1, 3])
+        self.assertContains(response, 'Acme')
+
+    def test_applicant_dashboard_lists_limited(self):
+        self.client.force_login(self.applicant)
+        TestAssignment.objects.bulk_create(
+            TestAssignment(test=self.test, applicant=self.applicant) for _ in range(DASHBOARD_ASSIGNMENTS + 5))
+        response = self.client.get(reverse('applicant_dashboard'))
+        self.assertEqual(len(response.context['active_assignments']), DASHBOARD_ASSIGNMENTS)
+        self.assertEqual(response.context['active_count'], DASHBOARD_ASSIGNMENTS + 5)
+        self.assertContains(response, f'Показаны первые {DASHBOARD_ASSIGNMENTS} из {DASHBOARD_ASSIGNMENTS + 5}')
+
+    def test_test_result(self):
+        self.client.force_login(self.applicant)
+        url = reverse('test_result', args=[self.assignment.id])
+        first = self.assertQueryBudget(self.client, url)
+        # Второй раз баллы читаются из назначения, без ключа и ответов
+        self.assertLess(self.assertQueryBudget(self.client, url), first)
+
+    def test_test_result_does_not_grow_with_answers(self):
+        self.client.force_login(self.applicant)
+
+        def grow():
+            for n in range(5):
+                question = Question.objects.create(test=self.test, text=f'Ещё {n}', category=self.category)
+                option = Option.objects.create(question=question, text='Да', is_correct=True)
+                Answer.objects.create(assignment=self.assignment, question=question, selected_option=option,
+                                      is_submitted=True)
+            TestAssignment.objects.filter(id=self.assignment.id).update(graded_at=None)
+
+        self.assertConstantQueries(self.client, reverse('test_result', args=[self.assignment.id]), grow)
+
+    def test_reports_agree_with_result(self):
+        self.client.force_login(self.applicant)
+        result = self.client.get(reverse('test_result', args=[self.assignment.id])).context
+        self.client.force_login(self.employer)
+        report = self.client.get(reverse('employer_reports')).context['assignment_data'][0]
+        self.assertEqual(report['assignment'].id, self.assignment.id)
+        # Один вариант и несколько вариантов по 2 балла, открытый вопрос ещё не оценён
+        self.assertEqual((result['score'], result['max_score']), (4, 6))
+        self.assertEqual(sum(answer['score'] for answer in report['answers']), result['score'])
+
+    def test_budget_exceeded(self):
+        self.client.force_login(self.employer)
+        with patch.object(employer_reports, 'query_budget', 1):
+            with self.assertRaises(QueryBudgetExceeded), self.assertLogs('tests_app.queries', 'WARNING'):
+                self.assertQueryBudget(self.client, reverse('employer_reports'))
+
+
+class AnswerKeyTests(AppTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.single = Question.objects.create(test=cls.test, text='2 + 2?', category=cls.category, points=2)
+        cls.four = Option.objects.create(question=cls.single, text='4', is_correct=True)
+        cls.five = Option.objects.create(question=cls.single, text='5')
+        cls.multiple = Question.objects.create(test=cls.test, text='Чётные', category=cls.category,
+                                               question_type='multiple', points=3)
+        cls.even = [Option.objects.create(question=cls.multiple, text=str(n), is_correct=True) for n in (2, 4)]
+        cls.odd = Option.objects.create(question=cls.multiple, text='3')
+        cls.essay = Question.objects.create(test=cls.test, text='О себе', category=cls.category,
+                                            question_type='open', points=5)
+
+    def test_scoring_rules(self):
+        key = AnswerKey.for_test(self.test)
+        even = ','.join(str(option.id) for option in self.even)
+        self.assertEqual(key.score_answer(self.single.id, self.four.id), 2)
+        self.assertEqual(key.score_answer(self.single.id, self.five.id), 0)
+        self.assertEqual(key.score_answer(self.multiple.id, answer_text=even), 3)
+        # Несколько вариантов засчитываются только точным совпадением
+        self.assertEqual(key.score_answer(self.multiple.id, answer_text=f'{self.even[0].id}'), 0)
+        self.assertEqual(key.score_answer(self.multiple.id, answer_text=f'{even},{self.odd.id}'), 0)
+        self.assertEqual(key.score_answer(self.essay.id, answer_text='Люблю Python', manual_points=4), 4)
+        self.assertEqual(key.selected_texts(self.multiple.id, answer_text=even), ['2', '4'])
+        score = key.empty_score()
+        self.assertEqual((score.max_auto, score.max_manual), (5, 5))
+
+    def test_batch_queries_do_not_grow(self):
+        other = Test.objects.create(title='Go', category=self.category, created_by=self.employer)
+        Option.objects.create(question=Question.objects.create(test=other, text='?', category=self.category), text='Да')
+        assignments = []
+        for test in (self.test, other, self.test):
+            assignment = TestAssignment.objects.create(test=test, applicant=self.applicant, is_active=False)
+            Answer.objects.create(assignment=assignment, question=self.single, selected_option=self.four)
+            assignments.append(assignment)
+        with self.assertNumQueries(2):
+            keys = AnswerKey.for_tests([self.test.id, other.id])
+        with self.assertNumQueries(1):
+            scores = score_assignments(assignments, keys)
+        self.assertEqual([scores[a.id].auto for a in assignments], [2, 0, 2])
+        with self.assertNumQueries(3):
+            score_assignments(assignments)
+
+
+class BenchmarkCompareTests(TestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_regressions(self):
+        baseline = {'endpoints': {'test_result': {'p50_ms': 10, 'p95_ms': 20, 'p99_ms': 30, 'queries_max': 3}}}
+        result = {'endpoints': {'test_result': {'p50_ms': 11, 'p95_ms': 30, 'p99_ms': 30, 'queries_max': 4}}}
+        _, regressions = compare(result, baseline, threshold=0.2)
+        self.assertEqual({metric for _, metric, *_ in regressions}, {'p95_ms', 'queries_max'})
+
+    @skipUnless(connection.vendor == 'sqlite',
+                'На других базах команда пересоздала бы тестовую базу этого прогона')
+    def test_concurrent_run_without_errors(self):
+        """Короткий прогон команды в отдельном процессе: потоки пишут в общую файловую базу."""
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'result.json')
+            process = subprocess.run(
+                [sys.executable, 'manage.py', 'benchmark', '--server', 'both', '--applicants', '8',
+                 '--questions', '3', '--concurrency', '4', '--employer-requests', '2', '--json', output],
+                cwd=settings.BASE_DIR, env={**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE},
+                capture_output=True, text=True, timeout=300)
+            self.assertEqual(process.returncode, 0, process.stderr[-2000:])
+            for server in ['wsgi', 'asgi']:
+                path = output if server == 'wsgi' else os.path.join(directory, f'result_{server}.json')
+                with open(path, encoding='utf-8') as f:
+                    endpoints = json.load(f)['endpoints']
+                with self.subTest(server=server):
+                    self.assertGreater(endpoints['take_test POST']['requests'], 0)
+                    self.assertEqual({label: e['errors'] for label, e in endpoints.items() if e['errors']}, {})
+
+
+class TestContentCacheTests(AppTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.question = Question.objects.create(test=cls.test, text='2 + 2?', category=cls.category)
+        Option.objects.create(question=cls.question, text='4', is_correct=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_between_candidates(self):
+        content = test_content(self.test.id)
+        self.assertEqual(content['questions'][0]['options'], [{'id': self.question.option_set.get().id, 'text': '4'}])
+        with self.assertNumQueries(0):
+            test_content(self.test.id)
+
+    def test_edit_resets_content(self):
+        test_content(self.test.id)
+        self.client.force_login(self.employer)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('edit_question', args=[self.question.id]), {
+                'text': '3 + 3?', 'time_per_question': 60, 'category': self.category.id, 'question_type': 'single'})
+        self.assertEqual(test_content(self.test.id)['questions'][0]['text'], '3 + 3?')
+        with self.captureOnCommitCallbacks(execute=True):
+            Option.objects.create(question=self.question, text='6', is_correct=False)
+        self.assertEqual(len(test_content(self.test.id)['questions'][0]['options']), 2)
+
+
+class FragmentCacheTests(AppTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.employer)
+
+    def dashboard(self):
+        response = self.client.get(reverse('employer_dashboard'))
+        return response.content.decode(), int(response['X-DB-Query-Count'])
+
+    def test_dashboard_fragments_cached(self):
+        _, queries = self.dashboard()
+        html, cached_queries = self.dashboard()
+        self.assertIn('Python backend', html)
+        # Тесты, категории, график и соискатели не запрашиваются
+        self.assertEqual(cached_queries, queries - 4)
+
+    def test_writes_reset_fragments(self):
+        self.dashboard()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('employer_dashboard'), {'title': 'Django ORM', 'category': self.category.id})
+            self.create_user('newcomer', 'applicant')
+            Category.objects.filter(id=self.category.id).first().save()
+        html, _ = self.dashboard()
+        self.assertIn('Django ORM', html)
+        self.assertIn('newcomer', html)
+
+    def test_fragments_per_employer(self):
+        other = self.create_user('other', 'employer', is_approved=True)
+        self.dashboard()
+        self.client.force_login(other)
+        html, _ = self.dashboard()
+        self.assertNotIn('Python backend', html)
+
+
+class TestStatsTests(AppTestCase):
+    """Счётчики TestStats должны совпадать с пересчётом с нуля (rebuild_test_stats)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.choice = Question.objects.create(test=cls.test, text='2 + 2?', category=cls.category, points=2)
+        cls.right = Option.objects.create(question=cls.choice, text='4', is_correct=True)
+        cls.wrong = Option.objects.create(question=cls.choice, text='5')
+        cls.essay = Question.objects.create(test=cls.test, text='Расскажите о себе', category=cls.category,
+                                            question_type='open', points=5)
+
+    def finished(self, option, applicant=None):
+        assignment = TestAssignment.objects.create(test=self.test, applicant=applicant or self.applicant,
+                                                   is_active=False)
+        Answer.objects.create(assignment=assignment, question=self.choice, selected_option=option, is_submitted=True)
+        Answer.objects.create(assignment=assignment, question=self.essay, answer_text='...', is_submitted=True)
+        return assignment
+
+    def counters(self):
+        stats = TestStats.objects.get(test=self.test)
+        return stats.assigned_count, stats.completed_count, stats.score_sum
+
+    def assertCounters(self, expected):
+        self.assertEqual(self.counters(), expected)
+        rebuild_test_stats(Test.objects.filter(id=self.test.id))
+        self.assertEqual(self.counters(), expected)
+
+    def test_concurrent_grading_counted_once(self):
+        assignment = self.finished(self.right)
+        stale = TestAssignment.objects.get(id=assignment.id)
+        grade_assignment(assignment)
+        # test_result со своим экземпляром, прочитанным до проверки воркером
+        grade_assignment(stale)
+        self.assertEqual(stale.total_score, 2)
+        self.assertCounters((1, 1, 2))
+
+    def test_regrade_moves_score(self):
+        assignment = self.finished(self.right)
+        grade_assignment(assignment)
+        Answer.objects.filter(assignment=assignment, question=self.choice).update(selected_option=self.wrong)
+        grade_assignment(assignment)
+        self.assertEqual(assignment.total_score, 0)
+        self.assertCounters((1, 1, 0))
+
+    def test_manual_score_and_delete(self):
+        assignment = self.finished(self.right)
+        grade_assignment(assignment)
+        answer = Answer.objects.get(assignment=assignment, question=self.essay)
+        self.client.force_login(self.employer)
+        self.client.post(reverse('employer_reports'), {'answer_id': answer.id, 'manual_score': 4})
+        self.assertCounters((1, 1, 6))
+        self.client.post(reverse('employer_reports'), {'answer_id': answer.id, 'manual_score': 1})
+        self.assertCounters((1, 1, 3))
+        self.client.post(reverse('employer_reports'), {'delete_assignment_id': assignment.id})
+        self.assertCounters((0, 0, 0))
+
+    def test_ungraded_delete(self):
+        assignment = TestAssignment.objects.create(test=self.test, applicant=self.applicant)
+        self.assertCounters((1, 0, 0))
+        assignment.delete()
+        self.assertCounters((0, 0, 0))
+
+    def test_queryset_delete_bumps_once(self):
+        grade_assignment(self.finished(self.right))
+        for i in range(3):
+            self.finished(self.wrong, self.create_user(f'more{i}', 'applicant'))
+        with CaptureQueriesContext(connection) as queries:
+            TestAssignment.objects.filter(test=self.test).delete()
+        self.assertEqual(sum('tests_app_teststats' in q['sql'] for q in queries), 1)
+        self.assertCounters((0, 0, 0))
+
+    def test_applicant_delete(self):
+        other = Test.objects.create(title='Go backend', category=self.category, created_by=self.employer)
+        grade_assignment(self.finished(self.right))
+        TestAssignment.objects.create(test=other, applicant=self.applicant)
+        self.applicant.delete()
+        self.assertCounters((0, 0, 0))
+        self.assertEqual(TestStats.objects.get(test=other).assigned_count, 0)
+
+    def delete_queries(self, test, assignments, options):
+        question = Question.objects.create(test=test, text='?', category=self.category)
+        Option.objects.bulk_create([Option(question=question, text=str(i)) for i in range(options)])
+        TestAssignment.objects.bulk_create([
+            TestAssignment(test=test, applicant=self.create_user(f'{test.title}{i}', 'applicant'))
+            for i in range(assignments)])
+        with CaptureQueriesContext(connection) as queries:
+            test.delete()
+        return len(queries)
+
+    def test_test_delete_queries_constant(self):
+        few = self.delete_queries(Test.objects.create(title='few', category=self.category, created_by=self.employer), 1, 1)
+        many = self.delete_queries(Test.objects.create(title='many', category=self.category, created_by=self.employer), 10, 10)
+        self.assertEqual(few, many)
+
+    def test_backfill_scores(self):
+        self.finished(self.right)
+        graded = self.finished(self.wrong, self.create_user('second', 'applicant'))
+        grade_assignment(graded)
+        call_command('backfill_scores', stdout=StringIO())
+        self.assertCounters((2, 2, 2))
+        # Пересчёт всех не засчитывает завершения повторно
+        Answer.objects.filter(assignment=graded, question=self.choice).update(selected_option=self.right)
+        call_command('backfill_scores', '--all', stdout=StringIO())
+        self.assertCounters((2, 2, 4))
+
+
+class ExportTests(AppTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.choice = Question.objects.create(test=cls.test, text='2 + 2?', category=cls.category, points=2)
+        cls.right = Option.objects.create(question=cls.choice, text='4', is_correct=True)
+        cls.essay = Question.objects.create(test=cls.test, text='О себе', category=cls.category,
+                                            question_type='open', points=5)
+        cls.finished = cls.add_finished(cls.applicant)
+        # Ещё не пройденное назначение выгружается одной строкой
+        cls.pending = TestAssignment.objects.create(test=cls.test, applicant=cls.create_user('newbie', 'applicant'))
+
+    @classmethod
+    def add_finished(cls, applicant):
+        assignment = TestAssignment.objects.create(test=cls.test, applicant=applicant, is_active=False,
+                                                   is_accepted=True, finished_at='2025-03-01T12:00Z')
+        Answer.objects.create(assignment=assignment, question=cls.choice, selected_option=cls.right,
+                              time_taken=7, is_submitted=True)
+        Answer.objects.create(assignment=assignment, question=cls.essay, answer_text='Люблю Python',
+                              manual_points=3, is_submitted=True)
+        grade_assignment(assignment)
+        return assignment
+
+    def setUp(self):
+        self.client.force_login(self.employer)
+
+    def export(self, **params):
+        """Содержимое выгрузки и число запросов, включая чтение потока."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('export_reports'), params)
+            content = b''.join(response.streaming_content)
+        return content, len(queries)
+
+    def test_csv(self):
+        content, _ = self.export()
+        rows = list(csv.reader(StringIO(content.decode('utf-8-sig'))))
+        self.assertEqual(rows[0], EXPORT_HEADER)
+        self.assertEqual(len(rows), 4)
+        choice_row, essay_row, pending_row = rows[1:]
+        self.assertEqual(choice_row[:3], [str(self.finished.id), 'Python backend', 'applicant'])
+        self.assertEqual(choice_row[4:6], ['Принят', '2025-03-01 12:00'])
+        self.assertEqual(choice_row[6:], ['5', '7', '2 + 2?', 'Один вариант', '4', '2', '7'])
+        self.assertEqual(essay_row[10:12], ['Люблю Python', '3'])
+        self.assertEqual(pending_row[:1] + pending_row[4:], [str(self.pending.id), 'Ожидает'] + [''] * 8)
+
+    @skipUnless(openpyxl, 'Нужен пакет openpyxl')
+    def test_xlsx(self):
+        content, _ = self.export(format='xlsx')
+        sheet = openpyxl.load_workbook(BytesIO(content), read_only=True).active
+        rows = [list(row) for row in sheet.iter_rows(values_only=True)]
+        self.assertEqual(rows[0], EXPORT_HEADER)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][0], self.finished.id)
+        self.assertEqual(rows[1][8:], ['2 + 2?', 'Один вариант', '4', 2, 7])
+
+    def test_queries_do_not_grow_with_rows(self):
+        for fmt in ['csv', 'xlsx']:
+            _, before = self.export(format=fmt)
+            self.add_finished(self.create_user(f'{fmt}0', 'applicant'))
+            self.add_finished(self.create_user(f'{fmt}1', 'applicant'))
+            _, after = self.export(format=fmt)
+            self.assertEqual(before, after, fmt)
+
+    async def test_asgi_streams_async_iterator(self):
+        await self.async_client.aforce_login(self.employer)
+        response = await self.async_client.get(reverse('export_reports'))
+        self.assertTrue(response.is_async)
+        content = b''.join([part async for part in response.streaming_content])
+        self.assertEqual(content.decode('utf-8-sig').count('\r\n'), 4)
+
+
+class EmployerReportsFilterTests(AppTestCase):
+
+    def setUp(self):
+        self.client.force_login(self.employer)
+
+    def add_assignment(self, finished=None, score=None, **fields):
+        assignment = TestAssignment.objects.create(
+            test=self.test, applicant=self.applicant, is_active=finished is None,
+            finished_at=finished and f'{finished}T12:00Z', **fields)
+        if score is not None:
+            # Проверили на следующий день после завершения
+            TestAssignment.objects.filter(id=assignment.id).update(
+                auto_score=score, manual_score=0, max_score=10, graded_at=F('finished_at') + timedelta(days=1))
+        return assignment
+
+    def report(self, **params):
+        response = self.client.get(reverse('employer_reports'), params)
+        return [item['assignment'].id for item in response.context['assignment_data']], response.context['next_url']
+
+    def test_filters(self):
+        accepted = self.add_assignment('2025-03-01', 9, is_accepted=True)
+        rejected = self.add_assignment('2025-03-02', 2, is_rejected=True)
+        pending = self.add_assignment('2025-03-03', 5)
+        active = self.add_assignment()
+        cases = [
+            ({}, [active, pending, rejected, accepted]),
+            ({'status_filter': 'accepted'}, [accepted]),
+            ({'status_filter': 'rejected'}, [rejected]),
+            ({'status_filter': 'pending'}, [active, pending]),
+            ({'date_from': '2025-03-02'}, [pending, rejected]),
+            ({'date_to': '2025-03-01'}, [accepted]),
+            ({'date_from': '2025-03-02', 'date_to': '2025-03-02'}, [rejected]),
+            ({'date_from': 'вчера'}, [active, pending, rejected, accepted]),
+            ({'score_min': '5'}, [pending, accepted]),
+            ({'score_max': '5'}, [pending, rejected]),
+            ({'score_min': '3', 'score_max': '8', 'status_filter': 'pending'}, [pending]),
+        ]
+        for params, expected in cases:
+            with self.subTest(params=params):
+                self.assertEqual(self.report(**params)[0], [a.id for a in expected])
+
+    def test_page_boundary(self):
+        for _ in range(REPORTS_PAGE_SIZE):
+            self.add_assignment()
+        ids, next_url = self.report()
+        self.assertEqual(len(ids), REPORTS_PAGE_SIZE)
+        self.assertIsNone(next_url)
+        extra = self.add_assignment()
+        ids, next_url = self.report(status_filter='pending')
+        self.assertEqual(ids[0], extra.id)
+        self.assertEqual(len(ids), REPORTS_PAGE_SIZE)
+        self.assertIn('status_filter=pending', next_url)
+        response = self.client.get(reverse('employer_reports') + next_url)
+        last = [item['assignment'].id for item in response.context['assignment_data']]
+        self.assertEqual(last, [min(TestAssignment.objects.values_list('id', flat=True))])
+        self.assertIsNone(response.context['next_url'])
+
+
+class SinglePageDeliveryTests(AppTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.questions = []
+        for n in range(3):
+            question = Question.objects.create(test=cls.test, text=f'Вопрос {n}', category=cls.category,
+                                               time_per_question=30)
+            cls.correct = Option.objects.create(question=question, text='Да', is_correct=True)
+            Option.objects.create(question=question, text='Нет')
+            cls.questions.append(question)
+
+    def setUp(self):
+        cache.clear()
+        self.assignment = TestAssignment.objects.create(test=self.test, applicant=self.applicant)
+        self.client.force_login(self.applicant)
+
+    def submit(self, answers, finish=False):
+        return self.client.post(reverse('submit_answers', args=[self.assignment.id]),
+                                json.dumps({'answers': answers, 'finish': finish}),
+                                content_type='application/json').json()
+
+    def answer(self, question, time_taken=1):
+        option = question.option_set.get(is_correct=True)
+        return {'question_id': question.id, 'selected_option_id': option.id, 'time_taken': time_taken}
+
+    def test_payload_without_correct_flags(self):
+        response = self.client.get(reverse('take_test_single', args=[self.assignment.id]))
+        payload = response.context['payload']
+        self.assertEqual([q['id'] for q in payload['questions']], [q.id for q in self.questions])
+        self.assertNotIn('is_correct', response.content.decode())
+        self.assertEqual(payload['time_left'], 90)
+
+    def test_batch_sync_finishes_attempt(self):
+        self.client.get(reverse('take_test_single', args=[self.assignment.id]))
+        data = self.submit([self.answer(q) for q in self.questions[:2]])
+        self.assertFalse(data['finished'])
+        data = self.submit([self.answer(self.questions[2])], finish=True)
+        self.assertTrue(data['finished'])
+        run_pending()
+        self.assignment.refresh_from_db()
+        self.assertFalse(self.assignment.is_active)
+        self.assertEqual(self.assignment.total_score, 3)
+
+    def test_claimed_time_checked_against_server_clock(self):
+        self.client.get(reverse('take_test_single', args=[self.assignment.id]))
+        # 30 секунд не могли пройти за доли секунды с начала теста
+        data = self.submit([self.answer(self.questions[0], 5), self.answer(self.questions[1], 30)])
+        self.assertEqual(data['saved'], [self.questions[0].id])
+        # Больше лимита вопроса - отклоняется всегда
+        with patch('tests_app.test_run.time.time', return_value=time.time() + 60):
+            data = self.submit([self.answer(self.questions[2], 30 + 6)])
+        self.assertEqual(data['saved'], [])
+
+    def test_stale_session_cannot_overwrite_graded_attempt(self):
+        other = self.client_class()
+        other.force_login(self.applicant)
+        self.client.get(reverse('take_test_single', args=[self.assignment.id]))
+        other.get(reverse('take_test_single', args=[self.assignment.id]))
+        self.submit([self.answer(q) for q in self.questions], finish=True)
+        run_pending()
+        wrong = self.questions[0].option_set.get(is_correct=False)
+        response = other.post(reverse('submit_answers', args=[self.assignment.id]), json.dumps({'answers': [
+            {'question_id': self.questions[0].id, 'selected_option_id': wrong.id, 'time_taken': 1}]}),
+            content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        answer = Answer.objects.get(assignment=self.assignment, question=self.questions[0])
+        self.assertTrue(answer.selected_option.is_correct)
+        self.assignment.refresh_from_db()
+        self.assertEqual(self.assignment.total_score, 3)
+        # Прохождение выброшено из сессии: дальше только результат
+        response = other.get(reverse('take_test_single', args=[self.assignment.id]))
+        self.assertRedirects(response, reverse('test_result', args=[self.assignment.id]), fetch_redirect_response=False)
+
+    def test_deleted_assignment_rejects_stale_answers(self):
+        self.client.get(reverse('take_test_single', args=[self.assignment.id]))
+        url = reverse('submit_answers', args=[self.assignment.id])
+        self.assignment.delete()
+        response = self.client.post(url, json.dumps({'answers': [self.answer(self.questions[0])], 'finish': True}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Answer.objects.exists())
+
+    def test_answers_rejected_after_deadline(self):
+        self.client.get(reverse('take_test_single', args=[self.assignment.id]))
+        with patch('tests_app.test_run.time.time', return_value=time.time() + 200):
+            data = self.submit([self.answer(q) for q in self.questions])
+        self.assertEqual(data['saved'], [])
+        self.assertTrue(data['finished'])
+
+
+class ServerTimingTests(AppTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.questions = []
+        for n in range(2):
+            question = Question.objects.create(test=cls.test, text=f'Вопрос {n}', category=cls.category,
+                                               time_per_question=30)
+            Option.objects.create(question=question, text='Да', is_correct=True)
+            cls.questions.append(question)
+
+    def setUp(self):
+        cache.clear()
+        self.assignment = TestAssignment.objects.create(test=self.test, applicant=self.applicant)
+        self.url = reverse('take_test', args=[self.assignment.id])
+        self.client.force_login(self.applicant)
+        self.now = time.time()
+
+    def at(self, seconds):
+        return patch('tests_app.test_run.time.time', return_value=self.now + seconds)
+
+    def answer(self, question, time_taken=1):
+        option = question.option_set.get()
+        self.client.post(self.url, json.dumps({'question_id': question.id, 'selected_option_id': option.id,
+                                               'time_taken': time_taken}), content_type='application/json')
+
+    def test_time_taken_from_server_clock(self):
+        with self.at(0):
+            self.client.get(self.url)
+        self.assignment.refresh_from_db()
+        self.assertIsNotNone(self.assignment.started_at)
+        # Перезагрузка страницы не сбрасывает время показа
+        with self.at(10):
+            self.client.get(self.url)
+        with self.at(12):
+            self.answer(self.questions[0], time_taken=1)
+        answer = Answer.objects.get(assignment=self.assignment, question=self.questions[0])
+        self.assertIn(answer.time_taken, (12, 13))
+        self.assertIsNotNone(answer.selected_option_id)
+
+    def test_late_answer_counts_empty(self):
+        with self.at(0):
+            self.client.get(self.url)
+        with self.at(50):
+            self.answer(self.questions[0])
+        answer = Answer.objects.get(assignment=self.assignment, question=self.questions[0])
+        self.assertIsNone(answer.selected_option_id)
+        self.assertEqual(answer.time_taken, 30)
+
+    def test_unanswered_question_skipped_on_return(self):
+        with self.at(0):
+            self.client.get(self.url)
+        with self.at(45):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['current_question']['id'], self.questions[1].id)
+        with self.at(50):
+            self.answer(self.questions[1])
+        with self.at(51):
+            self.client.get(self.url)
+        run_pending()
+        self.assignment.refresh_from_db()
+        self.assertFalse(self.assignment.is_active)
+        self.assertIsNotNone(self.assignment.finished_at)
+        self.assertEqual(self.assignment.total_score, 1)
+
+    def test_new_session_keeps_start_time(self):
+        with self.at(0):
+            self.client.get(self.url)
+        started_at = TestAssignment.objects.get(id=self.assignment.id).started_at
+        self.client.logout()
+        self.client.force_login(self.applicant)
+        with self.at(5):
+            self.client.get(self.url)
+        self.assertEqual(TestAssignment.objects.get(id=self.assignment.id).started_at, started_at)
+
+    def test_question_timings(self):
+        with self.at(0):
+            self.client.get(self.url)
+        with self.at(8):
+            self.answer(self.questions[0])
+        self.client.force_login(self.employer)
+        response = self.client.get(reverse('edit_test', args=[self.test.id]))
+        first = response.context['questions'][0]
+        self.assertEqual(first.answers_count, 1)
+        self.assertIn(first.max_time, (8, 9))
+
+
+calls = []
+
+
+@handler('test_flaky')
+def flaky_job(fail):
+    calls.append(fail)
+    if fail:
+        raise RuntimeError('SMTP недоступен')
+
+
+class JobQueueTests(AppTestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_idempotency_key(self):
+        first = enqueue('test_flaky', {'fail': False}, key='once')
+        second = enqueue('test_flaky', {'fail': False}, key='once')
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(calls, [False])
+
+    def test_retry_then_fail(self):
+        job = enqueue('test_flaky', {'fail': True})
+        job.max_attempts = 2
+        job.save()
+        with self.assertLogs('tests_app.jobs', 'WARNING'):
+            self.assertEqual(run_pending(), 0)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+        self.assertIn('SMTP', job.last_error)
+        # Повтор откладывается, пока не наступит run_after
+        self.assertEqual(run_pending(), 0)
+        self.assertEqual(len(calls), 1)
+        Job.objects.filter(id=job.id).update(run_after=job.created_at)
+        with self.assertLogs('tests_app.jobs', 'ERROR'):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    def test_decision_notification_enqueued(self):
+        assignment = TestAssignment.objects.create(test=self.test, applicant=self.applicant, is_active=False)
+        self.client.force_login(self.employer)
+        self.client.post(reverse('employer_reports'), {'assignment_id': assignment.id, 'is_accepted': 'on'})
+        self.assertFalse(Notification.objects.filter(user=self.applicant).exists())
+        run_pending()
+        notification = Notification.objects.get(user=self.applicant, test=self.test)
+        self.assertIn('приняты', notification.message)
+
+    def test_changed_decision_notified(self):
+        assignment = TestAssignment.objects.create(test=self.test, applicant=self.applicant, is_active=False)
+        self.client.force_login(self.employer)
+        for decision in ['is_accepted', 'is_rejected', 'is_accepted']:
+            with override_settings(QUERY_BUDGET_STRICT=True):
+                response = self.client.post(reverse('employer_reports'), {'assignment_id': assignment.id, decision: 'on'})
+            self.assertEqual(response.status_code, 200)
+            run_pending()
+        assignment.refresh_from_db()
+        self.assertTrue(assignment.is_accepted)
+        notification = Notification.objects.get(user=self.applicant, test=self.test)
+        self.assertIn('приняты', notification.message)
+        self.assertFalse(notification.is_read)
+        self.assertEqual(Job.objects.filter(kind='notify', status='done').count(), 3)
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_mode(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue('test_flaky', {'fail': False})
+        self.assertEqual(calls, [False])
+
+
+class BulkAssignTests(AppTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.testers = [cls.create_user(f'tester{n}', 'applicant', position='Тестировщик') for n in range(3)]
+
+    def setUp(self):
+        self.client.force_login(self.employer)
+
+    def assign(self, **data):
+        return self.client.post(reverse('assign_test', args=[self.test.id]), data)
+
+    def test_assign_by_position_skips_existing(self):
+        TestAssignment.objects.create(test=self.test, applicant=self.testers[0])
+        self.assign(mode='position', position='Тестировщик')
+        self.assertEqual(TestAssignment.objects.filter(test=self.test).count(), 3)
+        self.assertEqual(TestStats.objects.get(test=self.test).assigned_count, 3)
+        job = Job.objects.get(kind='notify')
+        self.assertEqual(job.payload['user_ids'], [t.id for t in self.testers[1:]])
+        run_pending()
+        self.assertEqual(set(Notification.objects.values_list('user_id', flat=True)), {t.id for t in self.testers[1:]})
+
+    def test_queries_do_not_grow_with_selection(self):
+        with CaptureQueriesContext(connection) as few:
+            assign_test_bulk(self.test, CustomUser.objects.filter(id=self.applicant.id))
+        with CaptureQueriesContext(connection) as many:
+            assign_test_bulk(self.test, CustomUser.objects.filter(role='applicant'))
+        self.assertEqual(len(few), len(many))
+
+    def test_reassigned_test_keeps_one_decision_notification(self):
+        self.assign(mode='applicant', applicant='applicant')
+        assignment = TestAssignment.objects.get(applicant=self.applicant)
+        self.client.post(reverse('employer_reports'), {'delete_assignment_id': assignment.id})
+        self.assign(mode='applicant', applicant='applicant')
+        assignment = TestAssignment.objects.get(applicant=self.applicant)
+        self.client.post(reverse('employer_reports'), {'assignment_id': assignment.id, 'is_accepted': 'on'})
+        run_pending()
+        self.assertFalse(Job.objects.filter(status='failed').exists())
+        self.assertEqual(Notification.objects.filter(user=self.applicant).count(), 3)
+        notification = Notification.objects.get(user=self.applicant, test=self.test)
+        self.assertIn('приняты', notification.message)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', EMAIL_RATE_LIMIT=0)
+class BulkInviteTests(AppTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = cls.create_user('admin', 'admin', is_approved=True)
+        Invitation.objects.create(email='old@gmail.com', sent_at='2024-01-01T00:00Z')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def invite(self, **data):
+        return self.client.post(reverse('invite_applicant'), data)
+
+    def test_bulk_invite_deduplicates(self):
+        csv_file = SimpleUploadedFile('emails.csv', 'name,email\nИван,a@gmail.com\nПётр,c@gmail.com\n'.encode())
+        self.invite(emails='a@gmail.com, B@gmail.com; old@gmail.com\nнеадрес b@gmail.com', file=csv_file)
+        self.assertEqual(len(mail.outbox), 0)
+        with patch('tests_app.outbox.get_connection', wraps=outbox.get_connection) as get_connection:
+            run_pending()
+        self.assertEqual(get_connection.call_count, 1)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['a@gmail.com', 'b@gmail.com', 'c@gmail.com'])
+        self.assertIn('/register/applicant/', mail.outbox[0].body)
+        self.assertEqual(Invitation.objects.filter(sent_at__isnull=True).count(), 0)
+        # Повторное приглашение тех же адресов ничего не отправляет
+        self.invite(emails='a@gmail.com c@gmail.com')
+        run_pending()
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_failed_messages_retried_alone(self):
+        self.invite(emails='a@gmail.com bad@gmail.com')
+        backend = 'django.core.mail.backends.locmem.EmailBackend.send_messages'
+        original = mail.get_connection().__class__.send_messages
+
+        def flaky(connection, messages):
+            if messages[0].to == ['bad@gmail.com']:
+                raise OSError('550 mailbox unavailable')
+            return original(connection, messages)
+
+        with patch(backend, flaky):
+            run_pending()
+        self.assertEqual([m.to for m in mail.outbox], [['a@gmail.com']])
+        bad = Invitation.objects.get(email='bad@gmail.com')
+        self.assertIsNone(bad.sent_at)
+        self.assertIn('550', bad.last_error)
+        retry = Job.objects.get(kind='send_invitations', status='pending')
+        self.assertEqual(retry.payload['invitation_ids'], [bad.id])
+        Job.objects.filter(id=retry.id).update(run_after=retry.created_at)
+        run_pending()
+        self.assertEqual([m.to for m in mail.outbox], [['a@gmail.com'], ['bad@gmail.com']])
+
+    def test_sent_marks_survive_job_failure(self):
+        self.invite(emails='a@gmail.com b@gmail.com')
+        # Сбой после первого письма (например, база недоступна) роняет задачу целиком
+        with patch('tests_app.outbox.RateLimiter.wait', side_effect=[None, RuntimeError('database is gone')]):
+            run_pending()
+        self.assertEqual([m.to for m in mail.outbox], [['a@gmail.com']])
+        self.assertIsNotNone(Invitation.objects.get(email='a@gmail.com').sent_at)
+        job = Job.objects.get(kind='send_invitations')
+        Job.objects.filter(id=job.id).update(run_after=job.created_at)
+        run_pending()
+        # Повтор задачи не отправляет уже доставленное письмо
+        self.assertEqual([m.to for m in mail.outbox], [['a@gmail.com'], ['b@gmail.com']])
+
+
+class QuestionImportTests(AppTestCase):
+
+    def setUp(self):
+        self.client.force_login(self.employer)
+
+    def post_json(self, data):
+        return self.client.post(reverse('import_questions', args=[self.test.id]), json.dumps(data),
+                                content_type='application/json')
+
+    def test_json_import(self):
+        content = json.dumps([
+            {'text': '2 + 2?', 'options': [['4', True], ['5', False]]},
+            {'text': 'Чётные числа', 'question_type': 'multiple', 'points': 2,
+             'options': [{'text': '2', 'is_correct': True}, {'text': '4', 'is_correct': True}, {'text': '5'}]},
+        ])
+        self.assertEqual(import_question_bank(self.test, content, 'json'), 2)
+        question = Question.objects.get(text='Чётные числа')
+        self.assertEqual((question.question_type, question.points, question.category_id), ('multiple', 2, self.category.id))
+        self.assertEqual(sorted(question.option_set.filter(is_correct=True).values_list('text', flat=True)), ['2', '4'])
+
+    def test_csv_import(self):
+        content = 'text,question_type,points,options\n2 + 2?,single,3,*4|5\nЧто такое GIL?,open,,\n'
+        self.assertEqual(import_question_bank(self.test, content, 'csv'), 2)
+        question = Question.objects.get(text='2 + 2?')
+        self.assertEqual(question.points, 3)
+        self.assertEqual(list(question.option_set.order_by('text').values_list('text', 'is_correct')),
+                         [('4', True), ('5', False)])
+        self.assertEqual(Question.objects.get(text='Что такое GIL?').question_type, 'open')
+
+    def test_gift_import(self):
+        content = (
+            '// комментарий\n::q1:: 2 + 2? {=4 ~5 ~6}\n\n'
+            'Python - интерпретируемый язык {T}\n\n'
+            'Чётные числа {~%50%2 ~%50%4 ~%-100%5}\n\n'
+            'Расскажите о себе {}\n'
+        )
+        self.assertEqual(import_question_bank(self.test, content, 'gift'), 4)
+        types = dict(Question.objects.values_list('text', 'question_type'))
+        self.assertEqual(types, {'2 + 2?': 'single', 'Python - интерпретируемый язык': 'single',
+                                 'Чётные числа': 'multiple', 'Расскажите о себе': 'open'})
+        self.assertTrue(Option.objects.get(question__text='2 + 2?', text='4').is_correct)
+        self.assertTrue(Option.objects.get(text='Верно').is_correct)
+
+    def test_malformed_input(self):
+        for content, fmt in (('[{"text": ', 'json'), ('{"questions": 5}', 'json'), ('text\n' + 'a' * 200000, 'csv'), ('', 'gift')):
+            with self.subTest(fmt=fmt, content=content), self.assertRaises(QuestionImportError) as raised:
+                import_question_bank(self.test, content, fmt)
+            self.assertEqual(raised.exception.errors[0]['row'] > 0, fmt == 'csv')
+        self.assertFalse(Question.objects.exists())
+
+    def test_row_errors_reported_and_nothing_saved(self):
+        content = 'text,question_type,points,options\n2 + 2?,single,1,*4|5\n,single,0,4|*5|*6\nВопрос,essay,1,\n'
+        with self.assertRaises(QuestionImportError) as raised:
+            import_question_bank(self.test, content, 'csv')
+        errors = {error['row']: error['errors'] for error in raised.exception.errors}
+        self.assertEqual(sorted(errors), [3, 4])
+        self.assertIn('Пустой текст вопроса.', errors[3])
+        self.assertIn('Баллы должны быть целым положительным числом.', errors[3])
+        self.assertIn('У вопроса с одним вариантом должен быть ровно один правильный ответ.', errors[3])
+        self.assertEqual(errors[4], ["Неизвестный тип вопроса: 'essay'."])
+        self.assertFalse(Question.objects.exists())
+
+    def test_api_rejects_wrong_types(self):
+        for data in ({'content': ['2 + 2?']}, {'content': {'text': '2 + 2?'}}, {'format': ['json'], 'content': '[]'},
+                     {'format': 'xml', 'content': '[]'}, {'questions': [{'text': '2 + 2?', 'options': 5}]}):
+            with self.subTest(data=data):
+                response = self.post_json(data)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['status'], 'error')
+        self.assertFalse(Question.objects.exists())
+
+    def test_api_import(self):
+        response = self.post_json({'format': 'gift', 'content': '2 + 2? {=4 ~5}\n'})
+        self.assertEqual(response.json(), {'status': 'success', 'created': 1})
+
+
+class NotificationPushTests(AppTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.notification = Notification.objects.create(user=cls.applicant, message='Назначен тест')
+
+    async def test_stream_wakes_on_publish(self):
+        stream = stream_notifications(self.applicant.id, 0, lifetime=10, heartbeat=10)
+        self.assertEqual(await anext(stream), 'retry: 5000\n\n')
+        self.assertIn(f'id: {self.notification.id}\nevent: notification', await anext(stream))
+        self.assertIn('event: unread\ndata: {"count": 1}', await anext(stream))
+
+        notification = await Notification.objects.acreate(user=self.applicant, message='Тест проверен')
+        started = time.monotonic()
+        # В тесте транзакция не коммитится, поэтому будим поток напрямую
+        get_broker().publish([self.applicant.id])
+        event = await anext(stream)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertIn(f'id: {notification.id}\nevent: notification', event)
+        self.assertIn('Тест проверен', event)
+        self.assertIn('"count": 2', await anext(stream))
+        await stream.aclose()
+        self.assertNotIn(self.applicant.id, get_broker().subscriptions)
+
+    async def test_connection_released_after_each_poll(self):
+        with patch('tests_app.push.release_connection') as release:
+            stream = stream_notifications(self.applicant.id, 0, lifetime=10, heartbeat=0.05)
+            for _ in range(3):
+                await anext(stream)
+            self.assertEqual(release.await_count, 1)
+            # Без общего брокера поток по таймеру проверяет базу и снова отдаёт соединение
+            self.assertEqual(await anext(stream), ': ping\n\n')
+            await Notification.objects.acreate(user=self.applicant, message='Тест проверен')
+            self.assertIn('Тест проверен', await anext(stream))
+            self.assertEqual(release.await_count, 2)
+            await stream.aclose()
+
+    async def test_shared_broker_stream_skips_heartbeat_queries(self):
+        with patch.object(get_broker(), 'shared', True), \
+                patch('tests_app.push.poll_events', wraps=push.poll_events) as poll_events:
+            stream = stream_notifications(self.applicant.id, 0, lifetime=10, heartbeat=0.05)
+            for _ in range(3):
+                await anext(stream)
+            self.assertEqual(await anext(stream), ': ping\n\n')
+            self.assertEqual(await anext(stream), ': ping\n\n')
+            self.assertEqual(poll_events.await_count, 1)
+            # Разбуженный брокером поток проверяет базу
+            get_broker().publish([self.applicant.id])
+            await anext(stream)
+            self.assertEqual(poll_events.await_count, 2)
+            await stream.aclose()
+
+    def test_notification_publishes_on_commit(self):
+        with patch.object(get_broker(), 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                notify_job([self.applicant.id], 'Вы приняты')
+        self.assertEqual(publish.call_args_list[0].args, ([self.applicant.id],))
+
+    def test_stream_requires_asgi(self):
+        self.client.force_login(self.applicant)
+        self.assertEqual(self.client.get(reverse('notification_stream')).status_code, 204)
+
+
+class AsyncViewsTests(AppTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.questions = []
+        for n in range(3):
+            question = Question.objects.create(test=cls.test, text=f'Вопрос {n}', category=cls.category)
+            Option.objects.create(question=question, text='Да', is_correct=True)
+            Option.objects.create(question=question, text='Нет')
+            cls.questions.append(question)
+        cls.assignment = TestAssignment.objects.create(test=cls.test, applicant=cls.applicant)
+        Notification.objects.create(user=cls.applicant, message='Назначен тест')
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_take_test_over_asgi(self):
+        await self.async_client.aforce_login(self.applicant)
+        url = reverse('take_test', args=[self.assignment.id])
+        for question in self.questions:
+            response = await self.async_client.get(url)
+            self.assertEqual(response.context['current_question']['id'], question.id)
+            self.assertIn('X-DB-Query-Count', response)
+            option = await question.option_set.aget(is_correct=True)
+            response = await self.async_client.post(
+                url, {'question_id': question.id, 'selected_option_id': option.id}, content_type='application/json')
+            self.assertEqual(response.json(), {'status': 'success'})
+        response = await self.async_client.get(url)
+        self.assertRedirects(response, reverse('test_result', args=[self.assignment.id]), fetch_redirect_response=False)
+        response = await self.async_client.get(reverse('test_result', args=[self.assignment.id]))
+        self.assertEqual((response.context['score'], response.context['max_score']), (3, 3))
+        # Бюджет запросов считается и для асинхронных view
+        self.assertIn(int(response['X-DB-Query-Count']), range(1, 11))
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_cached_db_session_not_read_from_database(self):
+        # Профиль settings_production: сессия читается из кэша, в базу только пишется
+        self.client.force_login(self.applicant)
+        url = reverse('take_test', args=[self.assignment.id])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([q for q in queries if 'SELECT' in q['sql'] and 'django_session' in q['sql']])
+
+    async def test_notification_feed_over_asgi(self):
+        await self.async_client.aforce_login(self.applicant)
+        response = await self.async_client.get(reverse('notification_feed'))
+        self.assertEqual([n['message'] for n in response.json()['notifications']], ['Назначен тест'])
+
+
+class AccessTests(AppTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.pending = cls.create_user('pending', 'employer')
+
+    def test_user_loaded_with_company(self):
+        with self.assertNumQueries(1):
+            user = CompanyModelBackend().get_user(self.employer.id)
+            self.assertEqual(user.company.name, 'Acme')
+
+    def test_wrong_role_denied_before_view_queries(self):
+        self.client.force_login(self.applicant)
+        # Только сессия и пользователь
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('employer_reports'))
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+        self.assertEqual([str(m) for m in get_messages(response.wsgi_request)], ['Доступ запрещён.'])
+
+    def test_unapproved_employer_sees_pending_page(self):
+        self.client.force_login(self.pending)
+        response = self.client.get(reverse('assign_test', args=[self.test.id]))
+        self.assertTemplateUsed(response, 'pending_approval.html')
+
+
+class StaticAssetsTests(TestCase):
+    """Статика собирается с хэшами и сжатыми копиями, шаблоны ссылаются только на существующие файлы."""
+
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+        storages = dict(settings.STORAGES, staticfiles={
+            'BACKEND': 'tests_app.storage.PrecompressedManifestStaticFilesStorage'})
+        overrides = override_settings(STATIC_ROOT=self.static_root, STORAGES=storages)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def test_hashed_and_precompressed(self):
+        url = staticfiles_storage.url('js/take_test.js')
+        self.assertRegex(url, r'^/static/js/take_test\.[0-9a-f]{12}\.js$')
+        path = staticfiles_storage.path(staticfiles_storage.stored_name('js/take_test.js'))
+        with open(path, 'rb') as f, gzip.open(path + '.gz') as compressed:
+            self.assertEqual(f.read(), compressed.read())
+
+    def test_templates_reference_collected_files(self):
+        templates_dir = settings.TEMPLATES[0]['DIRS'][0]
+        names = set()
+        for root, _, files in os.walk(templates_dir):
+            for file in files:
+                with open(os.path.join(root, file), encoding='utf-8') as f:
+                    names.update(re.findall(r"{% static '([^']+)' %}", f.read()))
+        self.assertIn('css/take_test.css', names)
+        for name in names:
+            # Без файла в манифесте страница упадёт на боевом профиле
+            staticfiles_storage.stored_name(name)
+
+    def test_vendor_served_from_static(self):
+        path, _, _ = VENDOR_ASSETS['chart.js']
+        if os.path.exists(vendor_path(path)):
+            self.assertEqual(vendor_url('chart.js'), staticfiles_storage.url(path))
+        else:
+            # Без скачанного файла страница падает, а не уходит молча на CDN
+            with self.assertRaises(ValueError):
+                vendor_url('chart.js')
+
+
+class ProductionSettingsTests(TestCase):
+    ENVIRON = {'DJANGO_SECRET_KEY': 'secret', 'ALLOWED_HOSTS': 'jobs.example.com, www.example.com',
+               'DB_NAME': 'testonline', 'DB_USER': 'app', 'DB_PASSWORD': 'password'}
+
+    def load(self, environ):
+        sys.modules.pop('TestOnline.settings_production', None)
+        self.addCleanup(sys.modules.pop, 'TestOnline.settings_production', None)
+        with patch.dict(os.environ, environ, clear=True):
+            return importlib.import_module('TestOnline.settings_production')
+
+    def test_reads_environment(self):
+        production = self.load(self.ENVIRON)
+        self.assertEqual(production.SECRET_KEY, 'secret')
+        self.assertEqual(production.ALLOWED_HOSTS, ['jobs.example.com', 'www.example.com'])
+        database = production.DATABASES['default']
+        self.assertEqual((database['NAME'], database['USER'], database['PASSWORD']), ('testonline', 'app', 'password'))
+
+    def test_missing_variable_fails(self):
+        for name in self.ENVIRON:
+            environ = {key: value for key, value in self.ENVIRON.items() if key != name}
+            with self.subTest(name=name), self.assertRaisesMessage(ImproperlyConfigured, name):
+                self.load(environ)
+
+
+class VendorAssetsTests(TestCase):
+
+    def setUp(self):
+        static_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_dir)
+        overrides = override_settings(STATICFILES_DIRS=[static_dir])
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.content = b'console.log(1)'
+        self.path = os.path.join(static_dir, 'vendor', 'lib.js')
+
+    def vendor(self, pin, *args):
+        assets = {'lib.js': ('vendor/lib.js', 'https://cdn.example.com/lib.js', pin)}
+        response = BytesIO(self.content)
+        with patch('tests_app.management.commands.vendor_assets.VENDOR_ASSETS', assets), \
+                patch('tests_app.assets.VENDOR_ASSETS', assets), \
+                patch('tests_app.management.commands.vendor_assets.urlopen', return_value=response):
+            call_command('vendor_assets', *args, stdout=StringIO())
+
+    def test_pinned_file_saved(self):
+        self.vendor(integrity(self.content))
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+        # Повторный запуск сверяет уже скачанный файл
+        self.vendor(integrity(self.content))
+
+    def test_mismatch_fails(self):
+        with self.assertRaisesMessage(CommandError, 'не совпадает'):
+            self.vendor(integrity(b'other'))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_unpinned_fails(self):
+        with self.assertRaisesMessage(CommandError, integrity(self.content)):
+            self.vendor(None)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_missing_files_reported(self):
+        self.assertEqual([e.id for e in check_vendor_assets(None)], ['tests_app.W001'])
+
+
+class SearchTests(QueryBudgetTestMixin, AppTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.colleague = cls.create_user('colleague', 'employer', is_approved=True)
+        other_company = Company.objects.create(name='Other', contact_email='other@gmail.com')
+        cls.stranger = cls.create_user('stranger', 'employer', company=other_company, is_approved=True)
+        cls.colleague_test = Test.objects.create(title='Django basics', category=cls.category, created_by=cls.colleague)
+        cls.question = Question.objects.create(test=cls.colleague_test, text='What does a view return?',
+                                               category=cls.category)
+        Option.objects.create(question=cls.question, text='HttpResponse decorator', is_correct=True)
+        foreign = Test.objects.create(title='Python for strangers', category=cls.category, created_by=cls.stranger)
+        Question.objects.create(test=foreign, text='Python decorator?', category=cls.category)
+        # setUpTestData не коммитит транзакцию, сигналы индекса не срабатывают
+        rebuild_search_index()
+
+    def search(self, query, **params):
+        self.client.force_login(self.employer)
+        return self.client.get(reverse('search_tests'), {'q': query, **params}).json()
+
+    def test_company_scope(self):
+        results = self.search('Python')['results']
+        self.assertEqual([(r['type'], r['test_id']) for r in results], [('test', self.test.id)])
+        self.assertEqual(results[0]['url'], reverse('edit_test', args=[self.test.id]))
+
+    def test_finds_option_text(self):
+        results = self.search('decorator')['results']
+        self.assertEqual([r['question_id'] for r in results], [self.question.id])
+        self.assertEqual(results[0]['test_title'], 'Django basics')
+        self.assertIsNone(results[0]['url'])
+
+    def test_keyset_pages(self):
+        for n in range(5):
+            Test.objects.create(title=f'Python track {n}', category=self.test.category, created_by=self.employer)
+        rebuild_search_index()
+        seen, cursor = [], None
+        while True:
+            page, cursor = search_page(self.employer, 'Python', cursor, size=2)
+            seen += [doc.id for doc in page]
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len(set(seen)), 6)
+        self.assertEqual(self.search('Python', cursor='garbage')['next_cursor'], None)
+
+    def test_index_follows_edits(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Option.objects.create(question=self.question, text='JsonResponse')
+        self.assertEqual(len(self.search('JsonResponse')['results']), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question.delete()
+        self.assertEqual(self.search('JsonResponse')['results'], [])
+
+    def test_query_budget(self):
+        self.client.force_login(self.employer)
+        self.assertQueryBudget(self.client, reverse('search_tests') + '?q=Python')
+
+    def test_applicant_denied(self):
+        self.client.force_login(self.applicant)
+        self.assertEqual(self.client.get(reverse('search_tests'), {'q': 'Python'}).status_code, 403)
+
+    def test_unapproved_employer_denied(self):
+        self.client.force_login(self.create_user('pending', 'employer'))
+        response = self.client.get(reverse('search_tests'), {'q': 'Python'})
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('results', response.json())
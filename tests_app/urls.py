@@ -13,16 +13,23 @@ urlpatterns = [
     path('company/dashboard/', views.company_dashboard, name='company_dashboard'),
     path('employer/dashboard/', views.employer_dashboard, name='employer_dashboard'),
     path('employer/tests/create/', views.create_test, name='create_test'),
+    path('employer/search/', views.search_tests, name='search_tests'),
     path('employer/tests/<int:test_id>/edit/', views.edit_test, name='edit_test'),
     path('employer/tests/<int:question_id>/edit_question/', views.edit_question, name='edit_question'),
     path('employer/tests/<int:question_id>/delete_question/', views.delete_question, name='delete_question'),
     path('employer/tests/<int:test_id>/delete/', views.delete_test, name='delete_test'),
     path('employer/tests/<int:test_id>/create_question/', views.create_question, name='create_question'),
+    path('employer/tests/<int:test_id>/import/', views.import_questions, name='import_questions'),
     path('employer/tests/<int:test_id>/assign/', views.assign_test, name='assign_test'),
     path('applicant/dashboard/', views.applicant_dashboard, name='applicant_dashboard'),
+    path('applicant/notifications/', views.notification_feed, name='notification_feed'),
+    path('applicant/notifications/stream/', views.notification_stream, name='notification_stream'),
     path('applicant/test/<int:assignment_id>/', views.take_test, name='take_test'),
+    path('applicant/test/<int:assignment_id>/single/', views.take_test_single, name='take_test_single'),
+    path('applicant/test/<int:assignment_id>/answers/', views.submit_answers, name='submit_answers'),
     path('applicant/test/<int:assignment_id>/result/', views.test_result, name='test_result'),
     path('employer/reports/', views.employer_reports, name='employer_reports'),
+    path('employer/reports/export/', views.export_reports, name='export_reports'),
     path('register/user/', views.user_registration, name='user_registration'),
     path('admin/companies/', views.company_approval_list, name='company_approval_list'),
     path('invite/applicant/', views.invite_applicant, name='invite_applicant'),
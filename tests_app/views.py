@@ -1,19 +1,37 @@
-from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required, user_passes_test
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.urls import reverse
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import login
 from django.contrib import messages
 from django.utils import timezone
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.views.decorators.csrf import csrf_exempt
 import json
 from .models import Test, Question, Option, TestAssignment, Answer, Category, Notification, CustomUser, Company, CompanyInvitation
-from .forms import CompanyRegistrationForm, UserRegistrationForm, CompanyInvitationForm
+from .grading import AnswerKey, grade_assignment, score_assignment, update_manual_score
+from .stats import dashboard_stats, question_timings
+from .caching import SHARED, fragment_versions, reset_fragments
+from .assignments import assign_test_bulk
+from .jobs import enqueue
+from .outbox import invite_applicants, parse_emails
+from .push import stream_notifications
+from .search import search_page
+from .access import role_required
+from .middleware import query_budget
+from .test_run import TestRun
+from .exports import aiterate, export_rows, stream_csv, stream_xlsx
+from .question_import import QuestionImportError, detect_format, import_questions as import_question_bank
+from .forms import CompanyRegistrationForm, UserRegistrationForm
 from django.contrib.auth.forms import AuthenticationForm
-from django.conf import settings
-from django.core.mail import send_mail
-from django.db.models import Avg
-from django.db.models import Count, Q
+from django.db.models import Count, F, Q, Prefetch
+
+REPORTS_PAGE_SIZE = 20
+SEARCH_QUERY_MAX_LENGTH = 200
+NOTIFICATIONS_PAGE_SIZE = 10
+# Сколько активных и завершённых назначений показывает дашборд соискателя
+DASHBOARD_ASSIGNMENTS = 20
 
 def index(request):
     return redirect('login')
@@ -112,12 +130,8 @@ def login_view(request):
         form = AuthenticationForm()
     return render(request, 'login.html', {'form': form})
 
-@login_required
+@role_required('admin', company=True)
 def company_dashboard(request):
-    if request.user.role != 'admin' or not request.user.company or not request.user.is_active:
-        messages.error(request, 'Доступ запрещён.')
-        return redirect('login')
-
     company = request.user.company
     pending_employers = CustomUser.objects.filter(company=company, role='employer', is_approved=False)
     approved_employers = CustomUser.objects.filter(company=company, role='employer', is_approved=True, is_active=True)
@@ -130,10 +144,10 @@ def company_dashboard(request):
         if action == 'approve_employer':
             employer.is_approved = True
             employer.save()
-            Notification.objects.create(
-                user=employer,
-                message=f"Ваша заявка на роль работодателя в компании '{company.name}' одобрена."
-            )
+            enqueue('notify', {
+                'user_ids': [employer.id],
+                'message': f"Ваша заявка на роль работодателя в компании '{company.name}' одобрена.",
+            })
             messages.success(request, f"Работодатель {employer.username} одобрен.")
         elif action == 'reject_employer':
             employer.delete()
@@ -141,10 +155,10 @@ def company_dashboard(request):
         elif action == 'block_employer':
             employer.is_active = False
             employer.save()
-            Notification.objects.create(
-                user=employer,
-                message=f"Ваш аккаунт в компании '{company.name}' заблокирован."
-            )
+            enqueue('notify', {
+                'user_ids': [employer.id],
+                'message': f"Ваш аккаунт в компании '{company.name}' заблокирован.",
+            })
             messages.success(request, f"Работодатель {employer.username} заблокирован.")
         return redirect('company_dashboard')
 
@@ -154,92 +168,95 @@ def company_dashboard(request):
         'approved_employers': approved_employers,
     })
 
-@login_required
+@role_required('employer', approved=True)
+@query_budget(10)
 def employer_dashboard(request):
-    if request.user.role == 'employer' and request.user.is_active and request.user.is_approved:
-        tests = Test.objects.filter(created_by=request.user)
-
-        search_query = request.GET.get('q', '')
-        if search_query:
-            tests = tests.filter(title__icontains=search_query)
-
-        category_filter = request.GET.get('category_filter', '')
-        if category_filter:
-            tests = tests.filter(category_id=category_filter)
-
-        position_filter = request.GET.get('position_filter', '')
-        if position_filter:
-            tests = tests.filter(position=position_filter)
-
-        categories = Category.objects.all()
-        if request.method == 'POST':
-            title = request.POST['title']
-            category_id = request.POST['category']
-            position = request.POST.get('position', '')
-            custom_position = request.POST.get('custom_position', '')
-            if position == 'other' and custom_position:
-                position = custom_position
-            elif not position:
-                position = None
-            Test.objects.create(title=title, category_id=category_id, created_by=request.user, position=position)
-            return redirect('employer_dashboard')
+    tests = Test.objects.filter(created_by=request.user).select_related('category')
+
+    search_query = request.GET.get('q', '')
+    if search_query:
+        tests = tests.filter(title__icontains=search_query)
+
+    category_filter = request.GET.get('category_filter', '')
+    if category_filter:
+        tests = tests.filter(category_id=category_filter)
 
-        assignments = TestAssignment.objects.filter(test__in=tests)
-        assigned_count = assignments.count()
-        completed_count = assignments.filter(is_active=False).count()
-        avg_score = Answer.objects.filter(
-            assignment__in=assignments,
-            assignment__is_active=False
-        ).aggregate(avg_score=Avg('manual_points'))['avg_score'] or 0
+    position_filter = request.GET.get('position_filter', '')
+    if position_filter:
+        tests = tests.filter(position=position_filter)
 
-        stats = {
+    categories = Category.objects.all()
+    if request.method == 'POST':
+        title = request.POST['title']
+        category_id = request.POST['category']
+        position = request.POST.get('position', '')
+        custom_position = request.POST.get('custom_position', '')
+        if position == 'other' and custom_position:
+            position = custom_position
+        elif not position:
+            position = None
+        Test.objects.create(title=title, category_id=category_id, created_by=request.user, position=position)
+        return redirect('employer_dashboard')
+
+    def chart_stats():
+        assigned_count, completed_count, avg_score = dashboard_stats(tests)
+        return {
             'labels': ['Назначено', 'Завершено', 'Средний балл'],
             'data': [assigned_count, completed_count, round(avg_score, 2)],
             'backgroundColor': ['#007bff', '#28a745', '#ffc107']
         }
 
-        applicants = CustomUser.objects.filter(role='applicant')
-        if not applicants.exists():
-            messages.warning(request, 'Нет соискателей с role="applicant" в базе данных.')
-        elif request.user.company:
-            applicants = applicants.filter(company=request.user.company)
-            if not applicants.exists():
-                messages.warning(request, 'Нет соискателей в компании работодателя.')
-        else:
-            messages.warning(request, 'У работодателя не указана компания. Показываю всех соискателей.')
-            applicants = CustomUser.objects.filter(role='applicant')  # Показываем всех, если нет компании
-
-        return render(request, 'employer_dashboard.html', {
-            'tests': tests,
-            'categories': categories,
-            'stats': stats,
-            'applicants': applicants,
-        })
-    elif request.user.role == 'employer' and not request.user.is_approved:
-        messages.warning(request, 'Ваша заявка на роль работодателя еще не одобрена. Функции работодателя недоступны.')
-        return render(request, 'pending_approval.html')
-    messages.error(request, 'Ваш аккаунт заблокирован или доступ запрещён.')
-    return redirect('login')
+    # Работодатель без компании видит всех соискателей
+    applicants = CustomUser.objects.filter(role='applicant')
+    if request.user.company_id:
+        applicants = applicants.filter(company_id=request.user.company_id)
+
+    # Запросы выполняются только при промахе кэша фрагментов шаблона
+    # (функцию шаблон вызывает сам, один раз внутри {% cache %})
+    return render(request, 'employer_dashboard.html', {
+        'tests': tests,
+        'categories': categories,
+        'stats': chart_stats,
+        'applicants': applicants,
+        'fragments': fragment_versions(user=request.user.id, company=request.user.company_id or SHARED,
+                                       categories=SHARED),
+    })
+
+@role_required('employer', approved=True, api=True)
+@query_budget(3)
+def search_tests(request):
+    """Поиск по тестам и вопросам компании; следующая страница - ?cursor= из next_cursor."""
+    query = request.GET.get('q', '').strip()[:SEARCH_QUERY_MAX_LENGTH]
+    if not query:
+        return JsonResponse({'results': [], 'next_cursor': None})
+    page, next_cursor = search_page(request.user, query, request.GET.get('cursor'))
+    return JsonResponse({
+        'results': [{
+            'type': 'question' if doc.question_id else 'test',
+            'test_id': doc.test_id,
+            'test_title': doc.test.title,
+            'question_id': doc.question_id,
+            'text': doc.title,
+            'rank': doc.rank,
+            # Тесты коллег можно найти, но редактирует их только автор
+            'url': reverse('edit_test', args=[doc.test_id]) if doc.test.created_by_id == request.user.id else None,
+        } for doc in page],
+        'next_cursor': next_cursor,
+    })
 
-@login_required
+@role_required('employer')
 def create_test(request):
-    if request.user.role == 'employer' and request.user.is_active:
-        if request.method == 'POST':
-            title = request.POST['title']
-            category_id = request.POST['category']
-            time_limit = request.POST['time_limit']
-            Test.objects.create(title=title, category_id=category_id, created_by=request.user, time_limit=time_limit)
-            return redirect('employer_dashboard')
-        categories = Category.objects.all()
-        return render(request, 'create_test.html', {'categories': categories})
-    messages.error(request, 'Ваш аккаунт заблокирован.')
-    return redirect('login')
+    if request.method == 'POST':
+        title = request.POST['title']
+        category_id = request.POST['category']
+        time_limit = request.POST['time_limit']
+        Test.objects.create(title=title, category_id=category_id, created_by=request.user, time_limit=time_limit)
+        return redirect('employer_dashboard')
+    categories = Category.objects.all()
+    return render(request, 'create_test.html', {'categories': categories})
 
-@login_required
+@role_required()
 def edit_test(request, test_id):
-    if not request.user.is_active:
-        messages.error(request, 'Ваш аккаунт заблокирован.')
-        return redirect('login')
     test = get_object_or_404(Test, id=test_id, created_by=request.user)
     if request.method == 'POST':
         test.title = request.POST['title']
@@ -247,14 +264,11 @@ def edit_test(request, test_id):
         test.save()
         return redirect('edit_test', test_id=test.id)
     categories = Category.objects.all()
-    questions = Question.objects.filter(test=test)
+    questions = question_timings(Question.objects.filter(test=test).order_by('id'))
     return render(request, 'edit_test.html', {'test': test, 'categories': categories, 'questions': questions})
 
-@login_required
+@role_required()
 def edit_question(request, question_id):
-    if not request.user.is_active:
-        messages.error(request, 'Ваш аккаунт заблокирован.')
-        return redirect('login')
     question = get_object_or_404(Question, id=question_id)
     if request.method == 'POST':
         question.text = request.POST['text']
@@ -266,11 +280,8 @@ def edit_question(request, question_id):
     categories = Category.objects.all()
     return render(request, 'edit_question.html', {'question': question, 'categories': categories})
 
-@login_required
+@role_required()
 def delete_question(request, question_id):
-    if not request.user.is_active:
-        messages.error(request, 'Ваш аккаунт заблокирован.')
-        return redirect('login')
     question = get_object_or_404(Question, id=question_id)
     test_id = question.test.id
     if request.method == 'POST':
@@ -278,23 +289,17 @@ def delete_question(request, question_id):
         return redirect('edit_test', test_id=test_id)
     return render(request, 'delete_question.html', {'question': question})
 
-@login_required
+@role_required()
 def delete_test(request, test_id):
-    if not request.user.is_active:
-        messages.error(request, 'Ваш аккаунт заблокирован.')
-        return redirect('login')
     test = get_object_or_404(Test, id=test_id, created_by=request.user)
     if request.method == 'POST':
         test.delete()
         return redirect('employer_dashboard')
     return render(request, 'delete_test.html', {'test': test})
 
-@login_required
+@role_required()
 @csrf_exempt
 def create_question(request, test_id):
-    if not request.user.is_active:
-        messages.error(request, 'Ваш аккаунт заблокирован.')
-        return redirect('login')
     test = get_object_or_404(Test, id=test_id, created_by=request.user)
     if request.method == 'POST':
         data = json.loads(request.body)
@@ -318,29 +323,77 @@ def create_question(request, test_id):
     categories = Category.objects.all()
     return render(request, 'create_question.html', {'test': test, 'categories': categories})
 
-@login_required
+@role_required()
+def import_questions(request, test_id):
+    test = get_object_or_404(Test, id=test_id, created_by=request.user)
+    if request.method != 'POST':
+        return redirect('edit_test', test_id=test.id)
+    wants_json = request.content_type == 'application/json'
+    if wants_json:
+        # {"format": "gift", "content": "..."} или {"questions": [...]}
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'status': 'error', 'errors': [{'row': 0, 'errors': ['Некорректный JSON.']}]}, status=400)
+        if not isinstance(data, dict):
+            data = {'questions': data}
+        fmt = data.get('format', 'json')
+        content = data['content'] if 'content' in data else json.dumps(data.get('questions', []))
+    else:
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, 'Выберите файл для импорта.')
+            return redirect('edit_test', test_id=test.id)
+        fmt = request.POST.get('format') or detect_format(upload.name)
+        content = upload.read().decode('utf-8-sig', errors='replace')
+    try:
+        created = import_question_bank(test, content, fmt)
+    except QuestionImportError as e:
+        if wants_json:
+            return JsonResponse({'status': 'error', 'errors': e.errors}, status=400)
+        for error in e.errors[:20]:
+            messages.error(request, f"Строка {error['row']}: {' '.join(error['errors'])}")
+        return redirect('edit_test', test_id=test.id)
+    if wants_json:
+        return JsonResponse({'status': 'success', 'created': created})
+    messages.success(request, f'Импортировано вопросов: {created}.')
+    return redirect('edit_test', test_id=test.id)
+
+@role_required('employer', approved=True, company=True)
 def assign_test(request, test_id):
-    if request.user.role == 'employer' and request.user.is_active and request.user.is_approved and request.user.company:
-        test = get_object_or_404(Test, id=test_id, created_by=request.user)
-        if request.method == 'POST':
-            applicant_username = request.POST['applicant']
-            applicant = get_object_or_404(CustomUser, username=applicant_username, role='applicant', company=request.user.company)
-            TestAssignment.objects.create(test=test, applicant=applicant)
-            messages.success(request, f'Тест "{test.title}" назначен соискателю {applicant.username}.')
+    test = get_object_or_404(Test, id=test_id, created_by=request.user)
+    company_applicants = CustomUser.objects.filter(role='applicant', company=request.user.company)
+    if request.method == 'POST':
+        mode = request.POST.get('mode', 'applicant')
+        if mode == 'selected':
+            ids = [i for i in request.POST.getlist('applicant_ids') if i.isdigit()]
+            targets = company_applicants.filter(id__in=ids)
+        elif mode == 'position':
+            targets = company_applicants.filter(position=request.POST.get('position', ''))
+        elif mode == 'company':
+            targets = company_applicants
+        else:
+            applicant = get_object_or_404(company_applicants, username=request.POST.get('applicant', ''))
+            targets = company_applicants.filter(id=applicant.id)
+        created, skipped = assign_test_bulk(test, targets)
+        if created:
+            messages.success(request, f'Тест "{test.title}" назначен соискателям: {created}.')
+        if skipped:
+            messages.warning(request, f'Уже был назначен, пропущено: {skipped}.')
+        if not created and not skipped:
+            messages.warning(request, 'Не найдено соискателей для назначения.')
+        if mode == 'applicant':
             return redirect('employer_dashboard')
-        applicants = CustomUser.objects.filter(role='applicant', company=request.user.company)
-        if not applicants.exists():
-            messages.warning(request, 'В вашей компании нет зарегистрированных соискателей.')
-        return render(request, 'assign_test.html', {'test': test, 'applicants': applicants})
-    messages.error(request, 'Ваш аккаунт заблокирован, не одобрен или не привязан к компании.')
-    return redirect('login')
-
-@login_required
+        return redirect('assign_test', test_id=test.id)
+    applicants = list(company_applicants.annotate(assigned_count=Count('assigned_tests')).order_by('username'))
+    if not applicants:
+        messages.warning(request, 'В вашей компании нет зарегистрированных соискателей.')
+    positions = sorted({a.position for a in applicants if a.position})
+    return render(request, 'assign_test.html', {'test': test, 'applicants': applicants, 'positions': positions})
+
+@role_required()
+@query_budget(8)
 def applicant_dashboard(request):
-    if not request.user.is_active:
-        messages.error(request, 'Ваш аккаунт заблокирован.')
-        return redirect('login')
-
     if request.method == 'POST' and 'mark_read' in request.POST:
         notification_id = request.POST.get('notification_id')
         notification = get_object_or_404(Notification, id=notification_id, user=request.user)
@@ -349,120 +402,256 @@ def applicant_dashboard(request):
         messages.success(request, 'Уведомление отмечено как прочитанное.')
         return redirect('applicant_dashboard')
 
-    notifications = request.user.notifications.all().order_by('-created_at')
-    unread_count = notifications.filter(is_read=False).count()
-
-    active_assignments = TestAssignment.objects.filter(applicant=request.user, is_active=True).select_related('test')
-
-    completed_assignments = TestAssignment.objects.filter(applicant=request.user, is_active=False).select_related('test')
-
-    profile = {
-        'username': request.user.username,
-        'email': request.user.email,
-        'role': request.user.get_role_display(),
-        'is_active': request.user.is_active,
-        'company': request.user.company.name if request.user.company else 'Не указана',
-        'first_name': request.user.first_name,
-        'last_name': request.user.last_name,
-        'position': request.user.position if request.user.position else 'Не указана'
-    }
-
-    accepted_count = completed_assignments.filter(is_accepted=True).count()
-    rejected_count = completed_assignments.filter(is_rejected=True).count()
-    pending_count = active_assignments.count()
+    notifications = list(request.user.notifications.order_by('-id')[:NOTIFICATIONS_PAGE_SIZE + 1])
+    has_more_notifications = len(notifications) > NOTIFICATIONS_PAGE_SIZE
+    notifications = notifications[:NOTIFICATIONS_PAGE_SIZE]
+    unread_count = Notification.objects.filter(user=request.user, is_read=False).count()
+
+    # Списки ограничены: счётчики для графика и подписей берутся из одного агрегата
+    assignments = TestAssignment.objects.filter(applicant=request.user).select_related('test')
+    active_assignments = list(assignments.filter(is_active=True).order_by('id')[:DASHBOARD_ASSIGNMENTS])
+    completed_assignments = list(assignments.filter(is_active=False).order_by('-id')[:DASHBOARD_ASSIGNMENTS])
+    counts = assignments.aggregate(
+        accepted=Count('id', filter=Q(is_active=False, is_accepted=True)),
+        rejected=Count('id', filter=Q(is_active=False, is_rejected=True)),
+        pending=Count('id', filter=Q(is_active=True)),
+        completed=Count('id', filter=Q(is_active=False)),
+    )
     stats = {
         'labels': ['Приняты', 'Отклонены', 'В ожидании'],
-        'data': [accepted_count, rejected_count, pending_count],
+        'data': [counts['accepted'], counts['rejected'], counts['pending']],
         'backgroundColor': ['#28a745', '#dc3545', '#6c757d']
     }
 
     return render(request, 'applicant_dashboard.html', {
-        'profile': profile,
+        # Компания загружена вместе с пользователем (CompanyModelBackend), профиль не кэшируется
+        'profile': request.user,
         'active_assignments': active_assignments,
+        'active_count': counts['pending'],
         'completed_assignments': completed_assignments,
+        'completed_count': counts['completed'],
         'notifications': notifications,
+        'has_more_notifications': has_more_notifications,
         'unread_count': unread_count,
         'stats': stats,
     })
 
-@login_required
+@role_required(api=True)
+@query_budget(4)
+async def notification_feed(request):
+    user = await request.auser()
+    notifications = Notification.objects.filter(user=user).order_by('-id')
+    before = request.GET.get('before', '')
+    if before.isdigit():
+        notifications = notifications.filter(id__lt=before)
+    page = [item async for item in notifications.values('id', 'message', 'is_read', 'created_at')[
+        :NOTIFICATIONS_PAGE_SIZE + 1]]
+    has_more = len(page) > NOTIFICATIONS_PAGE_SIZE
+    page = page[:NOTIFICATIONS_PAGE_SIZE]
+    for item in page:
+        item['created_at'] = timezone.localtime(item['created_at']).strftime('%d.%m.%Y %H:%M')
+    return JsonResponse({
+        'notifications': page,
+        'next_cursor': page[-1]['id'] if has_more else None,
+    })
+
+@role_required(api=True)
+async def notification_stream(request):
+    """Поток новых уведомлений (server-sent events); держит соединение только под ASGI."""
+    user = await request.auser()
+    if not isinstance(request, ASGIRequest):
+        # Под WSGI поток занял бы поток сервера целиком; 204 останавливает переподключения EventSource
+        return HttpResponse(status=204)
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('after', '')
+    if last_id.isdigit():
+        last_id = int(last_id)
+    else:
+        last_id = await Notification.objects.filter(user=user).order_by('-id').values_list('id', flat=True).afirst() or 0
+    response = StreamingHttpResponse(stream_notifications(user.id, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def get_run(request, assignment_id):
+    """Начатое прохождение из сессии или новое; None, если тест уже завершён."""
+    run = TestRun.load(request.session, assignment_id)
+    if run is None:
+        assignment = get_object_or_404(TestAssignment, id=assignment_id, applicant=request.user)
+        if not assignment.is_active:
+            return None
+        run = TestRun.start(request.session, assignment)
+    return run
+
+async def aget_run(request, user, assignment_id):
+    run = await TestRun.aload(request.session, assignment_id)
+    if run is None:
+        assignment = await aget_object_or_404(TestAssignment, id=assignment_id, applicant=user)
+        if not assignment.is_active:
+            return None
+        run = await TestRun.astart(request.session, assignment)
+    return run
+
+def finish_run(session, run):
+    """Закрывает прохождение: назначение становится неактивным и ставится в очередь на проверку.
+
+    Устаревшее прохождение (попытку уже закрыла другая сессия или
+    назначение удалено) только выбрасывается из сессии.
+    """
+    run.discard(session)
+    if TestAssignment.objects.filter(id=run.assignment_id, is_active=True).update(
+            is_active=False, finished_at=timezone.now()):
+        # Баллы считает воркер; test_result проверит сам, если воркер ещё не успел
+        enqueue('grade_assignment', {'assignment_id': run.assignment_id}, key=f'grade:{run.assignment_id}')
+
+@role_required()
 @csrf_exempt
-def take_test(request, assignment_id):
-    if not request.user.is_active:
-        messages.error(request, 'Ваш аккаунт заблокирован.')
-        return redirect('login')
-    assignment = get_object_or_404(TestAssignment, id=assignment_id, applicant=request.user)
+@query_budget(12)
+async def take_test(request, assignment_id):
+    # Асинхронная: соискатель подолгу думает над вопросом, и под ASGI
+    # соединения между ответами не занимают поток сервера
+    user = await request.auser()
+    run = await aget_run(request, user, assignment_id)
+    if run is None:
+        return redirect('test_result', assignment_id=assignment_id)
     if request.method == 'POST':
         data = json.loads(request.body)
-        question_id = data['question_id']
-        answer_text = data.get('answer_text', '')
-        selected_option_id = data.get('selected_option_id')
-        selected_option_ids = data.get('selected_option_ids', [])
-        time_taken = data.get('time_taken', 0)
-        question = get_object_or_404(Question, id=question_id)
-        answer, created = Answer.objects.get_or_create(assignment=assignment, question=question)
-        if time_taken > 0:
-            answer.answer_text = ','.join(map(str, selected_option_ids)) if selected_option_ids else answer_text
-            answer.selected_option_id = selected_option_id
-            answer.time_taken = time_taken
-            answer.is_submitted = True
-            answer.save()
-            return JsonResponse({'status': 'success'})
-    current_question = Question.objects.filter(test=assignment.test).exclude(
-        id__in=Answer.objects.filter(assignment=assignment, is_submitted=True).values('question_id')).first()
-    if not current_question:
-        assignment.is_active = False
-        assignment.save()
-        return redirect('test_result', assignment_id=assignment.id)
-    options = current_question.option_set.all()
-    has_options = options.exists()
-    is_multiple = current_question.question_type == 'multiple'
+        if await run.asubmit(data):
+            await run.asave(request.session)
+        elif run.closed:
+            await run.adiscard(request.session)
+            return JsonResponse({'status': 'error', 'message': 'Тест уже завершён.'}, status=409)
+        return JsonResponse({'status': 'success'})
+    skipped = await run.askip_expired()
+    if run.closed:
+        await run.adiscard(request.session)
+        return redirect('test_result', assignment_id=assignment_id)
+    current_question = run.current_question
+    if not current_question or run.is_expired():
+        await sync_to_async(finish_run)(request.session, run)
+        return redirect('test_result', assignment_id=assignment_id)
+    if run.serve([current_question]) or skipped:
+        await run.asave(request.session)
+    options = current_question['options']
     return render(request, 'take_test.html', {
-        'assignment': assignment,
+        'assignment_id': run.assignment_id,
+        'test_title': run.title,
         'current_question': current_question,
         'options': options,
-        'has_options': has_options,
-        'is_multiple': is_multiple,
+        'has_options': bool(options),
+        'is_multiple': current_question['question_type'] == 'multiple',
     })
 
-@login_required
-def test_result(request, assignment_id):
-    if not request.user.is_active:
-        messages.error(request, 'Ваш аккаунт заблокирован.')
-        return redirect('login')
-    assignment = get_object_or_404(TestAssignment, id=assignment_id, applicant=request.user)
-    answers = Answer.objects.filter(assignment=assignment)
-    score = 0
-    max_score = 0
-    for answer in answers:
-        question = answer.question
-        options = question.option_set.all()
-        if options.exists():
-            max_score += question.points
-            correct_options = set(str(opt.id) for opt in options if opt.is_correct)
-            if answer.answer_text:
-                selected_ids = set(answer.answer_text.split(','))
-                if selected_ids == correct_options and correct_options:
-                    score += question.points
-            elif answer.selected_option and str(answer.selected_option.id) in correct_options:
-                if len(correct_options) == 1:
-                    score += question.points
-    return render(request, 'test_result.html', {'score': score, 'max_score': max_score})
-
-@login_required
+@role_required(api=True)
+@query_budget(14)
+def submit_answers(request, assignment_id):
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Метод не поддерживается.'}, status=405)
+    try:
+        data = json.loads(request.body)
+        items = data.get('answers', [])
+    except (ValueError, AttributeError):
+        return JsonResponse({'status': 'error', 'message': 'Некорректный JSON.'}, status=400)
+    if not isinstance(items, list):
+        return JsonResponse({'status': 'error', 'message': 'Ожидается список ответов.'}, status=400)
+    run = get_run(request, assignment_id)
+    if run is None:
+        return JsonResponse({'status': 'error', 'message': 'Тест уже завершён.'}, status=409)
+    saved = run.submit_many(item for item in items if isinstance(item, dict))
+    if run.closed:
+        # Попытку закрыли в другой сессии: её ответы уже проверены
+        run.discard(request.session)
+        return JsonResponse({'status': 'error', 'message': 'Тест уже завершён.'}, status=409)
+    # finish: клиент завершает тест досрочно, например по общему таймеру
+    finished = run.is_finished or run.is_expired() or data.get('finish') is True
+    if finished:
+        finish_run(request.session, run)
+    else:
+        run.save(request.session)
+    return JsonResponse({
+        'status': 'success',
+        'saved': saved,
+        'rejected': [item.get('question_id') for item in items if isinstance(item, dict) and item.get('question_id') not in saved],
+        'finished': finished,
+        'result_url': reverse('test_result', args=[assignment_id]) if finished else None,
+    })
+
+@role_required()
+@query_budget(12)
+def take_test_single(request, assignment_id):
+    """Тест на одной странице: все вопросы приходят сразу, ответы отправляются пачкой в submit_answers."""
+    run = get_run(request, assignment_id)
+    if run is None:
+        return redirect('test_result', assignment_id=assignment_id)
+    if run.is_finished or run.is_expired():
+        finish_run(request.session, run)
+        return redirect('test_result', assignment_id=assignment_id)
+    payload = run.payload()
+    run.save(request.session)
+    return render(request, 'take_test_single.html', {
+        'assignment_id': assignment_id,
+        'test_title': run.title,
+        'payload': payload,
+    })
+
+@role_required()
+@query_budget(10)
+async def test_result(request, assignment_id):
+    user = await request.auser()
+    assignment = await aget_object_or_404(TestAssignment, id=assignment_id, applicant=user)
+    # Обычно результат уже посчитан воркером, и хватает одного запроса
+    if assignment.graded_at is None:
+        if assignment.is_active:
+            # Тест ещё идёт: показываем текущий результат, не сохраняя его
+            result = await sync_to_async(score_assignment)(assignment)
+            return render(request, 'test_result.html', {'score': result.total, 'max_score': result.max_total})
+        await sync_to_async(grade_assignment)(assignment)
+    return render(request, 'test_result.html', {'score': assignment.total_score, 'max_score': assignment.max_score})
+
+def filter_assignments(assignments, params):
+    """Фильтры отчёта по тесту, статусу, дате завершения и итоговому баллу."""
+    test_filter = params.get('test_filter', '')
+    if test_filter.isdigit():
+        assignments = assignments.filter(test_id=test_filter)
+    status_filter = params.get('status_filter', '')
+    if status_filter == 'accepted':
+        assignments = assignments.filter(is_accepted=True)
+    elif status_filter == 'rejected':
+        assignments = assignments.filter(is_rejected=True)
+    elif status_filter == 'pending':
+        assignments = assignments.filter(is_accepted=False, is_rejected=False)
+    # Дата фильтрует по времени, когда соискатель завершил тест, а не когда его проверили
+    try:
+        if params.get('date_from'):
+            date_from = timezone.datetime.strptime(params['date_from'], '%Y-%m-%d').date()
+            assignments = assignments.filter(finished_at__date__gte=date_from)
+        if params.get('date_to'):
+            date_to = timezone.datetime.strptime(params['date_to'], '%Y-%m-%d').date()
+            assignments = assignments.filter(finished_at__date__lte=date_to)
+    except ValueError:
+        pass
+    # Балл - сохранённый итог проверки, непроверенные назначения под фильтр не попадают
+    score_min = params.get('score_min', '')
+    score_max = params.get('score_max', '')
+    if score_min.isdigit() or score_max.isdigit():
+        assignments = assignments.alias(score=F('auto_score') + F('manual_score')).filter(graded_at__isnull=False)
+        if score_min.isdigit():
+            assignments = assignments.filter(score__gte=int(score_min))
+        if score_max.isdigit():
+            assignments = assignments.filter(score__lte=int(score_max))
+    return assignments
+
+@role_required('employer')
+@query_budget(14)
 def employer_reports(request):
-    if not request.user.role == 'employer' or not request.user.is_active:
-        messages.error(request, 'Ваш аккаунт заблокирован или доступ запрещён.')
-        return redirect('login')
     tests = Test.objects.filter(created_by=request.user)
-    assignments = TestAssignment.objects.filter(test__in=tests).select_related('applicant', 'test')
+    assignments = TestAssignment.objects.filter(test__created_by=request.user).select_related('applicant', 'test')
 
     if request.method == 'POST':
         if 'assignment_id' in request.POST:
             assignment_id = request.POST.get('assignment_id')
             is_accepted = request.POST.get('is_accepted')
             is_rejected = request.POST.get('is_rejected')
-            assignment = get_object_or_404(TestAssignment, id=assignment_id, test__created_by=request.user)
+            assignment = get_object_or_404(TestAssignment.objects.select_related('test'), id=assignment_id, test__created_by=request.user)
             prev_status = {
                 'accepted': assignment.is_accepted,
                 'rejected': assignment.is_rejected
@@ -474,6 +663,7 @@ def employer_reports(request):
                 assignment.is_accepted = False
                 assignment.is_rejected = True
             assignment.save()
+            reset_fragments('user', [request.user.id])
 
             if (is_accepted and not prev_status['accepted']) or (is_rejected and not prev_status['rejected']):
                 message = (
@@ -481,11 +671,14 @@ def employer_reports(request):
                     if is_accepted else
                     f"К сожалению, вы отклонены по результатам теста '{assignment.test.title}'."
                 )
-                Notification.objects.update_or_create(
-                    user=assignment.applicant,
-                    test=assignment.test,
-                    defaults={'message': message, 'is_read': False}
-                )
+                # Без ключа идемпотентности: каждое изменение решения должно дойти до соискателя,
+                # а повтор задачи безопасен - replace перезаписывает то же уведомление
+                enqueue('notify', {
+                    'user_ids': [assignment.applicant_id],
+                    'test_id': assignment.test_id,
+                    'message': message,
+                    'replace': True,
+                })
         elif 'delete_assignment_id' in request.POST:
             delete_id = request.POST.get('delete_assignment_id')
             assignment = get_object_or_404(TestAssignment, id=delete_id, test__created_by=request.user)
@@ -494,67 +687,99 @@ def employer_reports(request):
         elif 'manual_score' in request.POST:
             answer_id = request.POST.get('answer_id')
             manual_points = int(request.POST.get('manual_score', 0))
-            answer = get_object_or_404(Answer, id=answer_id, assignment__test__created_by=request.user)
+            answer = get_object_or_404(Answer.objects.select_related('assignment'), id=answer_id, assignment__test__created_by=request.user)
+            old_points = answer.manual_points
             answer.manual_points = manual_points
             answer.save()
+            update_manual_score(answer, old_points, request.user.id)
             return redirect('employer_reports')
 
+    filtered = filter_assignments(assignments, request.GET)
+    test_filter = request.GET.get('test_filter', '')
+    status_filter = request.GET.get('status_filter', '')
+    date_from = request.GET.get('date_from', '')
+    date_to = request.GET.get('date_to', '')
+    score_min = request.GET.get('score_min', '')
+    score_max = request.GET.get('score_max', '')
+
+    # Постраничный вывод по курсору: страница начинается после последнего показанного id
+    cursor = request.GET.get('cursor', '')
+    if cursor.isdigit():
+        filtered = filtered.filter(id__lt=cursor)
+    page = list(filtered.order_by('-id').prefetch_related(
+        Prefetch('answer_set', queryset=Answer.objects.select_related('question').order_by('question_id'), to_attr='answers')
+    )[:REPORTS_PAGE_SIZE + 1])
+    next_url = None
+    if len(page) > REPORTS_PAGE_SIZE:
+        page = page[:REPORTS_PAGE_SIZE]
+        params = request.GET.copy()
+        params['cursor'] = page[-1].id
+        next_url = f"?{params.urlencode()}"
+
+    keys = AnswerKey.for_tests({a.test_id for a in page})
     assignment_data = []
-    for a in assignments:
+    for a in page:
+        key = keys[a.test_id]
         answers = []
-        for ans in Answer.objects.filter(assignment=a).select_related('question', 'selected_option'):
-            score = 0
-            selected_text = []
-            if ans.question.question_type == 'open':
-                score = ans.manual_points
-                selected_text = [ans.answer_text] if ans.answer_text else ["(нет ответа)"]
-            elif ans.question.question_type == 'multiple' and ans.answer_text:
-                selected_ids = ans.answer_text.split(',')
-                selected_options = Option.objects.filter(id__in=selected_ids)
-                selected_text = [opt.text for opt in selected_options]
-                correct_ids = set(str(opt.id) for opt in ans.question.option_set.filter(is_correct=True))
-                if set(selected_ids) == correct_ids and correct_ids:
-                    score = ans.question.points
-            elif ans.question.question_type == 'single' and ans.selected_option:
-                selected_text = [ans.selected_option.text]
-                if ans.selected_option.is_correct:
-                    score = ans.question.points
-            else:
-                selected_text = ["(нет ответа)"]
+        for ans in a.answers:
+            score = key.score_answer(ans.question_id, ans.selected_option_id, ans.answer_text, ans.manual_points)
+            selected_text = key.selected_texts(ans.question_id, ans.selected_option_id, ans.answer_text)
             answers.append({
                 'answer': ans,
                 'score': score,
-                'selected_text': selected_text
+                'selected_text': selected_text or ["(нет ответа)"]
             })
         assignment_data.append({
             'assignment': a,
             'answers': answers,
         })
 
-    status_counts = assignments.aggregate(
-        accepted=Count('id', filter=Q(is_accepted=True)),
-        rejected=Count('id', filter=Q(is_rejected=True)),
-        pending=Count('id', filter=~Q(is_accepted=True) & ~Q(is_rejected=True))
-    )
-    chart_data = {
-        'labels': ['Принято', 'Отклонено', 'Ожидает'],
-        'data': [status_counts['accepted'], status_counts['rejected'], status_counts['pending']],
-        'backgroundColor': ['#28a745', '#dc3545', '#6c757d']
-    }
+    def status_chart():
+        status_counts = assignments.aggregate(
+            accepted=Count('id', filter=Q(is_accepted=True)),
+            rejected=Count('id', filter=Q(is_rejected=True)),
+            pending=Count('id', filter=~Q(is_accepted=True) & ~Q(is_rejected=True))
+        )
+        return {
+            'labels': ['Принято', 'Отклонено', 'Ожидает'],
+            'data': [status_counts['accepted'], status_counts['rejected'], status_counts['pending']],
+            'backgroundColor': ['#28a745', '#dc3545', '#6c757d']
+        }
 
     return render(request, 'employer_reports.html', {
         'assignment_data': assignment_data,
-        'chart_data': chart_data,
+        'chart_data': status_chart,
+        'tests': tests.only('id', 'title'),
+        'test_filter': test_filter,
+        'status_filter': status_filter,
+        'date_from': date_from,
+        'date_to': date_to,
+        'score_min': score_min,
+        'score_max': score_max,
+        'next_url': next_url,
+        'fragments': fragment_versions(user=request.user.id),
     })
 
-def is_admin(user):
-    return hasattr(user, 'role') and user.role == 'admin'
-
-@login_required
+@role_required('employer')
+def export_reports(request):
+    assignments = filter_assignments(TestAssignment.objects.filter(test__created_by=request.user), request.GET)
+    rows = export_rows(assignments)
+    filename = f"results_{timezone.now():%Y%m%d_%H%M}"
+    if request.GET.get('format') == 'xlsx':
+        body, extension = stream_xlsx(rows), 'xlsx'
+        content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        body, extension = stream_csv(rows), 'csv'
+        content_type = 'text/csv; charset=utf-8'
+    if isinstance(request, ASGIRequest):
+        # Под ASGI синхронный генератор был бы прочитан в память целиком
+        body = aiterate(body)
+    response = StreamingHttpResponse(body, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    return response
+
+@role_required()
 def user_registration(request):
-    if not request.user.is_active:
-        messages.error(request, 'Ваш аккаунт заблокирован.')
-        return redirect('login')
     if request.method == 'POST':
         form = UserRegistrationForm(request.POST)
         if form.is_valid():
@@ -571,12 +796,8 @@ def user_registration(request):
         form = UserRegistrationForm()
     return render(request, 'user_registration.html', {'form': form})
 
-@login_required
-@user_passes_test(is_admin)
+@role_required('admin')
 def manage_users(request):
-    if not request.user.is_active:
-        messages.error(request, 'Ваш аккаунт заблокирован.')
-        return redirect('login')
     company = request.user.company
     pending_employers = CustomUser.objects.filter(company=company, role='employer', is_approved=False)
     approved_employers = CustomUser.objects.filter(company=company, role='employer', is_approved=True, is_active=True)
@@ -601,10 +822,10 @@ def manage_users(request):
             if action == 'approve_employer':
                 user.is_approved = True
                 user.save()
-                Notification.objects.create(
-                    user=user,
-                    message=f"Ваша заявка на роль работодателя в компании '{company.name}' одобрена."
-                )
+                enqueue('notify', {
+                    'user_ids': [user.id],
+                    'message': f"Ваша заявка на роль работодателя в компании '{company.name}' одобрена.",
+                })
                 messages.success(request, f"Работодатель {user.username} одобрен.")
             elif action == 'reject_employer':
                 user.delete()
@@ -612,18 +833,18 @@ def manage_users(request):
             elif action == 'block_employer':
                 user.is_active = False
                 user.save()
-                Notification.objects.create(
-                    user=user,
-                    message=f"Ваш аккаунт в компании '{company.name}' заблокирован."
-                )
+                enqueue('notify', {
+                    'user_ids': [user.id],
+                    'message': f"Ваш аккаунт в компании '{company.name}' заблокирован.",
+                })
                 messages.success(request, f"Работодатель {user.username} заблокирован.")
             elif action == 'unblock_employer':
                 user.is_active = True
                 user.save()
-                Notification.objects.create(
-                    user=user,
-                    message=f"Ваш аккаунт в компании '{company.name}' разблокирован."
-                )
+                enqueue('notify', {
+                    'user_ids': [user.id],
+                    'message': f"Ваш аккаунт в компании '{company.name}' разблокирован.",
+                })
                 messages.success(request, f"Работодатель {user.username} разблокирован.")
             elif action == 'delete_employer':
                 user.delete()
@@ -637,6 +858,7 @@ def manage_users(request):
         'blocked_employers': blocked_employers,
         'invitations': CompanyInvitation.objects.filter(company=company),
         'date_filter': date_filter,
+        'fragments': fragment_versions(company=request.user.company_id or SHARED),
     })
 
 @staff_member_required
@@ -661,25 +883,21 @@ def company_approval_list(request):
         return redirect('company_approval_list')
     return render(request, 'company_approval_list.html', {'companies': companies})
 
-@login_required
+@role_required('admin')
 def invite_applicant(request):
     if request.method == 'POST':
-        email = request.POST.get('email')
-        if email:
-            if not CompanyInvitation.objects.filter(email=email).exists():
-                subject = 'Приглашение на регистрацию соискателя'
-                message = f'Здравствуйте! Вы приглашены зарегистрироваться как соискатель. Перейдите по ссылке: http://127.0.0.1:8000/register/applicant/'
-                from_email = settings.EMAIL_HOST_USER
-                recipient_list = [email]
-                try:
-                    send_mail(subject, message, from_email, recipient_list)
-                    CompanyInvitation.objects.create(email=email)
-                    messages.success(request, f'Приглашение отправлено на {email}')
-                except Exception as e:
-                    messages.error(request, f'Ошибка отправки: {str(e)}')
-            else:
-                messages.error(request, 'Приглашение для этого email уже отправлено.')
-        else:
+        emails, invalid = parse_emails(
+            ' '.join([request.POST.get('email', ''), request.POST.get('emails', '')]), request.FILES.get('file'))
+        if invalid:
+            messages.warning(request, f'Некорректные адреса пропущены: {", ".join(invalid[:10])}')
+        if not emails:
             messages.error(request, 'Введите email адрес.')
+            return redirect('invite_applicant')
+        # Письма отправляет воркер очереди задач, запрос не ждёт SMTP
+        queued, skipped = invite_applicants(emails, request.build_absolute_uri(reverse('register_applicant')))
+        if queued:
+            messages.success(request, f'Приглашений поставлено в очередь отправки: {queued}.')
+        if skipped:
+            messages.error(request, f'Приглашение уже отправлялось, пропущено адресов: {skipped}.')
         return redirect('manage_users')
     return render(request, 'invite_applicant.html')
\ No newline at end of file